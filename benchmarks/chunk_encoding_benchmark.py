@@ -0,0 +1,88 @@
+"""Benchmark zarr chunk encoding throughput vs. the number of encoding processes.
+
+Compares encoding inline (a thread pool, as xpublish does by default) against
+catalog_to_xpublish.plugins.ChunkEncodingPool with 1..N processes.
+
+Usage:
+    python benchmarks/chunk_encoding_benchmark.py
+"""
+import asyncio
+import os
+import time
+import numpy as np
+from numcodecs import Blosc
+from catalog_to_xpublish.plugins import ChunkEncodingPool
+
+# DEFINE INPUTS BELOW
+CHUNK_SHAPE: tuple = (256, 256, 16)
+N_CHUNKS: int = 64
+IN_FLIGHT: int = 32
+COMPRESSOR = Blosc(cname='zstd', clevel=5, shuffle=Blosc.SHUFFLE, blocksize=0)
+
+
+async def encode_all(
+    chunks: list,
+) -> float:
+    """Encode all chunks with up to IN_FLIGHT concurrent requests, returns seconds."""
+    semaphore = asyncio.Semaphore(IN_FLIGHT)
+
+    async def encode_one(chunk: np.ndarray) -> bytes:
+        async with semaphore:
+            return await ChunkEncodingPool.encode(
+                chunk,
+                filters=None,
+                compressor=COMPRESSOR,
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[encode_one(chunk) for chunk in chunks])
+    return time.perf_counter() - start
+
+
+def report(
+    label: str,
+    seconds: float,
+    nbytes: int,
+) -> None:
+    """Print a throughput line."""
+    print(
+        f'{label:<28} {N_CHUNKS / seconds:>10.1f} chunks/s '
+        f'{nbytes / seconds / 2**20:>10.1f} MiB/s',
+    )
+
+
+def main() -> None:
+    """Main function to run the benchmark."""
+    # smooth random fields compress like real gridded data
+    rng = np.random.default_rng(0)
+    chunks = [
+        np.cumsum(rng.standard_normal(CHUNK_SHAPE, dtype='float32'), axis=0)
+        for _ in range(N_CHUNKS)
+    ]
+    nbytes: int = sum(chunk.nbytes for chunk in chunks)
+    print(f'Encoding {N_CHUNKS} chunks of {CHUNK_SHAPE} ({nbytes / 2**20:.0f} MiB)')
+
+    # inline (threads + GIL)
+    ChunkEncodingPool.close()
+    report('inline (thread pool)', asyncio.run(encode_all(chunks)), nbytes)
+
+    # process pool w/ increasing workers
+    n_workers: int = 1
+    while n_workers <= (os.cpu_count() or 1):
+        for shared_memory in [False, True]:
+            ChunkEncodingPool.config_encoding({
+                'max_workers': n_workers,
+                'shared_memory': shared_memory,
+            })
+            asyncio.run(encode_all(chunks[:n_workers]))  # warm up workers
+            report(
+                f'{n_workers} processes (shm={shared_memory})',
+                asyncio.run(encode_all(chunks)),
+                nbytes,
+            )
+            ChunkEncodingPool.close()
+        n_workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark cold import time of catalog_to_xpublish and each catalog implementation.
+
+Each scenario runs in a fresh interpreter (N_RUNS times), reporting the median wall
+time and which heavy dependencies ended up imported.
+
+Usage:
+    python benchmarks/import_benchmark.py
+"""
+import json
+import statistics
+import subprocess
+import sys
+from typing import (
+    Dict,
+    List,
+)
+
+# DEFINE INPUTS BELOW
+N_RUNS: int = 5
+HEAVY_MODULES: List[str] = ['intake', 'pystac', 'xarray', 'xpublish', 'dask', 'fsspec']
+SCENARIOS: Dict[str, str] = {
+    'import catalog_to_xpublish': 'import catalog_to_xpublish',
+    'stac implementation': (
+        'import catalog_to_xpublish\n'
+        'catalog_to_xpublish.CatalogImplementationFactory.get_catalog_implementation("stac")'
+    ),
+    'intake implementation': (
+        'import catalog_to_xpublish\n'
+        'catalog_to_xpublish.CatalogImplementationFactory.get_catalog_implementation("intake")'
+    ),
+    'all implementations': (
+        'import catalog_to_xpublish\n'
+        'catalog_to_xpublish.CatalogImplementationFactory.get_all_implementations()'
+    ),
+}
+
+# times the scenario and reports the imported heavy modules as JSON
+TEMPLATE: str = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "modules": [m for m in {heavy_modules!r} if m in sys.modules],
+}}))
+'''
+
+
+def run_scenario(code: str) -> Dict[str, float | List[str]]:
+    """Runs a scenario in a fresh interpreter, returns its timing and imported modules."""
+    output: str = subprocess.run(
+        [sys.executable, '-c', TEMPLATE.format(code=code, heavy_modules=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Main function to run the benchmark."""
+    print(f'{"scenario":<28} {"median (s)":>10} {"min (s)":>8}  imported')
+    for name, code in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(N_RUNS)]
+        seconds: List[float] = [run['seconds'] for run in runs]
+        print(
+            f'{name:<28} {statistics.median(seconds):>10.3f} {min(seconds):>8.3f}  '
+            f'{", ".join(runs[-1]["modules"])}',
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+"""Load test a catalog_to_xpublish app w/ mixed traffic, reporting latency percentiles per route.
+
+Starts create_app() on a synthetic (or provided) catalog and drives catalog routes,
+dataset listings, zarr metadata and zarr chunk reads at a fixed concurrency through
+an in-process ASGI client (default) or a local uvicorn server. Results are saved to
+JSON so runs can be compared across releases (see --compare).
+
+NOTE: Targets are discovered by requesting each dataset's .zmetadata first, so
+datasets are already opened (and cached) when the measured traffic starts. The run
+exits non-zero (w/o saving results) if a route in the mix has no targets, or if more
+than --max-error-rate of the measured requests fail, as such runs are not comparable.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 16 --requests 2000 --output results.json
+    python benchmarks/load_test.py --catalog my_catalog.yaml --catalog-type intake --duration 30
+    python benchmarks/load_test.py --output new.json --compare results.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import httpx
+import numpy as np
+import pystac
+import xarray as xr
+import catalog_to_xpublish
+from catalog_to_xpublish.cache import DatasetCache
+from datetime import (
+    datetime,
+    timezone,
+)
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# the route template of each kind of request
+ROUTES: Dict[str, str] = {
+    'catalog': '/{catalog}/json',
+    'datasets': '/{catalog}/datasets',
+    'zmetadata': '/{catalog}/datasets/{dataset_id}/zarr/.zmetadata',
+    'chunk': '/{catalog}/datasets/{dataset_id}/zarr/{var}/{chunk}',
+}
+DEFAULT_MIX: str = 'catalog=1,datasets=1,zmetadata=2,chunk=6'
+
+# a (kind, url) pair and a (kind, seconds, status code) result
+Target = Tuple[str, str]
+Result = Tuple[str, float, int]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--catalog', type=Path, default=None,
+                        help='A catalog file to serve (default is a synthetic STAC catalog).')
+    parser.add_argument('--catalog-type', default='stac', help='The catalog type (stac or intake).')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients.')
+    parser.add_argument('--requests', type=int, default=1000, help='Measured requests.')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Run for this many seconds instead of a fixed number of requests.')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured warmup requests.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Relative weights of each route kind.')
+    parser.add_argument('--transport', choices=['asgi', 'uvicorn'], default='asgi',
+                        help='An in-process ASGI client or a local uvicorn server.')
+    parser.add_argument('--collections', type=int, default=2,
+                        help='Synthetic catalog: the number of collections.')
+    parser.add_argument('--datasets', type=int, default=2,
+                        help='Synthetic catalog: the number of datasets per collection.')
+    parser.add_argument('--seed', type=int, default=0, help='The request sampling seed.')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Fail if more than this fraction of measured requests fail.')
+    parser.add_argument('--log-level', default='WARNING', help='The app logging level.')
+    parser.add_argument('--output', type=Path, default=None, help='Save results to this JSON file.')
+    parser.add_argument('--compare', type=Path, default=None, help='A previous results JSON file.')
+    return parser.parse_args()
+
+
+def make_synthetic_catalog(
+    directory: Path,
+    n_collections: int,
+    n_datasets: int,
+) -> Path:
+    """Writes chunked NetCDF4 files and a STAC catalog w/ a collection per group of files.
+
+    NOTE: xpublish can not build zarr metadata for dask arrays opened from zarr stores
+    w/ recent xarray versions (their encoded chunks are rejected, see
+    https://github.com/xpublish-community/xpublish/issues/207), so the synthetic
+    datasets are NetCDF4 files opened w/ dask chunks matching their HDF5 chunks.
+    """
+    rng = np.random.default_rng(0)
+    catalog = pystac.Catalog(id='load-test', description='A synthetic load test catalog.')
+    chunks: Dict[str, int] = {'time': 12, 'lat': 32, 'lon': 32}
+    for i in range(n_collections):
+        collection = pystac.Collection(
+            id=f'collection-{i}',
+            description='Synthetic gridded datasets.',
+            extent=pystac.Extent(
+                pystac.SpatialExtent([[-180, -90, 180, 90]]),
+                pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+            ),
+        )
+        for j in range(n_datasets):
+            path: Path = directory / 'data' / f'dataset_{i}_{j}.nc'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data_vars: Dict[str, Any] = {
+                name: (('time', 'lat', 'lon'), rng.random((48, 64, 64), dtype='float32'))
+                for name in ['temp', 'precip']
+            }
+            xr.Dataset(
+                data_vars=data_vars,
+                coords={
+                    'time': np.arange(48),
+                    'lat': np.linspace(-90, 90, 64),
+                    'lon': np.linspace(-180, 180, 64),
+                },
+            ).to_netcdf(
+                path,
+                engine='h5netcdf',
+                encoding={name: {'chunksizes': tuple(chunks.values())} for name in data_vars},
+            )
+            collection.add_asset(
+                f'dataset_{j}',
+                pystac.Asset(
+                    href=path.resolve().as_uri(),
+                    media_type='application/x-netcdf',
+                    extra_fields={
+                        'xarray:open_kwargs': {'engine': 'h5netcdf', 'chunks': chunks},
+                        'xarray:storage_options': {},
+                    },
+                ),
+            )
+        catalog.add_child(collection)
+    catalog.normalize_hrefs(str(directory / 'catalog'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return directory / 'catalog' / 'catalog.json'
+
+
+def chunk_keys(
+    zmetadata: Dict[str, Any],
+    max_keys: int,
+    rng: random.Random,
+) -> List[str]:
+    """Returns up to max_keys random {var}/{chunk} keys of the non-index variables."""
+    keys: List[str] = []
+    metadata: Dict[str, Any] = zmetadata.get('metadata', {})
+    for key, meta in metadata.items():
+        if not key.endswith('/.zarray'):
+            continue
+        var: str = key.split('/')[0]
+        dims: List[str] = metadata.get(f'{var}/.zattrs', {}).get('_ARRAY_DIMENSIONS', [])
+        if dims == [var] or not meta['shape']:
+            continue
+        n_chunks = [-(-size // chunk) for size, chunk in zip(meta['shape'], meta['chunks'])]
+        for index in itertools.product(*[range(n) for n in n_chunks]):
+            keys.append(f'{var}/{".".join(map(str, index))}')
+    rng.shuffle(keys)
+    return keys[:max_keys]
+
+
+async def discover_targets(
+    client: httpx.AsyncClient,
+    catalog_path: Path,
+    catalog_type: str,
+    rng: random.Random,
+) -> Dict[str, List[str]]:
+    """Returns the urls of each kind of request, found by crawling the catalog."""
+    implementation = catalog_to_xpublish.CatalogImplementationFactory.get_catalog_implementation(
+        catalog_type,
+    )
+    endpoints = implementation.catalog_search(catalog_path=catalog_path).parse_catalog()
+
+    targets: Dict[str, List[str]] = {kind: [] for kind in ROUTES}
+    for endpoint in endpoints:
+        prefix: str = '' if endpoint.catalog_path == '/' else endpoint.catalog_path
+        targets['catalog'].append(f'{prefix}/json')
+        if not endpoint.contains_datasets:
+            continue
+        targets['datasets'].append(f'{prefix}/datasets')
+        for dataset_id in endpoint.dataset_ids:
+            url: str = f'{prefix}/datasets/{dataset_id}/zarr/.zmetadata'
+            targets['zmetadata'].append(url)
+            try:
+                response = await client.get(url)
+            except httpx.HTTPError as error:
+                print(f'WARNING: {url} failed ({error!r}), skipping its chunks.')
+                continue
+            if response.status_code != 200:
+                print(f'WARNING: {url} returned {response.status_code}, skipping its chunks.')
+                continue
+            targets['chunk'] += [
+                f'{prefix}/datasets/{dataset_id}/zarr/{key}'
+                for key in chunk_keys(response.json(), max_keys=256, rng=rng)
+            ]
+    return targets
+
+
+def iter_plan(
+    targets: Dict[str, List[str]],
+    mix: Dict[str, float],
+    rng: random.Random,
+) -> Iterator[Target]:
+    """Yields an endless stream of (kind, url) requests sampled by the mix weights."""
+    kinds: List[str] = [kind for kind in mix if targets.get(kind)]
+    if not kinds:
+        raise ValueError('No requests to make, check the catalog and --mix.')
+    weights: List[float] = [mix[kind] for kind in kinds]
+    while True:
+        kind: str = rng.choices(kinds, weights)[0]
+        yield kind, rng.choice(targets[kind])
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    plan: Iterator[Target],
+    concurrency: int,
+    n_requests: Optional[int],
+    duration: Optional[float],
+) -> Tuple[List[Result], float]:
+    """Makes requests from the plan w/ concurrency clients, returns results and wall time."""
+    if duration is None:
+        plan = itertools.islice(plan, n_requests)
+    results: List[Result] = []
+    start: float = time.perf_counter()
+    deadline: float = start + duration if duration is not None else float('inf')
+
+    async def worker() -> None:
+        for kind, url in plan:
+            if time.perf_counter() > deadline:
+                break
+            request_start: float = time.perf_counter()
+            try:
+                status: int = (await client.get(url)).status_code
+            except httpx.HTTPError:
+                status = 0
+            results.append((kind, time.perf_counter() - request_start, status))
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return results, time.perf_counter() - start
+
+
+def summarize(
+    results: List[Result],
+    seconds: float,
+) -> Dict[str, Any]:
+    """Returns throughput and latency percentiles, overall and per route kind."""
+
+    def stats(latencies: List[float], errors: int) -> Dict[str, Any]:
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': len(latencies) / seconds,
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(ms.max()),
+        }
+
+    routes: Dict[str, Any] = {}
+    for kind in ROUTES:
+        kind_results = [r for r in results if r[0] == kind]
+        if kind_results:
+            routes[kind] = {
+                'route': ROUTES[kind],
+                **stats(
+                    [r[1] for r in kind_results],
+                    sum(1 for r in kind_results if not 200 <= r[2] < 400),
+                ),
+            }
+    return {
+        'duration_seconds': seconds,
+        'overall': stats(
+            [r[1] for r in results],
+            sum(1 for r in results if not 200 <= r[2] < 400),
+        ),
+        'routes': routes,
+    }
+
+
+def print_summary(
+    summary: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Prints a table of the summary (w/ % changes vs. a previous run)."""
+    columns: List[str] = ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms']
+    print(f'{"route":<12} {"requests":>8} {"errors":>6} ' + ' '.join(f'{c:>16}' for c in columns))
+    rows = list(summary['routes'].items()) + [('overall', summary['overall'])]
+    for kind, stats in rows:
+        if kind == 'overall':
+            old = (previous or {}).get('overall')
+        else:
+            old = (previous or {}).get('routes', {}).get(kind)
+        cells: List[str] = []
+        for column in columns:
+            cell = f'{stats[column]:.1f}'
+            if old and old.get(column):
+                cell += f' ({(stats[column] / old[column] - 1) * 100:+.0f}%)'
+            cells.append(f'{cell:>16}')
+        print(f'{kind:<12} {stats["requests"]:>8} {stats["errors"]:>6} ' + ' '.join(cells))
+
+
+def close_datasets() -> None:
+    """Closes (and un-caches) the datasets opened by the app.
+
+    NOTE: h5py can crash the interpreter on exit while files opened through fsspec
+    file objects (i.e., the synthetic NetCDF4 files) are still open.
+    """
+    for ds in DatasetCache.DATASETS.values():
+        ds.close()
+    DatasetCache.DATASETS.clear()
+
+
+class UvicornServer:
+    """Serves the app w/ uvicorn in a background thread on a free local port."""
+
+    def __init__(self, app) -> None:
+        import uvicorn
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning'),
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        port: int = self.server.servers[0].sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{port}'
+
+    def __exit__(self, *args) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def load_test(
+    args: argparse.Namespace,
+    app,
+    catalog_path: Path,
+    base_url: str,
+) -> Dict[str, Any]:
+    """Discovers targets, warms up, and runs the measured load."""
+    rng = random.Random(args.seed)
+    mix: Dict[str, float] = {
+        kind: float(weight)
+        for kind, weight in (item.split('=') for item in args.mix.split(','))
+    }
+    if args.transport == 'asgi':
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    else:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        targets = await discover_targets(client, catalog_path, args.catalog_type, rng)
+        print('Targets: ' + ', '.join(f'{k}={len(v)}' for k, v in targets.items()))
+        missing: List[str] = [kind for kind, weight in mix.items() if weight > 0 and not targets.get(kind)]
+        if missing:
+            raise SystemExit(
+                f'ERROR: No {", ".join(missing)} targets were found (see the warnings above).',
+            )
+        plan = iter_plan(targets, mix, rng)
+        await run_load(client, plan, args.concurrency, args.warmup, None)
+        results, seconds = await run_load(
+            client,
+            plan,
+            args.concurrency,
+            args.requests,
+            args.duration,
+        )
+    return summarize(results, seconds)
+
+
+def main() -> None:
+    """Main function to run the load test."""
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        catalog_path: Path = args.catalog or make_synthetic_catalog(
+            Path(temp_dir),
+            args.collections,
+            args.datasets,
+        )
+        app = catalog_to_xpublish.create_app(
+            catalog_path=catalog_path,
+            catalog_type=args.catalog_type,
+            config_logging_dict={'level': args.log_level},
+        )
+        try:
+            if args.transport == 'asgi':
+                summary = asyncio.run(load_test(args, app, catalog_path, 'http://load-test'))
+            else:
+                with UvicornServer(app) as base_url:
+                    summary = asyncio.run(load_test(args, app, catalog_path, base_url))
+        finally:
+            close_datasets()
+
+    previous: Optional[Dict[str, Any]] = None
+    if args.compare:
+        previous = json.loads(args.compare.read_text())['summary']
+        print(f'Compared to {args.compare}:')
+    print_summary(summary, previous)
+
+    error_rate: float = summary['overall']['errors'] / summary['overall']['requests']
+    if error_rate > args.max_error_rate:
+        raise SystemExit(
+            f'ERROR: {error_rate:.1%} of requests failed (over --max-error-rate '
+            f'{args.max_error_rate:.1%}), not saving results.',
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            'metadata': {
+                'catalog_to_xpublish_version': catalog_to_xpublish.__version__,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'args': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+            },
+            'summary': summary,
+        }, indent=2))
+        print(f'Saved results to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark startup time and memory of N independent workers vs. N forked workers.
+
+Independent workers (i.e., uvicorn/gunicorn --workers) each crawl the catalog and hold
+their own copy of it. Forked workers (catalog_to_xpublish.serve) share the parent's
+crawled catalog copy-on-write. Memory is reported as the summed PSS (proportional set
+size, shared pages split between the processes sharing them) and RSS of all processes.
+
+NOTE: Linux only (reads /proc).
+
+Usage:
+    python benchmarks/prefork_benchmark.py
+"""
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pystac
+import xarray as xr
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+)
+
+# DEFINE INPUTS BELOW
+WORKER_COUNTS: List[int] = [1, 2, 4, 8]
+N_COLLECTIONS: int = 200
+N_DATASETS: int = 5
+
+# builds the app, then blocks until stdin closes
+INDEPENDENT_WORKER: str = '''
+import sys, time
+start = time.perf_counter()
+import catalog_to_xpublish
+app = catalog_to_xpublish.create_app(catalog_path={catalog_path!r}, catalog_type='stac')
+print(f'READY {{time.perf_counter() - start}}', flush=True)
+sys.stdin.read()
+'''
+PREFORK_PARENT: str = '''
+import sys, time
+start = time.perf_counter()
+import catalog_to_xpublish
+from catalog_to_xpublish.serve import PreforkServer
+app = catalog_to_xpublish.create_app(catalog_path={catalog_path!r}, catalog_type='stac')
+server = PreforkServer(app, workers={workers}, port=0, uvicorn_kwargs={{'log_level': 'warning'}})
+server.start()
+print(f'READY {{time.perf_counter() - start}}', flush=True)
+sys.stdin.read()
+server.stop()
+'''
+
+
+def make_catalog(
+    directory: Path,
+    n_collections: int,
+    n_datasets: int,
+) -> Path:
+    """Writes a STAC catalog w/ many collections, all pointing at one small zarr store."""
+    store: Path = directory / 'data.zarr'
+    xr.Dataset(
+        data_vars={'temp': (('time', 'x'), np.zeros((4, 10)))},
+        coords={'time': np.arange(4), 'x': np.arange(10)},
+    ).to_zarr(store, consolidated=True)
+
+    catalog = pystac.Catalog(id='prefork-benchmark', description='A synthetic catalog.')
+    for i in range(n_collections):
+        collection = pystac.Collection(
+            id=f'collection-{i}',
+            description='Synthetic datasets.',
+            extent=pystac.Extent(
+                pystac.SpatialExtent([[-180, -90, 180, 90]]),
+                pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+            ),
+        )
+        for j in range(n_datasets):
+            collection.add_asset(
+                f'dataset_{j}',
+                pystac.Asset(
+                    href=store.resolve().as_uri(),
+                    media_type='application/vnd+zarr',
+                    extra_fields={
+                        'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True},
+                        'xarray:storage_options': {},
+                    },
+                ),
+            )
+        catalog.add_child(collection)
+    catalog.normalize_hrefs(str(directory / 'catalog'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return directory / 'catalog' / 'catalog.json'
+
+
+def process_tree(pid: int) -> List[int]:
+    """Returns a pid and all of its descendants."""
+    pids: List[int] = [pid]
+    for task in Path(f'/proc/{pid}/task').iterdir():
+        children: str = (task / 'children').read_text().split()
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_mb(pids: List[int]) -> Dict[str, float]:
+    """Returns the summed PSS and RSS (MB) of the processes."""
+    totals: Dict[str, float] = {'pss': 0.0, 'rss': 0.0}
+    for pid in pids:
+        for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+            key: str = line.split(':')[0].lower()
+            if key in totals:
+                totals[key] += int(line.split()[1]) / 1024
+    return totals
+
+
+def start_processes(codes: List[str]) -> tuple[List[subprocess.Popen], float]:
+    """Starts the processes concurrently, returns them and the wall time until all are ready."""
+    start: float = time.perf_counter()
+    processes: List[subprocess.Popen] = [
+        subprocess.Popen(
+            [sys.executable, '-c', code],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        for code in codes
+    ]
+    for process in processes:
+        line: str = process.stdout.readline()
+        if not line.startswith('READY'):
+            raise RuntimeError(f'Process {process.pid} failed to start.')
+    return processes, time.perf_counter() - start
+
+
+def run_scenario(codes: List[str]) -> Dict[str, float]:
+    """Runs a scenario, returning its time to ready and summed memory."""
+    processes, seconds = start_processes(codes)
+    try:
+        pids: List[int] = [pid for process in processes for pid in process_tree(process.pid)]
+        return {'seconds': seconds, 'processes': len(pids), **memory_mb(pids)}
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait(timeout=60)
+
+
+def main() -> None:
+    """Main function to run the benchmark."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        catalog_path: str = str(make_catalog(Path(tmp_dir), N_COLLECTIONS, N_DATASETS))
+        print(f'{N_COLLECTIONS} collections x {N_DATASETS} datasets')
+        print(
+            f'{"workers":>7} {"mode":<12} {"ready (s)":>9} {"procs":>5} '
+            f'{"PSS (MB)":>9} {"RSS (MB)":>9}',
+        )
+        for workers in WORKER_COUNTS:
+            scenarios: Dict[str, List[str]] = {
+                'independent': [
+                    INDEPENDENT_WORKER.format(catalog_path=catalog_path)
+                ] * workers,
+                'prefork': [
+                    PREFORK_PARENT.format(catalog_path=catalog_path, workers=workers),
+                ],
+            }
+            for mode, codes in scenarios.items():
+                result = run_scenario(codes)
+                print(
+                    f'{workers:>7} {mode:<12} {result["seconds"]:>9.2f} '
+                    f'{result["processes"]:>5} {result["pss"]:>9.1f} {result["rss"]:>9.1f}',
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark startup time and memory of an xpublish app per endpoint vs. one shared xpublish app.
+
+Each scenario builds the app in a fresh process, reporting the create_app() wall time,
+the process RSS once built, the number of routes, and the wall time of a first request
+(which builds the routing/OpenAPI state lazily).
+
+NOTE: Linux only (reads /proc).
+
+Usage:
+    python benchmarks/shared_app_benchmark.py
+"""
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from prefork_benchmark import make_catalog
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+# DEFINE INPUTS BELOW
+ENDPOINT_COUNTS: List[int] = [100, 1000, 10000]
+N_DATASETS: int = 1
+
+# builds the app, then prints its stats as JSON
+SCENARIO: str = '''
+import json, time
+from pathlib import Path
+from fastapi.testclient import TestClient
+import catalog_to_xpublish
+from catalog_to_xpublish.startup import StartupReport
+
+def rss_mb():
+    return int(Path('/proc/self/statm').read_text().split()[1]) * 4096 / 2**20
+
+before = rss_mb()
+start = time.perf_counter()
+app = catalog_to_xpublish.create_app(
+    catalog_path={catalog_path!r},
+    catalog_type='stac',
+    shared_xpublish_app={shared},
+)
+seconds = time.perf_counter() - start
+client = TestClient(app)
+start = time.perf_counter()
+assert client.get('/collection-0/datasets/dataset_0/keys').status_code == 200
+first_request = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': rss_mb() - before,
+    'routes': StartupReport.ENDPOINTS['routes'],
+    'first_request': first_request,
+}}))
+'''
+
+
+def run_scenario(
+    catalog_path: str,
+    shared: bool,
+) -> Dict[str, Any]:
+    """Builds the app in a fresh process, returning its stats."""
+    output: str = subprocess.run(
+        [sys.executable, '-c', SCENARIO.format(catalog_path=catalog_path, shared=shared)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Main function to run the benchmark."""
+    print(
+        f'{"endpoints":>9} {"mode":<13} {"create (s)":>10} {"RSS (MB)":>9} '
+        f'{"routes":>7} {"1st req (s)":>11}',
+    )
+    for n_endpoints in ENDPOINT_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            catalog_path: str = str(make_catalog(Path(tmp_dir), n_endpoints, N_DATASETS))
+            for mode, shared in [('per endpoint', False), ('shared', True)]:
+                result = run_scenario(catalog_path, shared)
+                print(
+                    f'{n_endpoints:>9} {mode:<13} {result["seconds"]:>10.2f} '
+                    f'{result["rss_mb"]:>9.1f} {result["routes"]:>7} '
+                    f'{result["first_request"]:>11.3f}',
+                )
+
+
+if __name__ == '__main__':
+    main()
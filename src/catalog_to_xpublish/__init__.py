@@ -1,11 +1,19 @@
 __version__ = "0.1.6"
-from catalog_to_xpublish.factory import (
-    CatalogImplementation,
-    CatalogImplementationFactory,
+from catalog_to_xpublish.startup import (
+    StartupReport,
 )
-from catalog_to_xpublish import searchers
-from catalog_to_xpublish import io
-from catalog_to_xpublish import routers
-from catalog_to_xpublish.server_functions import (
-    create_app,
+with StartupReport.import_stage('import catalog_to_xpublish.factory'):
+    from catalog_to_xpublish.factory import (
+        CatalogImplementation,
+        CatalogImplementationFactory,
+    )
+# NOTE: catalog implementations (and intake/pystac) are imported on first use
+from catalog_to_xpublish import (
+    searchers,
+    io,
+    routers,
 )
+with StartupReport.import_stage('import catalog_to_xpublish.server_functions'):
+    from catalog_to_xpublish.server_functions import (
+        create_app,
+    )
@@ -0,0 +1,378 @@
+"""
+Admission control: global, per catalog, per catalog endpoint and per dataset concurrency limits w/ load shedding.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from starlette.responses import JSONResponse
+from starlette.types import (
+    ASGIApp,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.federation import (
+    Federation,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from typing import (
+    Deque,
+    Dict,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+# matches {catalog endpoint}/datasets/{dataset_id}(/...) request paths
+DATASET_PATH: re.Pattern = re.compile(r'^(.*?)/datasets/([^/]+)')
+
+
+class AdmissionConfigDict(TypedDict):
+    """A dictionary to hold the optional admission control args.
+
+    NOTE: All arguments are optional, limits that are not provided are not enforced.
+    Attributes:
+        max_concurrency: The number of requests served at once (server wide).
+        max_queue: The number of requests waiting for a server wide slot (default is 100).
+        endpoint_concurrency: The number of dataset requests served at once per catalog endpoint.
+        endpoint_queue: The number of requests waiting per catalog endpoint (default is 50).
+        dataset_concurrency: The number of requests served at once per dataset.
+        dataset_queue: The number of requests waiting per dataset (default is 20).
+        queue_timeout: Seconds a request may wait for a slot before a 503 (default is 30).
+        retry_after: The Retry-After header value (seconds) of shed requests (default is 1).
+        exempt_paths: Paths that are never limited (default is /metrics, /startup, /profiles).
+    """
+    max_concurrency: Optional[int]
+    max_queue: Optional[int]
+    endpoint_concurrency: Optional[int]
+    endpoint_queue: Optional[int]
+    dataset_concurrency: Optional[int]
+    dataset_queue: Optional[int]
+    queue_timeout: Optional[float]
+    retry_after: Optional[int]
+    exempt_paths: Optional[List[str]]
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted (its queue is full or it waited too long)."""
+
+    def __init__(
+        self,
+        scope: str,
+        reason: str,
+    ) -> None:
+        super().__init__(f'{scope} {reason}')
+        self.scope = scope
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """A semaphore w/ a bounded FIFO wait queue.
+
+    Released slots are handed directly to the oldest waiter, so queued requests
+    are not overtaken by new arrivals.
+
+    NOTE: Not thread-safe, a limiter must only be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        max_queue: int,
+    ) -> None:
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    async def acquire(
+        self,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Takes a slot, waiting in the queue if needed.
+
+        Raises:
+            AdmissionRejected: If the queue is full ('queue_full') or the wait timed out ('timeout').
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected('', 'queue_full')
+
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # the slot was handed over as we gave up, pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected('', 'timeout') from None
+            raise
+
+    def release(self) -> None:
+        """Frees a slot (handing it to the oldest waiter)."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return None
+        self.active -= 1
+
+
+class AdmissionControl:
+    """A class to hold the admission control configuration and limiters."""
+
+    ENABLED: bool = False
+    MAX_CONCURRENCY: int | None = None
+    MAX_QUEUE: int = 100
+    ENDPOINT_CONCURRENCY: int | None = None
+    ENDPOINT_QUEUE: int = 50
+    DATASET_CONCURRENCY: int | None = None
+    DATASET_QUEUE: int = 20
+    QUEUE_TIMEOUT: float = 30.0
+    RETRY_AFTER: int = 1
+    EXEMPT_PATHS: List[str] = ['/metrics', '/startup', '/profiles']
+
+    # limiters by (scope, key), per endpoint/dataset limiters are dropped when idle
+    _LIMITERS: Dict[Tuple[str, str], ConcurrencyLimiter] = {}
+
+    @staticmethod
+    def __validate_limit(
+        name: str,
+        value: int | None,
+        allow_zero: bool = False,
+    ) -> int | None:
+        if value is None:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool) or value < (0 if allow_zero else 1):
+            raise ValueError(
+                f'{name} must be a {"non-negative" if allow_zero else "positive"} int, not {value}',
+            )
+        return value
+
+    @classmethod
+    def config_admission(
+        cls,
+        config_dict: Optional[AdmissionConfigDict] = None,
+    ) -> None:
+        """Configure admission control.
+
+        Arguments:
+            config_dict: A dictionary of optional admission control args.
+                If None, requests are not limited.
+
+        Returns:
+            None. Sets the global admission control configuration.
+        """
+        cls._LIMITERS = {}
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        validate = cls.__validate_limit
+        cls.MAX_CONCURRENCY = validate('max_concurrency', config_dict.get('max_concurrency'))
+        cls.MAX_QUEUE = validate('max_queue', config_dict.get('max_queue', 100), True)
+        cls.ENDPOINT_CONCURRENCY = validate(
+            'endpoint_concurrency',
+            config_dict.get('endpoint_concurrency'),
+        )
+        cls.ENDPOINT_QUEUE = validate('endpoint_queue', config_dict.get('endpoint_queue', 50), True)
+        cls.DATASET_CONCURRENCY = validate(
+            'dataset_concurrency',
+            config_dict.get('dataset_concurrency'),
+        )
+        cls.DATASET_QUEUE = validate('dataset_queue', config_dict.get('dataset_queue', 20), True)
+        cls.RETRY_AFTER = validate('retry_after', config_dict.get('retry_after', 1), True)
+
+        queue_timeout: float = config_dict.get('queue_timeout', 30.0)
+        if not isinstance(queue_timeout, (int, float)) or queue_timeout <= 0:
+            raise ValueError(
+                f'queue_timeout must be a positive number of seconds, not {queue_timeout}',
+            )
+        cls.QUEUE_TIMEOUT = float(queue_timeout)
+        cls.EXEMPT_PATHS = list(config_dict.get('exempt_paths', cls.EXEMPT_PATHS))
+
+        cls.ENABLED = any(
+            limit is not None
+            for limit in [cls.MAX_CONCURRENCY, cls.ENDPOINT_CONCURRENCY, cls.DATASET_CONCURRENCY]
+        ) or Federation.has_concurrency_quotas()
+        logger.info(
+            f'Admission control: global={cls.MAX_CONCURRENCY} (queue={cls.MAX_QUEUE}), '
+            f'endpoint={cls.ENDPOINT_CONCURRENCY} (queue={cls.ENDPOINT_QUEUE}), '
+            f'dataset={cls.DATASET_CONCURRENCY} (queue={cls.DATASET_QUEUE}).',
+        )
+
+    @classmethod
+    def get_limiter_keys(
+        cls,
+        path: str,
+    ) -> List[Tuple[str, str]]:
+        """Returns the (scope, key) of each limit a request path falls under (most specific first).
+
+        NOTE: The catalog endpoint and dataset are parsed from the path, as limits are
+            checked before routing (i.e., /sub/catalog/datasets/{dataset_id}/...).
+        """
+        keys: List[Tuple[str, str]] = []
+        match = DATASET_PATH.match(path)
+        if match:
+            endpoint: str = match.group(1) or '/'
+            if cls.DATASET_CONCURRENCY is not None:
+                keys.append(('dataset', f'{endpoint}|{match.group(2)}'))
+            if cls.ENDPOINT_CONCURRENCY is not None:
+                keys.append(('endpoint', endpoint))
+            catalog: str | None = Federation.get_catalog(endpoint)
+            if catalog is not None and Federation.get_concurrency_quota(catalog)[0] is not None:
+                keys.append(('catalog', catalog))
+        if cls.MAX_CONCURRENCY is not None:
+            keys.append(('global', ''))
+        return keys
+
+    @classmethod
+    def get_limiter(
+        cls,
+        scope: str,
+        key: str,
+    ) -> ConcurrencyLimiter:
+        limiter: ConcurrencyLimiter | None = cls._LIMITERS.get((scope, key))
+        if limiter is None:
+            if scope == 'catalog':
+                limit, max_queue = Federation.get_concurrency_quota(key)
+            else:
+                limit, max_queue = {
+                    'global': (cls.MAX_CONCURRENCY, cls.MAX_QUEUE),
+                    'endpoint': (cls.ENDPOINT_CONCURRENCY, cls.ENDPOINT_QUEUE),
+                    'dataset': (cls.DATASET_CONCURRENCY, cls.DATASET_QUEUE),
+                }[scope]
+            limiter = ConcurrencyLimiter(limit, max_queue)
+            cls._LIMITERS[(scope, key)] = limiter
+        return limiter
+
+    @classmethod
+    def update_gauges(cls) -> None:
+        """Sets the in flight/queued request gauges (summed per limit scope)."""
+        for scope in ['global', 'catalog', 'endpoint', 'dataset']:
+            limiters = [v for (s, _), v in cls._LIMITERS.items() if s == scope]
+            Metrics.ADMISSION_ACTIVE.set(sum(v.active for v in limiters), scope=scope)
+            Metrics.ADMISSION_QUEUE_DEPTH.set(sum(v.queued for v in limiters), scope=scope)
+
+    @classmethod
+    async def admit(
+        cls,
+        path: str,
+    ) -> List[Tuple[str, str]]:
+        """Takes a slot of every limit a request falls under, returns their keys.
+
+        Raises:
+            AdmissionRejected: If any limit can't be acquired (held slots are released).
+        """
+        held: List[Tuple[str, str]] = []
+        deadline: float = time.monotonic() + cls.QUEUE_TIMEOUT
+        try:
+            for scope, key in cls.get_limiter_keys(path):
+                limiter = cls.get_limiter(scope, key)
+                cls.update_gauges()
+                try:
+                    await limiter.acquire(timeout=max(deadline - time.monotonic(), 0))
+                except AdmissionRejected as e:
+                    raise AdmissionRejected(scope, e.reason) from None
+                held.append((scope, key))
+        except BaseException:
+            cls.release(held)
+            raise
+        cls.update_gauges()
+        return held
+
+    @classmethod
+    def release(
+        cls,
+        held: List[Tuple[str, str]],
+    ) -> None:
+        """Frees the slots taken by admit()."""
+        for scope, key in held:
+            limiter = cls._LIMITERS.get((scope, key))
+            if limiter is None:
+                continue
+            limiter.release()
+            if scope != 'global' and limiter.idle:
+                del cls._LIMITERS[(scope, key)]
+        cls.update_gauges()
+
+
+class AdmissionMiddleware:
+    """A pure ASGI middleware limiting concurrent requests and shedding load.
+
+    Requests over a per dataset/catalog endpoint limit wait in a bounded queue,
+    and are rejected w/ a 429 once it is full. Requests over the server wide limit
+    (or that wait longer than queue_timeout) are rejected w/ a 503.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+    ) -> None:
+        self.app = app
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        path: str = scope.get('path', '')
+        if (
+            scope['type'] != 'http'
+            or not AdmissionControl.ENABLED
+            or path in AdmissionControl.EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return None
+
+        start: float = time.perf_counter()
+        try:
+            held = await AdmissionControl.admit(path)
+        except AdmissionRejected as e:
+            status_code: int = 429 if e.scope != 'global' and e.reason == 'queue_full' else 503
+            match = DATASET_PATH.match(path)
+            Metrics.ADMISSION_REJECTIONS.inc(
+                scope=e.scope,
+                reason=e.reason,
+                endpoint=(match.group(1) or '/') if match else '',
+                dataset=match.group(2) if match else '',
+            )
+            logger.warning(
+                f'Rejected {path} w/ {status_code} ({e.scope} limit, {e.reason}).',
+            )
+            response = JSONResponse(
+                {'detail': f'Too many requests ({e.scope} limit reached), please retry later.'},
+                status_code=status_code,
+                headers={'Retry-After': str(AdmissionControl.RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return None
+
+        Metrics.ADMISSION_WAIT.observe(time.perf_counter() - start)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            AdmissionControl.release(held)
@@ -0,0 +1,336 @@
+"""
+Size-bounded caches for opened datasets and computed results.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_user_cache_dir() -> Path:
+    """Returns the server user's cache directory (i.e., ~/.cache/catalog_to_xpublish)."""
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'catalog_to_xpublish'
+
+
+def make_private_dir(path: Path) -> Path:
+    """Creates a directory only the server user can access (if missing), and returns it.
+
+    An existing directory must be owned by the server user, and not writable by
+    others, so other local users can't plant (or swap) the files read from it.
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        stat: os.stat_result = path.stat()
+        if stat.st_uid != os.getuid():
+            raise PermissionError(
+                f'{path} is not owned by the server user (uid={os.getuid()}).',
+            )
+        if stat.st_mode & 0o022:
+            raise PermissionError(
+                f'{path} is writable by other users, restrict it (i.e., chmod 700).',
+            )
+    return path
+
+
+class CacheConfigDict(TypedDict):
+    """A dictionary to hold the optional cache configuration args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        max_datasets: The number of opened (lazy) datasets to keep. 0 disables caching.
+        max_result_bytes: The total size of computed results (i.e., reductions) to keep.
+        max_compute_bytes: The largest result a request may compute (checked before computing).
+        max_subset_bytes: The largest (uncompressed) subset a request may download.
+        result_ttl: Seconds a computed result is reused for. None never expires them.
+        dataset_ttl: Seconds an opened dataset is reused for before it is reopened
+            (i.e., to pick up appended data). None never expires them.
+    """
+    max_datasets: Optional[int]
+    max_result_bytes: Optional[int]
+    max_compute_bytes: Optional[int]
+    max_subset_bytes: Optional[int]
+    result_ttl: Optional[float]
+    dataset_ttl: Optional[float]
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache bounded by the total size of its values.
+
+    Values may be put in a group (i.e., a federated catalog), and a group w/ a quota
+    evicts its own least recently used values to stay within it.
+
+    Arguments:
+        max_size: The maximum total size of all values.
+        sizeof: A function returning the size of a value (defaults to 1 per entry).
+        ttl: Seconds a value is returned for after it was put (default is no expiry).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.max_size: int = max_size
+        self.sizeof: Callable[[Any], int] = sizeof or (lambda value: 1)
+        self.ttl: float | None = ttl
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.quotas: Dict[Hashable, int] = {}
+        self.group_sizes: Dict[Hashable, int] = {}
+        # key -> (value, size, group, time put)
+        self._data: OrderedDict[Hashable, tuple[Any, int, Hashable, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+    ) -> Any:
+        """Returns a cached value (and marks it as recently used), or default.
+
+        Values older than the ttl are removed, and count as misses.
+        """
+        with self._lock:
+            if key in self._data and self.ttl is not None and (
+                time.monotonic() - self._data[key][3] > self.ttl
+            ):
+                self._remove(key)
+                self.expirations += 1
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key][0]
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        group: Hashable = None,
+    ) -> bool:
+        """Caches a value, evicting the least recently used values to make room.
+
+        Returns:
+            False if the value is larger than the whole cache or its group's quota
+            (and was not stored).
+        """
+        size: int = self.sizeof(value)
+        quota: int | None = self.quotas.get(group) if group is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_size or (quota is not None and size > quota):
+                return False
+            if quota is not None:
+                while self.group_sizes.get(group, 0) + size > quota:
+                    self._remove(
+                        next(k for k, entry in self._data.items() if entry[2] == group),
+                    )
+                    self.evictions += 1
+            while self._data and self.size + size > self.max_size:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+            self._data[key] = (value, size, group, time.monotonic())
+            self.size += size
+            if group is not None:
+                self.group_sizes[group] = self.group_sizes.get(group, 0) + size
+            return True
+
+    def _remove(
+        self,
+        key: Hashable,
+    ) -> Any:
+        """Removes a value and its size (the lock must be held)."""
+        value, size, group, _ = self._data.pop(key)
+        self.size -= size
+        if group is not None:
+            self.group_sizes[group] -= size
+        return value
+
+    def pop(
+        self,
+        key: Hashable,
+        default: Any = None,
+    ) -> Any:
+        """Removes and returns a cached value, or default."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def values(self) -> List[Any]:
+        """Returns the cached values (w/o marking them as recently used)."""
+        with self._lock:
+            return [entry[0] for entry in self._data.values()]
+
+    def clear(self) -> None:
+        """Empties the cache (stats are kept)."""
+        with self._lock:
+            self._data.clear()
+            self.group_sizes.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int | float]:
+        """Returns the cache size and hit/miss statistics."""
+        requests: int = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+        }
+
+
+class DatasetCache:
+    """A class to hold the shared dataset and result caches.
+
+    Opened datasets are cached by (catalog path, dataset id, dataset version), where
+    the version is a hash of the dataset's catalog entry. Results computed from a
+    dataset (i.e., reductions) are cached by the same version, so they can never
+    outlive the catalog entry they were computed from, and expire after RESULT_TTL
+    seconds, so values rewritten in the store are picked up.
+    """
+
+    MAX_DATASETS: int = 32
+    MAX_RESULT_BYTES: int = 256 * 2**20
+    MAX_COMPUTE_BYTES: int = 256 * 2**20
+    MAX_SUBSET_BYTES: int = 2 * 2**30
+    RESULT_TTL: float | None = 300.0
+    DATASET_TTL: float | None = None
+    VERSION_KEY: str = 'catalog_to_xpublish:version'
+    CATALOG_KEY: str = 'catalog_to_xpublish:catalog'
+    DATASETS: LRUCache = LRUCache(MAX_DATASETS, ttl=DATASET_TTL)
+    RESULTS: LRUCache = LRUCache(
+        MAX_RESULT_BYTES,
+        sizeof=lambda value: value.nbytes,
+        ttl=RESULT_TTL,
+    )
+
+    @staticmethod
+    def __validate_size(
+        name: str,
+        size: int,
+    ) -> int:
+        """Validate a cache size."""
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValueError(
+                f'{name} must be a non-negative int, not {size}',
+            )
+        return size
+
+    @staticmethod
+    def __validate_ttl(
+        name: str,
+        ttl: float | None,
+    ) -> float | None:
+        """Validate a time to live (None never expires)."""
+        if ttl is None:
+            return None
+        if not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl < 0:
+            raise ValueError(
+                f'{name} must be a non-negative number of seconds or None, not {ttl}',
+            )
+        return float(ttl)
+
+    @classmethod
+    def config_cache(
+        cls,
+        config_dict: Optional[CacheConfigDict] = None,
+    ) -> None:
+        """Configure (and empty) the shared caches.
+
+        Arguments:
+            config_dict: A dictionary of optional cache configuration args.
+
+        Returns:
+            None. Sets the global DATASETS and RESULTS caches.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        max_datasets: int = cls.__validate_size(
+            'max_datasets',
+            config_dict.get('max_datasets', cls.MAX_DATASETS),
+        )
+        max_result_bytes: int = cls.__validate_size(
+            'max_result_bytes',
+            config_dict.get('max_result_bytes', cls.MAX_RESULT_BYTES),
+        )
+        cls.MAX_COMPUTE_BYTES = cls.__validate_size(
+            'max_compute_bytes',
+            config_dict.get('max_compute_bytes', 256 * 2**20),
+        )
+        cls.MAX_SUBSET_BYTES = cls.__validate_size(
+            'max_subset_bytes',
+            config_dict.get('max_subset_bytes', 2 * 2**30),
+        )
+        cls.RESULT_TTL = cls.__validate_ttl(
+            'result_ttl',
+            config_dict.get('result_ttl', 300.0),
+        )
+        cls.DATASET_TTL = cls.__validate_ttl(
+            'dataset_ttl',
+            config_dict.get('dataset_ttl', None),
+        )
+        cls.DATASETS = LRUCache(max_datasets, ttl=cls.DATASET_TTL)
+        cls.RESULTS = LRUCache(
+            max_result_bytes,
+            sizeof=lambda value: value.nbytes,
+            ttl=cls.RESULT_TTL,
+        )
+        logger.info(
+            f'Caching up to {max_datasets} opened datasets and '
+            f'{max_result_bytes / 2**20:.1f} MiB of computed results '
+            f'(for {cls.RESULT_TTL} seconds).',
+        )
+
+    @staticmethod
+    def dataset_version(
+        catalog_endpoint: CatalogEndpoint,
+        dataset_id: str,
+    ) -> str:
+        """Returns a hash of a dataset's catalog entry.
+
+        The entry (i.e., STAC asset or intake source description) holds the
+        dataset's location and open arguments, so a changed entry is a new version.
+        """
+        entry: Dict[str, Any] = catalog_endpoint.dataset_info_dicts.get(dataset_id, {})
+        serialized: str = json.dumps(
+            [catalog_endpoint.catalog_path, dataset_id, entry],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(serialized.encode()).hexdigest()[:16]
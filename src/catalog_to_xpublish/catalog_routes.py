@@ -0,0 +1,111 @@
+"""
+One set of templated catalog routes for all catalog endpoints, resolved through a hash index.
+"""
+import inspect
+import logging
+from fastapi import (
+    APIRouter,
+    HTTPException,
+)
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+    CatalogRouter,
+)
+from catalog_to_xpublish.cache import (
+    LRUCache,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Tuple,
+    Type,
+)
+
+logger = logging.getLogger(__name__)
+
+# the CatalogRouter method served at each route suffix
+CATALOG_ROUTES: List[Tuple[str, str]] = [
+    ('list_sub_catalogs', '/catalogs'),
+    ('get_parent_catalog', '/parent_catalog'),
+    ('get_catalog_as_yaml', '/yaml'),
+    ('get_catalog_as_json', '/json'),
+]
+
+
+class TemplatedCatalogRoutes:
+    """A router serving the catalog routes of all catalog endpoints.
+
+    Instead of an APIRouter (and four routes) per endpoint, /{catalog_path:path}/catalogs,
+    /parent_catalog, /yaml and /json are added once, and resolve their catalog endpoint
+    by a dictionary lookup of its catalog path. An endpoint's CatalogRouter is only
+    built on its first request (and kept in a LRU cache).
+
+    Arguments:
+        catalog_endpoints: The catalog endpoints (and their CatalogRouter classes) to serve.
+        max_routers: The number of built CatalogRouter objects to keep (default is 1024).
+    """
+
+    def __init__(
+        self,
+        catalog_endpoints: List[Tuple[CatalogEndpoint, Type[CatalogRouter]]],
+        max_routers: int = 1024,
+    ) -> None:
+        self.index: Dict[str, Tuple[CatalogEndpoint, Type[CatalogRouter]]] = {
+            catalog_endpoint.catalog_path: (catalog_endpoint, router_class)
+            for catalog_endpoint, router_class in catalog_endpoints
+        }
+        self.routers: LRUCache = LRUCache(max_routers)
+
+        self.router = APIRouter()
+        for name, suffix in CATALOG_ROUTES:
+            self.router.add_api_route(
+                path='/{catalog_path:path}' + suffix,
+                endpoint=self.get_endpoint(name),
+                methods=['GET'],
+            )
+            # the root catalog's routes have no catalog path
+            if '/' in self.index:
+                self.router.add_api_route(
+                    path=suffix,
+                    endpoint=self.get_endpoint(name, root=True),
+                    methods=['GET'],
+                )
+
+    def get_router(
+        self,
+        catalog_path: str,
+    ) -> CatalogRouter:
+        """Returns the (cached) CatalogRouter of a catalog endpoint, or raises a 404."""
+        router: CatalogRouter | None = self.routers.get(catalog_path)
+        if router is None:
+            if catalog_path not in self.index:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f'No catalog endpoint at {catalog_path}',
+                )
+            catalog_endpoint, router_class = self.index[catalog_path]
+            router = router_class(catalog_endpoint_obj=catalog_endpoint)
+            self.routers.put(catalog_path, router)
+        return router
+
+    def get_endpoint(
+        self,
+        name: str,
+        root: bool = False,
+    ) -> Callable[..., Any]:
+        """Returns a route endpoint calling the named CatalogRouter method of a catalog endpoint."""
+        if root:
+            def endpoint() -> Any:
+                return getattr(self.get_router('/'), name)()
+        else:
+            def endpoint(catalog_path: str) -> Any:
+                return getattr(self.get_router('/' + catalog_path.strip('/')), name)()
+
+        # document (and validate) the routes like the CatalogRouter methods they call
+        method: Callable[..., Any] = getattr(CatalogRouter, name)
+        endpoint.__name__ = name
+        endpoint.__doc__ = method.__doc__.splitlines()[0]
+        endpoint.__annotations__['return'] = inspect.signature(method).return_annotation
+        return endpoint
@@ -0,0 +1,215 @@
+"""
+A server-level (and per-asset overridable) dask chunking policy for opened datasets.
+"""
+import logging
+import math
+import xarray as xr
+import dask.array
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkingConfigDict(TypedDict):
+    """A dictionary to hold the optional chunking policy args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        strategy: One of 'none' (leave as opened), 'encoding' (align dask chunks
+            to the on-disk chunks), 'bytes' (grow on-disk chunks up to
+            target_chunk_bytes), or 'explicit' (use the chunks map).
+        target_chunk_bytes: The target dask chunk size for strategy='bytes'.
+        chunks: A dimension name -> chunk size map for strategy='explicit'.
+    """
+    strategy: Optional[str]
+    target_chunk_bytes: Optional[int]
+    chunks: Optional[Dict[str, int]]
+
+
+class DatasetChunking:
+    """A class to hold the dataset chunking policy.
+
+    The server-level policy is set via create_app(). Individual assets can
+    override any part of it with a CHUNKING_KEY entry, stored in a STAC asset's
+    extra fields or in an Intake source's metadata.
+    """
+
+    CHUNKING_KEY: str = 'catalog_to_xpublish:chunking'
+    STRATEGIES: List[str] = ['none', 'encoding', 'bytes', 'explicit']
+    STRATEGY: str = 'none'
+    TARGET_CHUNK_BYTES: int = 128 * 2**20
+    CHUNKS: Dict[str, int] = {}
+
+    @classmethod
+    def __validate_policy(
+        cls,
+        policy: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Validate a chunking policy dictionary."""
+        strategy = policy['strategy']
+        if strategy not in cls.STRATEGIES:
+            raise ValueError(
+                f'strategy={strategy} is not a valid chunking strategy. '
+                f'Choose from {cls.STRATEGIES}',
+            )
+        target_chunk_bytes = policy['target_chunk_bytes']
+        if (
+            not isinstance(target_chunk_bytes, int)
+            or isinstance(target_chunk_bytes, bool)
+            or target_chunk_bytes < 1
+        ):
+            raise ValueError(
+                f'target_chunk_bytes must be a positive int, not {target_chunk_bytes}',
+            )
+        if not isinstance(policy['chunks'], dict):
+            raise TypeError(
+                f'chunks must be a dict, not {type(policy["chunks"])}',
+            )
+        if strategy == 'explicit' and not policy['chunks']:
+            raise ValueError(
+                'A chunks map must be provided when strategy=explicit.',
+            )
+        return policy
+
+    @classmethod
+    def config_chunking(
+        cls,
+        config_dict: Optional[ChunkingConfigDict] = None,
+    ) -> None:
+        """Configure the server-level chunking policy.
+
+        Arguments:
+            config_dict: A dictionary of optional chunking policy args.
+                If None, the default policy (strategy='none') is used.
+
+        Returns:
+            None. Sets the global chunking policy.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        policy = cls.__validate_policy({
+            'strategy': config_dict.get('strategy', 'none'),
+            'target_chunk_bytes': config_dict.get('target_chunk_bytes', 128 * 2**20),
+            'chunks': config_dict.get('chunks', {}),
+        })
+        cls.STRATEGY = policy['strategy']
+        cls.TARGET_CHUNK_BYTES = policy['target_chunk_bytes']
+        cls.CHUNKS = policy['chunks']
+
+    @classmethod
+    def get_policy(
+        cls,
+        overrides: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Returns the server-level policy updated with any per-asset overrides."""
+        policy: Dict[str, Any] = {
+            'strategy': cls.STRATEGY,
+            'target_chunk_bytes': cls.TARGET_CHUNK_BYTES,
+            'chunks': cls.CHUNKS,
+        }
+        if overrides:
+            policy.update(overrides)
+        return cls.__validate_policy(policy)
+
+    @staticmethod
+    def _encoding_chunks(
+        var: xr.Variable,
+    ) -> Optional[Tuple[int, ...]]:
+        """Returns the on-disk chunk shape of a variable (if known)."""
+        chunks = var.encoding.get('chunks', var.encoding.get('chunksizes'))
+        if chunks is None or len(chunks) != var.ndim:
+            return None
+        return tuple(chunks)
+
+    @classmethod
+    def _variable_chunks(
+        cls,
+        var: xr.Variable,
+        policy: Dict[str, Any],
+    ) -> Optional[Dict[str, int | Tuple[int, ...]]]:
+        """Returns the dask chunks for a variable, or None to leave it as is."""
+        strategy: str = policy['strategy']
+        if var.ndim == 0:
+            return None
+
+        if strategy == 'explicit':
+            chunks = {
+                dim: size for dim, size in policy['chunks'].items() if dim in var.dims
+            }
+            return chunks or None
+
+        on_disk = cls._encoding_chunks(var)
+        if strategy == 'encoding':
+            if on_disk is None:
+                return None
+            return dict(zip(var.dims, on_disk))
+
+        # strategy == 'bytes': grow the on-disk (or current) chunks up to the target
+        # NOTE: 'auto' chunks can't be sized for object (i.e., string) dtypes
+        if var.dtype.kind == 'O':
+            return None
+        previous = on_disk or (var.chunks and tuple(c[0] for c in var.chunks))
+        chunks = dask.array.core.normalize_chunks(
+            'auto',
+            shape=var.shape,
+            limit=policy['target_chunk_bytes'],
+            dtype=var.dtype,
+            previous_chunks=previous or var.shape,
+        )
+        return dict(zip(var.dims, chunks))
+
+    @staticmethod
+    def _log_graph_info(
+        ds: xr.Dataset,
+        strategy: str,
+    ) -> None:
+        """Log the number of dask chunks (w/o materializing the task graph)."""
+        n_chunks: int = 0
+        for var in ds.variables.values():
+            if isinstance(var.data, dask.array.Array):
+                n_chunks += math.prod(var.data.numblocks)
+        logger.info(f'Chunking strategy={strategy} -> {n_chunks} dask chunks.')
+
+    @classmethod
+    def apply(
+        cls,
+        ds: xr.Dataset,
+        overrides: Optional[Dict[str, Any]] = None,
+    ) -> xr.Dataset:
+        """Apply the chunking policy to a dataset.
+
+        Arguments:
+            ds: The opened dataset.
+            overrides: Per-asset overrides of the server-level policy.
+
+        Returns:
+            The (re)chunked dataset. Index coordinates are never chunked.
+        """
+        policy = cls.get_policy(overrides)
+        strategy: str = policy['strategy']
+
+        if strategy != 'none':
+            data_vars: Dict[str, xr.Variable] = {}
+            coords: Dict[str, xr.Variable] = {}
+            for name, var in ds.variables.items():
+                if name in ds.indexes:
+                    continue
+                chunks = cls._variable_chunks(var, policy)
+                if chunks is None:
+                    continue
+                if name in ds.coords:
+                    coords[name] = var.chunk(chunks)
+                else:
+                    data_vars[name] = var.chunk(chunks)
+            ds = ds.assign(data_vars).assign_coords(coords)
+
+        cls._log_graph_info(ds, strategy)
+        return ds
@@ -0,0 +1,205 @@
+"""
+An optional dask.distributed compute backend for dataset operations.
+"""
+import contextvars
+import logging
+import os
+import dask
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ComputeConfigDict(TypedDict):
+    """A dictionary to hold the optional dask.distributed configuration args.
+
+    NOTE: All arguments are optional. If scheduler_address is provided, the other
+        arguments are ignored and the external scheduler's workers are used.
+    Attributes:
+        scheduler_address: The address of an external dask scheduler.
+        n_workers: The number of LocalCluster workers.
+        threads_per_worker: The number of threads per LocalCluster worker.
+        memory_limit: The memory limit per LocalCluster worker (i.e., '4GiB').
+        processes: Whether LocalCluster workers are processes (default) or threads.
+        dashboard_address: The address to serve the dask dashboard from.
+    """
+    scheduler_address: Optional[str]
+    n_workers: Optional[int]
+    threads_per_worker: Optional[int]
+    memory_limit: Optional[str | int]
+    processes: Optional[bool]
+    dashboard_address: Optional[str]
+
+
+class ContextThreadPool(ThreadPoolExecutor):
+    """A thread pool running tasks in the context they were submitted from.
+
+    dask's threaded scheduler submits tasks from the thread calling compute(), so
+    contextvars (i.e., the current request's I/O account or span) follow the tasks.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        context: contextvars.Context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
+
+
+class DaskCompute:
+    """A class to hold the shared dask.distributed client.
+
+    Once configured, the client is set as the default dask scheduler, so all dask
+    computation triggered by xpublish plugins runs on its workers instead of the
+    threaded scheduler inside the web worker.
+    """
+
+    CLIENT: Any = None
+    CLUSTER: Any = None
+    N_WORKERS: int = 2
+    THREADS_PER_WORKER: int = 2
+    MEMORY_LIMIT: str | int = 'auto'
+    PROCESSES: bool = True
+    DASHBOARD_ADDRESS: str = ':8787'
+    CONTEXT_POOL: ContextThreadPool | None = None
+    # dask's pool setting before the context pool was installed
+    _PREVIOUS_POOL: Any = None
+    _POOL_INSTALLED: bool = False
+
+    @classmethod
+    def config_compute(
+        cls,
+        config_dict: Optional[ComputeConfigDict] = None,
+    ) -> None:
+        """Start (or connect to) a dask.distributed cluster.
+
+        Arguments:
+            config_dict: A dictionary of optional dask.distributed args.
+                If None, dask's default threaded scheduler is used.
+
+        Returns:
+            None. Sets the global CLIENT (and CLUSTER if a LocalCluster is started).
+        """
+        if config_dict is None:
+            return None
+
+        try:
+            from dask.distributed import (
+                Client,
+                LocalCluster,
+            )
+        except ImportError:
+            raise ImportError(
+                'dask.distributed is required to use param:config_compute_dict. '
+                'Please install it (i.e., pip install distributed).',
+            )
+
+        # only one shared client per process
+        cls.close()
+
+        scheduler_address: Optional[str] = config_dict.get('scheduler_address')
+        if scheduler_address:
+            logger.info(
+                f'Connecting to external dask scheduler @ {scheduler_address}.',
+            )
+            cls.CLIENT = Client(scheduler_address, set_as_default=True)
+        else:
+            cls.CLUSTER = LocalCluster(
+                n_workers=config_dict.get('n_workers', cls.N_WORKERS),
+                threads_per_worker=config_dict.get(
+                    'threads_per_worker',
+                    cls.THREADS_PER_WORKER,
+                ),
+                memory_limit=config_dict.get('memory_limit', cls.MEMORY_LIMIT),
+                processes=config_dict.get('processes', cls.PROCESSES),
+                dashboard_address=config_dict.get(
+                    'dashboard_address',
+                    cls.DASHBOARD_ADDRESS,
+                ),
+            )
+            cls.CLIENT = Client(cls.CLUSTER, set_as_default=True)
+        logger.info(
+            f'Using dask.distributed for dataset operations. '
+            f'Dashboard @ {cls.CLIENT.dashboard_link}',
+        )
+
+    @classmethod
+    def use_context_pool(cls) -> None:
+        """Use a shared ContextThreadPool for dask's threaded scheduler.
+
+        NOTE: This replaces dask's per calling thread pools w/ one pool of
+            cpu_count() threads (until restore_pool() is called). It has no effect
+            w/ a dask.distributed client.
+        """
+        if cls.CONTEXT_POOL is None:
+            cls.CONTEXT_POOL = ContextThreadPool(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix='catalog_to_xpublish-dask',
+            )
+        if not cls._POOL_INSTALLED:
+            cls._PREVIOUS_POOL = dask.config.get('pool', None)
+            cls._POOL_INSTALLED = True
+        dask.config.set(pool=cls.CONTEXT_POOL)
+
+    @classmethod
+    def restore_pool(cls) -> None:
+        """Restore dask's pool setting from before use_context_pool() (called by each create_app())."""
+        if not cls._POOL_INSTALLED:
+            return None
+        if cls._PREVIOUS_POOL is None:
+            dask.config.config.pop('pool', None)
+        else:
+            dask.config.set(pool=cls._PREVIOUS_POOL)
+        cls._PREVIOUS_POOL = None
+        cls._POOL_INSTALLED = False
+
+    @classmethod
+    def reset_after_fork(cls) -> None:
+        """Replace the context pool in a forked worker (its threads don't survive fork)."""
+        if cls.CONTEXT_POOL is not None:
+            cls.CONTEXT_POOL = None
+            if cls._POOL_INSTALLED:
+                cls.use_context_pool()
+
+    @classmethod
+    def close(cls) -> None:
+        """Close the shared client (and LocalCluster if we started it)."""
+        if cls.CLIENT is not None:
+            cls.CLIENT.close()
+            cls.CLIENT = None
+        if cls.CLUSTER is not None:
+            cls.CLUSTER.close()
+            cls.CLUSTER = None
+
+    @classmethod
+    def get_compute_info(cls) -> Dict[str, Any]:
+        """Returns the compute backend, dashboard link, and task metrics.
+
+        Will be added to the main application as @app.get('/compute').
+        """
+        if cls.CLIENT is None:
+            return {'scheduler': 'threaded'}
+
+        info: Dict[str, Any] = cls.CLIENT.scheduler_info()
+        workers: Dict[str, Dict[str, Any]] = {}
+        for address, worker in info.get('workers', {}).items():
+            metrics: Dict[str, Any] = worker.get('metrics', {})
+            workers[address] = {
+                'nthreads': worker.get('nthreads'),
+                'memory_limit': worker.get('memory_limit'),
+                'memory': metrics.get('memory'),
+                'cpu': metrics.get('cpu'),
+                'executing': metrics.get('task_counts', {}).get('executing', 0),
+                'in_memory': metrics.get('task_counts', {}).get('memory', 0),
+            }
+        return {
+            'scheduler': 'distributed',
+            'scheduler_address': info.get('address'),
+            'dashboard_link': cls.CLIENT.dashboard_link,
+            'n_workers': len(workers),
+            'total_threads': sum(w['nthreads'] or 0 for w in workers.values()),
+            'workers': workers,
+        }
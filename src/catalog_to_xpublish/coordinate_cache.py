@@ -0,0 +1,369 @@
+"""
+A host-wide on-disk cache of decoded coordinate arrays, attached to datasets as memory maps.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import xarray as xr
+from contextlib import contextmanager
+from pathlib import Path
+from catalog_to_xpublish.cache import (
+    get_user_cache_dir,
+    make_private_dir,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CoordinateCacheConfigDict(TypedDict):
+    """A dictionary to hold the optional coordinate cache args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        cache_dir: The directory holding the cached arrays. Workers (and servers) on a host
+            sharing it share the arrays. It must be owned by (and only writable by) the
+            server user (default is ~/.cache/catalog_to_xpublish/coordinates).
+        min_bytes: Coordinates smaller than this are not cached (default is 64 KiB).
+        max_bytes: The total size of the cached arrays. Least recently written dataset
+            versions are removed beyond it (default is 1 GiB).
+    """
+    cache_dir: Optional[str | Path]
+    min_bytes: Optional[int]
+    max_bytes: Optional[int]
+
+
+# the dataset version being opened in this context, and its source's validator
+_VERSION: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'catalog_to_xpublish_coordinate_version',
+    default=None,
+)
+_VALIDATOR: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'catalog_to_xpublish_coordinate_validator',
+    default=None,
+)
+
+
+def to_json_safe(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the JSON serializable items of attrs/encoding (numpy values as python ones).
+
+    Other values (i.e., zarr compressors, only used when writing) are dropped.
+    """
+    safe: Dict[str, Any] = {}
+    for key, value in mapping.items():
+        if isinstance(value, np.generic):
+            value = value.item()
+        elif isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, np.dtype):
+            value = value.str
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        safe[str(key)] = value
+    return safe
+
+
+def decode_manifest(manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Restores the dims/encoding types of a (JSON) coordinate manifest in place."""
+    for entry in manifest.values():
+        entry['dims'] = tuple(entry['dims'])
+        encoding: Dict[str, Any] = entry['encoding']
+        if 'dtype' in encoding:
+            encoding['dtype'] = np.dtype(encoding['dtype'])
+        if isinstance(encoding.get('chunks'), list):
+            encoding['chunks'] = tuple(encoding['chunks'])
+    return manifest
+
+
+class CoordinateCache:
+    """A class to hold the coordinate cache configuration.
+
+    Decoded 1D/2D coordinate arrays (i.e., time, lat, lon) of opened datasets are
+    written as .npy files to a directory per dataset version (see
+    DatasetCache.dataset_version) and source validator (see validate()), then
+    attached to the dataset as read-only memory maps. Every process opening the
+    same version maps the same files, so
+    the arrays are read from the store once, and held in memory once, per host.
+    """
+
+    ENABLED: bool = False
+    CACHE_DIR: Path = get_user_cache_dir() / 'coordinates'
+    MIN_BYTES: int = 64 * 2**10
+    MAX_BYTES: int = 2**30
+    MANIFEST: str = 'coordinates.json'
+    MANIFESTS: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    _lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def __validate_size(
+        name: str,
+        size: int,
+    ) -> int:
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValueError(
+                f'{name} must be a non-negative int, not {size}',
+            )
+        return size
+
+    @classmethod
+    def config_coordinate_cache(
+        cls,
+        config_dict: Optional[CoordinateCacheConfigDict] = None,
+    ) -> None:
+        """Configure the shared coordinate cache.
+
+        Arguments:
+            config_dict: A dictionary of optional coordinate cache args.
+                If None, coordinates are read into each process's memory.
+
+        Returns:
+            None. Sets the global coordinate cache configuration.
+        """
+        cls.MANIFESTS = {}
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        cls.CACHE_DIR = Path(config_dict.get('cache_dir') or get_user_cache_dir() / 'coordinates')
+        cls.MIN_BYTES = cls.__validate_size(
+            'min_bytes',
+            config_dict.get('min_bytes', cls.MIN_BYTES),
+        )
+        cls.MAX_BYTES = cls.__validate_size(
+            'max_bytes',
+            config_dict.get('max_bytes', cls.MAX_BYTES),
+        )
+        make_private_dir(cls.CACHE_DIR)
+        cls.ENABLED = True
+        logger.info(
+            f'Caching coordinates of >= {cls.MIN_BYTES} bytes in {cls.CACHE_DIR} '
+            f'(up to {cls.MAX_BYTES / 2**20:.1f} MiB).',
+        )
+
+    @classmethod
+    @contextmanager
+    def scope(
+        cls,
+        version: str,
+    ) -> Iterator[None]:
+        """Marks the dataset version being opened, so IO classes can skip cached coordinates."""
+        context_token = _VERSION.set(version)
+        validator_token = _VALIDATOR.set(None)
+        try:
+            yield None
+        finally:
+            _VALIDATOR.reset(validator_token)
+            _VERSION.reset(context_token)
+
+    @staticmethod
+    def validate(validator: str | None) -> None:
+        """Records the validator (i.e., ETag/mtime) of the source being opened.
+
+        IO classes call it before cached_variables(). The coordinates of sources w/o a
+        validator are not cached, as a rewrite of their values could not be detected.
+        """
+        _VALIDATOR.set(validator)
+
+    @staticmethod
+    def cache_key() -> str | None:
+        """Returns the cache key (dataset version and source validator) being opened."""
+        version: str | None = _VERSION.get()
+        validator: str | None = _VALIDATOR.get()
+        if version is None or validator is None:
+            return None
+        return f'{version}-{hashlib.sha256(validator.encode()).hexdigest()[:16]}'
+
+    @classmethod
+    def cached_variables(cls) -> List[str]:
+        """Returns the cached coordinate names of the source being opened.
+
+        IO classes can drop them when opening (i.e., xarray's drop_variables) to skip
+        reading them from the store. They are added back by attach().
+        """
+        key: str | None = cls.cache_key()
+        if not cls.ENABLED or key is None:
+            return []
+        return list((cls.get_manifest(key) or {}).keys())
+
+    @classmethod
+    def get_manifest(
+        cls,
+        version: str,
+    ) -> Dict[str, Dict[str, Any]] | None:
+        """Returns the cached coordinates of a dataset version (None if not cached)."""
+        manifest = cls.MANIFESTS.get(version)
+        if manifest is not None:
+            return manifest
+        try:
+            with open(cls.CACHE_DIR / version / cls.MANIFEST, 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except ValueError:
+            logger.warning(f'Ignoring the unreadable coordinate cache manifest of {version}.')
+            return None
+        manifest = decode_manifest(manifest)
+        cls.MANIFESTS[version] = manifest
+        return manifest
+
+    @classmethod
+    def write(
+        cls,
+        ds: xr.Dataset,
+        version: str,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Writes a dataset's decoded coordinates to the cache, returning their manifest.
+
+        Arrays are written to a temporary directory that is renamed into place, so
+        processes racing to cache the same version never see partial files.
+        """
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f'.{version}-', dir=cls.CACHE_DIR))
+        manifest: Dict[str, Dict[str, Any]] = {}
+        try:
+            for i, (name, coord) in enumerate(ds.coords.items()):
+                variable: xr.Variable = coord.variable
+                if (
+                    variable.ndim not in (1, 2)
+                    or variable.dtype.kind not in 'biufcmM'
+                    or variable.nbytes < cls.MIN_BYTES
+                ):
+                    continue
+                np.save(tmp_dir / f'{i}.npy', variable.values, allow_pickle=False)
+                manifest[name] = {
+                    'file': f'{i}.npy',
+                    'dims': list(variable.dims),
+                    'shape': list(variable.shape),
+                    'attrs': to_json_safe(variable.attrs),
+                    'encoding': to_json_safe(variable.encoding),
+                }
+            with open(tmp_dir / cls.MANIFEST, 'w') as f:
+                json.dump(manifest, f)
+            os.rename(tmp_dir, cls.CACHE_DIR / version)
+        except OSError:
+            # another process cached the version first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return cls.get_manifest(version) or decode_manifest(manifest)
+        manifest = decode_manifest(manifest)
+        cls.MANIFESTS[version] = manifest
+        cls.evict(keep=version)
+        return manifest
+
+    @classmethod
+    def evict(
+        cls,
+        keep: Optional[str] = None,
+    ) -> None:
+        """Removes the least recently written versions while the cache is over MAX_BYTES.
+
+        NOTE: Processes that mapped a removed version's files keep using them.
+        """
+        with cls._lock:
+            versions: List[tuple[float, int, Path]] = []
+            for version_dir in cls.CACHE_DIR.iterdir():
+                if not version_dir.is_dir() or version_dir.name.startswith('.'):
+                    continue
+                size: int = sum(f.stat().st_size for f in version_dir.iterdir())
+                versions.append((version_dir.stat().st_mtime, size, version_dir))
+            total: int = sum(size for _, size, _ in versions)
+            for _, size, version_dir in sorted(versions):
+                if total <= cls.MAX_BYTES:
+                    break
+                if version_dir.name == keep:
+                    continue
+                shutil.rmtree(version_dir, ignore_errors=True)
+                cls.MANIFESTS.pop(version_dir.name, None)
+                total -= size
+
+    @classmethod
+    def invalidate(
+        cls,
+        version: str,
+    ) -> None:
+        """Removes a dataset version's cached coordinates."""
+        with cls._lock:
+            cls.MANIFESTS.pop(version, None)
+            shutil.rmtree(cls.CACHE_DIR / version, ignore_errors=True)
+
+    @staticmethod
+    def is_stale(
+        ds: xr.Dataset,
+        manifest: Dict[str, Dict[str, Any]],
+    ) -> bool:
+        """Returns whether a dataset's dimensions no longer match its cached coordinates."""
+        for entry in manifest.values():
+            for dim, size in zip(entry['dims'], entry['shape']):
+                if ds.sizes.get(dim, size) != size:
+                    return True
+        return False
+
+    @classmethod
+    def attach(
+        cls,
+        ds: xr.Dataset,
+        reopen: Callable[[], xr.Dataset],
+    ) -> xr.Dataset:
+        """Replaces a dataset's cached coordinates w/ memory maps (caching them if needed).
+
+        Called in scope() after opening. Cached arrays are keyed by the dataset version
+        and the source's validator (see validate()), so a rewritten store is a new key.
+        Coordinates dropped when opening (see cached_variables()) are added back. If the
+        dimension sizes no longer match the cached coordinates anyway, they are removed,
+        and the dataset is reopened to read (and cache) its current ones.
+        """
+        if not cls.ENABLED:
+            return ds
+        key: str | None = cls.cache_key()
+        if key is None:
+            Metrics.COORDINATE_CACHE_LOOKUPS.inc(result='unvalidated')
+            return ds
+
+        manifest = cls.get_manifest(key)
+        if manifest is not None and cls.is_stale(ds, manifest):
+            logger.info(
+                f'Re-caching the coordinates of {key}, its dimension sizes changed.',
+            )
+            Metrics.COORDINATE_CACHE_LOOKUPS.inc(result='stale')
+            cls.invalidate(key)
+            ds = reopen()
+            key = cls.cache_key()
+            if key is None:
+                return ds
+            manifest = cls.get_manifest(key)
+        else:
+            Metrics.COORDINATE_CACHE_LOOKUPS.inc(result='miss' if manifest is None else 'hit')
+        if manifest is None:
+            manifest = cls.write(ds, key)
+
+        coords: Dict[str, xr.Variable] = {}
+        for name, entry in manifest.items():
+            data: Any = np.load(cls.CACHE_DIR / key / entry['file'], mmap_mode='r')
+            if entry['dims'] == (name,):
+                # xarray copies datetime arrays, but wraps an index as is
+                data = pd.Index(data, name=name)
+            coords[name] = xr.Variable(
+                entry['dims'],
+                data,
+                attrs=entry['attrs'],
+                encoding=entry['encoding'],
+            )
+        return ds.assign_coords(coords)
@@ -0,0 +1,370 @@
+"""
+Per-request deadlines and cancellation of remote reads (i.e., slow dataset opens and chunk reads).
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import fsspec
+from contextlib import contextmanager
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.compute import (
+    DaskCompute,
+)
+from catalog_to_xpublish.fs_hooks import (
+    READ_METHODS,
+    FileSystemRead,
+    hook_filesystem,
+)
+from typing import (
+    Any,
+    Awaitable,
+    Coroutine,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineConfigDict(TypedDict):
+    """A dictionary to hold the optional deadline args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        open_timeout: Seconds a dataset open (cache miss) may take (default is no limit).
+        read_timeout: Seconds after the start of a request its remote reads (i.e., zarr chunks)
+            are aborted (default is no limit). Dataset opens use open_timeout instead.
+        cancel_on_disconnect: Whether to abort a request's remote reads when its client
+            disconnects (default is True).
+    """
+    open_timeout: Optional[float]
+    read_timeout: Optional[float]
+    cancel_on_disconnect: Optional[bool]
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a remote read is attempted (or in flight) past its deadline.
+
+    NOTE: Not an OSError, so fsspec/zarr don't mistake it for a missing key (and fill values).
+    """
+
+
+class RequestCancelled(Exception):
+    """Raised when a remote read is attempted (or in flight) after its request was cancelled."""
+
+
+class CancelToken:
+    """The deadline and cancellation state of a request (or of a dataset open within it).
+
+    In flight async fsspec reads are registered w/ the token, so they can be
+    cancelled from any thread (i.e., the event loop, when a client disconnects).
+    Child tokens (i.e., dataset opens) share their parent's cancellation.
+    """
+    __slots__ = ('deadline', 'reason', 'parent', '_cancelled', '_tasks', '_lock')
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        parent: Optional['CancelToken'] = None,
+    ) -> None:
+        self.deadline = deadline
+        self.parent = parent
+        self.reason: str = ''
+        self._cancelled: bool = False
+        self._tasks: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = (
+            parent._tasks if parent else set()
+        )
+        self._lock: threading.Lock = parent._lock if parent else threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def get_reason(self) -> str:
+        if self._cancelled or self.parent is None:
+            return self.reason
+        return self.parent.get_reason()
+
+    def remaining(self) -> Optional[float]:
+        """Returns the seconds left before the deadline (None if there is none)."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def cancel(
+        self,
+        reason: str,
+    ) -> None:
+        """Cancels the token (and its in flight reads)."""
+        with self._lock:
+            self._cancelled = True
+            self.reason = reason
+            for loop, task in list(self._tasks):
+                loop.call_soon_threadsafe(task.cancel)
+
+    def check(self) -> None:
+        """Raises if the token was cancelled or its deadline passed."""
+        if self.cancelled:
+            raise RequestCancelled(self.get_reason())
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded('Remote reads exceeded their deadline.')
+
+    async def run(
+        self,
+        coro: Any,
+    ) -> Any:
+        """Awaits a coroutine, aborting it at the deadline or on cancellation."""
+        try:
+            self.check()
+        except Exception:
+            coro.close()
+            raise
+        task: asyncio.Task = asyncio.ensure_future(coro)
+        entry = (asyncio.get_running_loop(), task)
+        with self._lock:
+            self._tasks.add(entry)
+            if self.cancelled:
+                task.cancel()
+        try:
+            return await asyncio.wait_for(task, self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded('A remote read exceeded its deadline.') from None
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if self.cancelled and not (current and current.cancelling()):
+                raise RequestCancelled(self.get_reason()) from None
+            raise
+        finally:
+            with self._lock:
+                self._tasks.discard(entry)
+
+
+# the token of the request (or dataset open) being served in this context
+_CANCEL_TOKEN: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    'catalog_to_xpublish_cancel_token',
+    default=None,
+)
+
+
+class Deadlines:
+    """A class to hold the deadline configuration."""
+
+    ENABLED: bool = False
+    OPEN_TIMEOUT: float | None = None
+    READ_TIMEOUT: float | None = None
+    CANCEL_ON_DISCONNECT: bool = True
+
+    @staticmethod
+    def __validate_timeout(
+        name: str,
+        timeout: float | None,
+    ) -> float | None:
+        if timeout is None:
+            return None
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+            raise ValueError(
+                f'{name} must be a positive number of seconds, not {timeout}',
+            )
+        return float(timeout)
+
+    @classmethod
+    def config_deadlines(
+        cls,
+        config_dict: Optional[DeadlineConfigDict] = None,
+    ) -> None:
+        """Configure request deadlines and cancellation.
+
+        Arguments:
+            config_dict: A dictionary of optional deadline args.
+                If None, remote reads are never aborted.
+
+        Returns:
+            None. Sets the global deadline configuration.
+        """
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        cls.OPEN_TIMEOUT = cls.__validate_timeout('open_timeout', config_dict.get('open_timeout'))
+        cls.READ_TIMEOUT = cls.__validate_timeout('read_timeout', config_dict.get('read_timeout'))
+        cls.CANCEL_ON_DISCONNECT = bool(config_dict.get('cancel_on_disconnect', True))
+        cls.ENABLED = True
+
+        # run dask tasks in their request's context, so chunk reads see its token
+        DaskCompute.use_context_pool()
+        logger.info(
+            f'Aborting dataset opens after {cls.OPEN_TIMEOUT}s, request reads after '
+            f'{cls.READ_TIMEOUT}s (cancel_on_disconnect={cls.CANCEL_ON_DISCONNECT}).',
+        )
+
+    @staticmethod
+    def current() -> CancelToken | None:
+        """Returns the token of the current context (if any)."""
+        return _CANCEL_TOKEN.get()
+
+    @classmethod
+    def check(cls) -> None:
+        """Raises if the current request was cancelled or its deadline passed."""
+        token: CancelToken | None = _CANCEL_TOKEN.get()
+        if token is not None:
+            token.check()
+
+    @classmethod
+    @contextmanager
+    def scope(
+        cls,
+        timeout: Optional[float] = None,
+    ) -> Iterator[CancelToken | None]:
+        """Runs a block w/ its own deadline (and the current request's cancellation).
+
+        If timeout is None, the current deadline applies.
+        """
+        if not cls.ENABLED:
+            yield None
+            return None
+        parent: CancelToken | None = _CANCEL_TOKEN.get()
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        else:
+            deadline = parent.deadline if parent else None
+        token = CancelToken(deadline=deadline, parent=parent)
+        context_token = _CANCEL_TOKEN.set(token)
+        try:
+            yield token
+        finally:
+            _CANCEL_TOKEN.reset(context_token)
+
+    @classmethod
+    def instrument_filesystem(
+        cls,
+        fs: fsspec.AbstractFileSystem,
+    ) -> fsspec.AbstractFileSystem:
+        """Aborts a filesystem's reads past the current deadline or on cancellation (in place).
+
+        In flight async reads are cancelled. Batched reads (cat) are checked once
+        gathered, since zarr drops failed keys from them (filling their chunks).
+        """
+        def check_before(read: FileSystemRead) -> None:
+            cls.check()
+
+        def check_after(
+            read: FileSystemRead,
+            state: None,
+            result: Any,
+            error: BaseException | None,
+        ) -> None:
+            if error is None and read.method == 'cat':
+                cls.check()
+
+        def run(read: FileSystemRead, coro: Coroutine) -> Awaitable:
+            token: CancelToken | None = _CANCEL_TOKEN.get()
+            if token is None or read.method != 'cat_file':
+                return coro
+            return token.run(coro)
+
+        return hook_filesystem(
+            fs,
+            'deadlines',
+            before=check_before,
+            after=check_after,
+            run=run,
+            methods=READ_METHODS,
+        )
+
+    @staticmethod
+    async def handle_exception(
+        request: Request,
+        exc: Exception,
+    ) -> JSONResponse:
+        """Returns a 504 for requests past their deadline (499 if the client disconnected).
+
+        Will be added to the main and mounted applications as an exception handler.
+        """
+        if isinstance(exc, RequestCancelled):
+            return JSONResponse({'detail': f'Request cancelled ({exc}).'}, status_code=499)
+        logger.warning(f'{request.url.path} exceeded its deadline: {exc}')
+        return JSONResponse({'detail': str(exc)}, status_code=504)
+
+
+class DeadlineMiddleware:
+    """A pure ASGI middleware giving each request a cancel token (and deadline).
+
+    The token is cancelled when the client disconnects, aborting the request's
+    remote reads in worker/dask threads and fsspec's event loop.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+    ) -> None:
+        self.app = app
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        if scope['type'] != 'http' or not Deadlines.ENABLED:
+            await self.app(scope, receive, send)
+            return None
+
+        token = CancelToken(
+            deadline=time.monotonic() + Deadlines.READ_TIMEOUT if Deadlines.READ_TIMEOUT else None,
+        )
+        context_token = _CANCEL_TOKEN.set(token)
+        if not Deadlines.CANCEL_ON_DISCONNECT:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _CANCEL_TOKEN.reset(context_token)
+            return None
+
+        # read the client's messages in the background to notice a disconnect early
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected: List[bool] = [False]
+        response_complete: List[bool] = [False]
+
+        async def watch_disconnect() -> None:
+            while True:
+                message: Message = await receive()
+                await messages.put(message)
+                if message['type'] == 'http.disconnect':
+                    # servers also report a disconnect once the response is sent
+                    if not response_complete[0]:
+                        disconnected[0] = True
+                        token.cancel('client disconnected')
+                    return None
+
+        async def receive_wrapper() -> Message:
+            if messages.empty() and (disconnected[0] or watcher.done()):
+                return {'type': 'http.disconnect'}
+            return await messages.get()
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_complete[0] = True
+            await send(message)
+
+        watcher: asyncio.Task = asyncio.create_task(watch_disconnect())
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            watcher.cancel()
+            _CANCEL_TOKEN.reset(context_token)
+            if disconnected[0]:
+                logger.info(f'Client disconnected from {scope.get("path", "")}, reads cancelled.')
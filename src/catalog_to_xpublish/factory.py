@@ -1,17 +1,48 @@
 """
 A factory for creating and validating catalog implementations (i.e., STAC, Intake, etc.).
+
+Implementations are registered lazily: the modules defining a catalog type's classes
+(and importing its dependencies, i.e., intake or pystac) are only imported once that
+catalog type is requested. Other packages can provide catalog types via the
+'catalog_to_xpublish.catalogs' entry point group (name=catalog type, value=a module
+registering its classes w/ the decorators below).
 """
 import dataclasses
+import importlib
+import importlib.metadata
+import logging
 from catalog_to_xpublish.base import (
     CatalogSearcher,
     CatalogToXarray,
     CatalogRouter,
 )
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
 from typing import (
     List,
     Dict,
+    Set,
 )
 
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP: str = 'catalog_to_xpublish.catalogs'
+
+# the modules registering the built-in catalog implementations (imported on first use)
+BUILTIN_IMPLEMENTATIONS: Dict[str, List[str]] = {
+    'intake': [
+        'catalog_to_xpublish.searchers.intake_search',
+        'catalog_to_xpublish.io.intake_io',
+        'catalog_to_xpublish.routers.intake_router',
+    ],
+    'stac': [
+        'catalog_to_xpublish.searchers.stac_search',
+        'catalog_to_xpublish.io.stac_io',
+        'catalog_to_xpublish.routers.stac_router',
+    ],
+}
+
 
 @dataclasses.dataclass
 class CatalogImplementation:
@@ -74,8 +105,10 @@ class CatalogImplementationFactory:
     __catalog_searchers: Dict[str, CatalogSearcher] = {}
     __catalog_io_classes: Dict[str, CatalogToXarray] = {}
     __catalog_routers: Dict[str, CatalogRouter] = {}
-    __catalog_type_keys: List[str] = []
     __catalog_implementations: Dict[str, CatalogImplementation] = {}
+    __lazy_implementations: Dict[str, List[str]] = dict(BUILTIN_IMPLEMENTATIONS)
+    __loaded_types: Set[str] = set()
+    __entry_points_discovered: bool = False
 
     @classmethod
     def register_searcher(
@@ -104,6 +137,58 @@ class CatalogImplementationFactory:
             catalog_router.catalog_type
         ] = catalog_router
 
+    @classmethod
+    def register_lazy(
+        cls,
+        catalog_type: str,
+        modules: List[str],
+    ) -> None:
+        """Registers the modules to import (registering a catalog type's classes) on first use."""
+        cls.__lazy_implementations[catalog_type.lower()] = list(modules)
+
+    @classmethod
+    def __discover_entry_points(cls) -> None:
+        """Registers the catalog types provided by installed packages (once)."""
+        if cls.__entry_points_discovered:
+            return None
+        cls.__entry_points_discovered = True
+        for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+            catalog_type: str = entry_point.name.lower()
+            if catalog_type in cls.__lazy_implementations:
+                logger.warning(
+                    f'Ignoring entry point {entry_point.value} for already '
+                    f'registered catalog_type={catalog_type}.',
+                )
+                continue
+            cls.register_lazy(catalog_type, [entry_point.module])
+
+    @classmethod
+    def get_catalog_types(cls) -> List[str]:
+        """Returns all available catalog types (w/o importing their dependencies)."""
+        cls.__discover_entry_points()
+        return sorted(
+            set(cls.__lazy_implementations)
+            | set(cls.__catalog_searchers)
+            | set(cls.__catalog_io_classes)
+            | set(cls.__catalog_routers),
+        )
+
+    @classmethod
+    def load_implementation(
+        cls,
+        catalog_type: str,
+    ) -> None:
+        """Imports the modules registering a catalog type's classes (if not yet loaded)."""
+        if catalog_type in cls.__loaded_types:
+            return None
+        if catalog_type not in cls.__lazy_implementations:
+            cls.__discover_entry_points()
+        modules: List[str] = cls.__lazy_implementations.get(catalog_type, [])
+        with StartupReport.import_stage(f'import {catalog_type} implementation'):
+            for module in modules:
+                importlib.import_module(module)
+        cls.__loaded_types.add(catalog_type)
+
     @classmethod
     def _get_catalog_dicts(
         cls,
@@ -119,7 +204,7 @@ class CatalogImplementationFactory:
     def __get_catalog_type_keys(
         cls,
     ) -> List[str]:
-        """Returns a list of all catalog types."""
+        """Returns a list of all registered catalog types."""
         catalog_dicts = cls._get_catalog_dicts()
         if catalog_dicts == [{}, {}, {}]:
             raise ValueError(
@@ -127,34 +212,28 @@ class CatalogImplementationFactory:
             )
 
         # make sure there are no partial implementations
-        if len(cls.__catalog_type_keys) == 0:
-
-            for i, catalog_dict in enumerate(catalog_dicts):
-                if i == 0:
-                    all_keys = list(set(catalog_dict.keys()))
-                else:
-                    more_keys = set(
-                        all_keys.copy() + list(catalog_dict.keys()),
-                    )
-                    if len(more_keys) != len(all_keys):
-                        raise ValueError(
-                            f'Found a partial implementation of a catalog type! '
-                            f'There must a a valid CatalogSearcher, CatalogToXarray, and CatalogRouter '
-                            f'for each catalog type. ',
-                        )
-                    else:
-                        all_keys = list(more_keys)
-            cls.__catalog_type_keys = all_keys
-        return cls.__catalog_type_keys
+        all_keys: Set[str] = set().union(*catalog_dicts)
+        if any(set(catalog_dict) != all_keys for catalog_dict in catalog_dicts):
+            raise ValueError(
+                f'Found a partial implementation of a catalog type! '
+                f'There must a a valid CatalogSearcher, CatalogToXarray, and CatalogRouter '
+                f'for each catalog type. ',
+            )
+        return list(all_keys)
 
     @classmethod
     def get_all_implementations(
         cls,
     ) -> Dict[str, CatalogImplementation]:
-        """Returns a dictionary of valid catalog type implementations."""
-        catalog_keys = cls.__get_catalog_type_keys()
-        if len(cls.__catalog_implementations) != len(catalog_keys):
-            for catalog_type in cls.__get_catalog_type_keys():
+        """Returns a dictionary of valid catalog type implementations.
+
+        NOTE: This imports every available catalog type, use get_catalog_implementation()
+            to only import the dependencies of one.
+        """
+        for catalog_type in cls.get_catalog_types():
+            cls.load_implementation(catalog_type)
+        for catalog_type in cls.__get_catalog_type_keys():
+            if catalog_type not in cls.__catalog_implementations:
                 cls.__catalog_implementations[catalog_type] = CatalogImplementation(
                     catalog_search=cls.__catalog_searchers[catalog_type],
                     catalog_to_xarray=cls.__catalog_io_classes[catalog_type],
@@ -167,4 +246,19 @@ class CatalogImplementationFactory:
         cls,
         catalog_type: str,
     ) -> CatalogImplementation:
-        return cls.get_all_implementations()[catalog_type]
+        """Returns a catalog type's implementation (importing only its modules)."""
+        if catalog_type not in cls.__catalog_implementations:
+            cls.load_implementation(catalog_type)
+            classes = [catalog_dict.get(catalog_type) for catalog_dict in cls._get_catalog_dicts()]
+            if not any(classes):
+                raise KeyError(
+                    f'catalog_type={catalog_type} is not in {cls.get_catalog_types()}.',
+                )
+            if not all(classes):
+                raise ValueError(
+                    f'Found a partial implementation of catalog_type={catalog_type}! '
+                    f'There must a a valid CatalogSearcher, CatalogToXarray, and CatalogRouter '
+                    f'for each catalog type. ',
+                )
+            cls.__catalog_implementations[catalog_type] = CatalogImplementation(*classes)
+        return cls.__catalog_implementations[catalog_type]
@@ -0,0 +1,196 @@
+"""
+Federated serving of multiple (mixed type) catalogs under different prefixes from one app.
+"""
+import logging
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+)
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogConfigDict(TypedDict):
+    """A dictionary to hold a federated catalog and its (optional) resource quotas.
+
+    NOTE: catalog_path and catalog_type are required, quotas are optional.
+    Attributes:
+        catalog_path: The path to the catalog file (i.e., yaml or json).
+        catalog_type: The type of catalog to parse (i.e., intake or stac).
+        max_concurrency: The number of dataset requests served at once across the
+            catalog's endpoints (enables admission control if not configured).
+        max_queue: The number of requests waiting for a catalog slot (default is 50).
+        max_datasets: The number of the catalog's opened datasets kept in the shared
+            dataset cache (default is no quota, only the cache wide max_datasets).
+        max_result_bytes: The total size of the catalog's computed results kept in the
+            shared result cache (default is no quota).
+    """
+    catalog_path: Path | str
+    catalog_type: str
+    max_concurrency: Optional[int]
+    max_queue: Optional[int]
+    max_datasets: Optional[int]
+    max_result_bytes: Optional[int]
+
+
+class Federation:
+    """A class to hold the federated catalogs configuration.
+
+    Each catalog is crawled separately, and its catalog endpoints are served under
+    its prefix (i.e., /stac/sub-catalog/datasets/...). As endpoint catalog paths
+    include the prefix, the (server wide) dataset/result caches, filesystems, worker
+    pools and metrics are shared by all catalogs w/o collisions, while quotas bound
+    each catalog's share of them.
+    """
+
+    ENABLED: bool = False
+    CATALOGS: Dict[str, CatalogConfigDict] = {}
+    QUEUE: int = 50
+
+    @staticmethod
+    def __validate_prefix(prefix: str) -> str:
+        """Validate a catalog prefix (i.e., '/stac')."""
+        if (
+            not isinstance(prefix, str)
+            or not prefix.startswith('/')
+            or prefix.endswith('/')
+            or '//' in prefix
+        ):
+            raise ValueError(
+                f'Catalog prefixes must look like /name (no trailing /), not {prefix}',
+            )
+        return prefix
+
+    @staticmethod
+    def __validate_quota(
+        name: str,
+        value: int | None,
+        allow_zero: bool = False,
+    ) -> int | None:
+        """Validate a catalog quota."""
+        if value is None:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool) or value < (0 if allow_zero else 1):
+            raise ValueError(
+                f'{name} must be a {"non-negative" if allow_zero else "positive"} int, not {value}',
+            )
+        return value
+
+    @classmethod
+    def config_federation(
+        cls,
+        catalogs: Optional[Dict[str, CatalogConfigDict]] = None,
+    ) -> None:
+        """Configure the federated catalogs (and their shared cache quotas).
+
+        NOTE: Must be called after DatasetCache.config_cache(), which resets quotas.
+
+        Arguments:
+            catalogs: A dictionary of catalogs by the prefix they are served under.
+                If None, a single catalog is served at the root.
+
+        Returns:
+            None. Sets the global federation configuration.
+        """
+        cls.CATALOGS = {}
+        if catalogs is None:
+            cls.ENABLED = False
+            return None
+        if not isinstance(catalogs, dict) or not catalogs:
+            raise ValueError(
+                f'catalogs must be a non-empty dictionary of catalogs by prefix, not {catalogs}',
+            )
+
+        prefixes: List[str] = sorted(catalogs)
+        for prefix in prefixes:
+            cls.__validate_prefix(prefix)
+            config_dict: CatalogConfigDict = catalogs[prefix]
+            if not isinstance(config_dict, dict) or not {'catalog_path', 'catalog_type'} <= set(config_dict):
+                raise ValueError(
+                    f'The catalog @ {prefix} must be a dictionary w/ catalog_path and catalog_type',
+                )
+            cls.__validate_quota('max_concurrency', config_dict.get('max_concurrency'))
+            cls.__validate_quota('max_queue', config_dict.get('max_queue'), True)
+            cls.__validate_quota('max_datasets', config_dict.get('max_datasets'), True)
+            cls.__validate_quota('max_result_bytes', config_dict.get('max_result_bytes'), True)
+        # nested prefixes would make a request's catalog ambiguous
+        for parent, child in zip(prefixes, prefixes[1:]):
+            if child.startswith(f'{parent}/'):
+                raise ValueError(
+                    f'Catalog prefixes can not be nested ({child} is under {parent})',
+                )
+
+        cls.CATALOGS = dict(catalogs)
+        cls.ENABLED = True
+        for cache, quota in [
+            (DatasetCache.DATASETS, 'max_datasets'),
+            (DatasetCache.RESULTS, 'max_result_bytes'),
+        ]:
+            cache.quotas = {
+                prefix: config_dict[quota]
+                for prefix, config_dict in cls.CATALOGS.items()
+                if config_dict.get(quota) is not None
+            }
+        logger.info(
+            f'Serving {len(cls.CATALOGS)} federated catalogs @ {list(cls.CATALOGS)}.',
+        )
+
+    @classmethod
+    def get_catalog(
+        cls,
+        path: str,
+    ) -> str | None:
+        """Returns the prefix of the catalog a (catalog or request) path is under, if any."""
+        if not cls.ENABLED:
+            return None
+        for prefix in cls.CATALOGS:
+            if path == prefix or path.startswith(f'{prefix}/'):
+                return prefix
+        return None
+
+    @classmethod
+    def get_concurrency_quota(
+        cls,
+        prefix: str,
+    ) -> tuple[int | None, int]:
+        """Returns a catalog's (max_concurrency, max_queue)."""
+        config_dict: CatalogConfigDict = cls.CATALOGS.get(prefix, {})
+        max_queue: int | None = config_dict.get('max_queue')
+        return config_dict.get('max_concurrency'), cls.QUEUE if max_queue is None else max_queue
+
+    @classmethod
+    def has_concurrency_quotas(cls) -> bool:
+        return any(
+            config_dict.get('max_concurrency') is not None
+            for config_dict in cls.CATALOGS.values()
+        )
+
+    @staticmethod
+    def prefix_endpoints(
+        prefix: str,
+        catalog_endpoints: List[CatalogEndpoint],
+    ) -> List[CatalogEndpoint]:
+        """Returns copies of a catalog's endpoints w/ their catalog paths under its prefix."""
+        return [
+            cat_end.model_copy(
+                update={'catalog_path': prefix + cat_end.catalog_path.rstrip('/')},
+            )
+            for cat_end in catalog_endpoints
+        ]
+
+    @classmethod
+    def list_catalogs(cls) -> List[str]:
+        """Returns a list of the federated catalogs.
+
+        Will be added to the main application as @app.get('/catalogs').
+        """
+        return [prefix.lstrip('/') for prefix in cls.CATALOGS]
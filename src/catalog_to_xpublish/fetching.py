@@ -0,0 +1,122 @@
+"""
+Concurrent (batched) chunk fetching from async fsspec filesystems.
+"""
+import logging
+import fsspec
+from fsspec.asyn import AsyncFileSystem
+from catalog_to_xpublish.deadlines import (
+    Deadlines,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+from typing import (
+    Any,
+    Dict,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FetchingConfigDict(TypedDict):
+    """A dictionary to hold the optional chunk fetching configuration args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        max_concurrency: The max number of in-flight requests per batched read.
+    """
+    max_concurrency: Optional[int]
+
+
+class ConcurrentFetching:
+    """A class to hold the chunk fetching configuration.
+
+    When zarr needs several chunks (i.e., a dask chunk spanning many zarr chunks),
+    it calls getitems() on the store, which is passed to the filesystem's batched
+    cat(). On async filesystems (s3, https) this fetches all keys concurrently,
+    limited by the filesystem's batch_size.
+    """
+
+    MAX_CONCURRENCY: int = 64
+
+    @staticmethod
+    def __validate_max_concurrency(
+        max_concurrency: int,
+    ) -> int:
+        """Validate the max_concurrency argument."""
+        if not isinstance(max_concurrency, int) or isinstance(max_concurrency, bool):
+            raise TypeError(
+                f'max_concurrency must be an int, not {type(max_concurrency)}',
+            )
+        if max_concurrency < 1:
+            raise ValueError(
+                f'max_concurrency={max_concurrency} must be >= 1.',
+            )
+        return max_concurrency
+
+    @classmethod
+    def config_fetching(
+        cls,
+        config_dict: Optional[FetchingConfigDict] = None,
+    ) -> None:
+        """Configure concurrent chunk fetching.
+
+        Arguments:
+            config_dict: A dictionary of optional fetching configuration args.
+                If None, the defaults are used.
+
+        Returns:
+            None. Sets the global fetching configuration.
+
+        NOTE: Only the (private) filesystems created by get_filesystem() are limited,
+            the process-wide fsspec defaults and cached instances are left as is.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        cls.MAX_CONCURRENCY = cls.__validate_max_concurrency(
+            config_dict.get('max_concurrency', 64),
+        )
+        logger.info(
+            f'Batched chunk reads will use up to {cls.MAX_CONCURRENCY} concurrent requests.',
+        )
+
+    @classmethod
+    def get_filesystem(
+        cls,
+        protocol: str,
+        storage_options: Optional[Dict[str, Any]] = None,
+    ) -> fsspec.AbstractFileSystem:
+        """Returns a filesystem whose batched reads are concurrency limited.
+
+        Arguments:
+            protocol: The fsspec protocol (i.e., s3, https, or file).
+            storage_options: Kwargs passed into the filesystem constructor.
+
+        Returns:
+            A new fsspec filesystem instance (w/ its reads counted in Metrics,
+                and aborted past the current request's deadline).
+        """
+        # skip fsspec's instance cache, so the shared instances are never modified
+        fs = fsspec.filesystem(
+            protocol,
+            **{**(storage_options or {}), 'skip_instance_cache': True},
+        )
+
+        # NOTE: not all async filesystems accept batch_size as an init kwarg (i.e., s3fs)
+        if isinstance(fs, AsyncFileSystem):
+            fs.batch_size = cls.MAX_CONCURRENCY
+        else:
+            logger.debug(
+                f'Filesystem protocol={protocol} is not async. '
+                f'Batched reads will be fetched sequentially.',
+            )
+        return Tracer.instrument_filesystem(
+            Metrics.instrument_filesystem(Deadlines.instrument_filesystem(fs), protocol),
+            protocol,
+        )
@@ -0,0 +1,165 @@
+"""
+Before/after hooks on the reads of fsspec filesystems (shared by metrics, tracing and deadlines).
+"""
+import functools
+import fsspec
+from fsspec.asyn import (
+    AsyncFileSystem,
+    sync_wrapper,
+)
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Coroutine,
+    NamedTuple,
+    Optional,
+)
+
+# the filesystem reads that can be hooked
+READ_METHODS: tuple[str, ...] = ('cat_file', 'cat', 'open', 'fetch_range')
+
+
+class FileSystemRead(NamedTuple):
+    """A hooked filesystem read.
+
+    Attributes:
+        method: One of READ_METHODS.
+        path: The path(s) read, or the opened file's path for fetch_range.
+        start: The start of a byte range read (if any).
+        end: The end of a byte range read (if any).
+    """
+    method: str
+    path: Any
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+
+# before(read) returns a state passed on to after(read, state, result, error)
+BeforeHook = Callable[[FileSystemRead], Any]
+AfterHook = Callable[[FileSystemRead, Any, Any, Optional[BaseException]], None]
+
+# run(read, coroutine) awaits the coroutine of an async read (i.e., to make it cancellable)
+RunHook = Callable[[FileSystemRead, Coroutine], Awaitable]
+
+
+def hook_filesystem(
+    fs: fsspec.AbstractFileSystem,
+    name: str,
+    before: Optional[BeforeHook] = None,
+    after: Optional[AfterHook] = None,
+    run: Optional[RunHook] = None,
+    methods: Optional[Collection[str]] = None,
+) -> fsspec.AbstractFileSystem:
+    """Adds before/after hooks to the reads of a filesystem (in place, once per name).
+
+    Async filesystems are hooked through their coroutines (_cat_file, _cat), and their
+    sync mirrors are rebound to the hooked coroutines. Range reads of files opened
+    w/ _open are hooked as fetch_range.
+
+    Arguments:
+        fs: The filesystem to hook.
+        name: The name of the hooks. A filesystem is only hooked once per name.
+        before: Called before each read, returning a state passed on to after.
+        after: Called after each read w/ its result (or error, which is re-raised).
+        run: Awaits the coroutine of each async read (default is to await it).
+        methods: The READ_METHODS to hook. Default is the reads that fetch the data
+            once, i.e., cat_file and fetch_range for async filesystems, and cat_file
+            for sync filesystems (whose cat_file reads through _open).
+
+    Returns:
+        The (hooked) filesystem.
+    """
+    marker: str = f'_catalog_to_xpublish_{name}'
+    if getattr(fs, marker, False):
+        return fs
+
+    is_async: bool = isinstance(fs, AsyncFileSystem)
+    if methods is None:
+        methods = ('cat_file', 'fetch_range') if is_async else ('cat_file',)
+
+    def call(read: FileSystemRead, method: Callable[..., Any], *args, **kwargs) -> Any:
+        state: Any = before(read) if before else None
+        try:
+            result: Any = method(*args, **kwargs)
+        except BaseException as e:
+            if after:
+                after(read, state, None, e)
+            raise
+        if after:
+            after(read, state, result, None)
+        return result
+
+    async def acall(read: FileSystemRead, method: Callable[..., Any], *args, **kwargs) -> Any:
+        state: Any = before(read) if before else None
+        try:
+            coro: Coroutine = method(*args, **kwargs)
+            result: Any = await (run(read, coro) if run else coro)
+        except BaseException as e:
+            if after:
+                after(read, state, None, e)
+            raise
+        if after:
+            after(read, state, result, None)
+        return result
+
+    if 'cat_file' in methods:
+        cat_file = fs._cat_file if is_async else fs.cat_file
+        if is_async:
+            @functools.wraps(cat_file)
+            async def _cat_file(path, start=None, end=None, **kwargs) -> bytes:
+                return await acall(
+                    FileSystemRead('cat_file', path, start, end),
+                    cat_file, path, start=start, end=end, **kwargs,
+                )
+            fs._cat_file = _cat_file
+
+            # the sync mirror is bound to the original coroutine on init
+            fs.cat_file = sync_wrapper(_cat_file, obj=fs)
+        else:
+            @functools.wraps(cat_file)
+            def _cat_file(path, start=None, end=None, **kwargs) -> bytes:
+                return call(
+                    FileSystemRead('cat_file', path, start, end),
+                    cat_file, path, start=start, end=end, **kwargs,
+                )
+            fs.cat_file = _cat_file
+
+    if 'cat' in methods:
+        cat = fs._cat if is_async else fs.cat
+        if is_async:
+            @functools.wraps(cat)
+            async def _cat(path, *args, **kwargs) -> Any:
+                return await acall(FileSystemRead('cat', path), cat, path, *args, **kwargs)
+            fs._cat = _cat
+            fs.cat = sync_wrapper(_cat, obj=fs)
+        else:
+            @functools.wraps(cat)
+            def _cat(path, *args, **kwargs) -> Any:
+                return call(FileSystemRead('cat', path), cat, path, *args, **kwargs)
+            fs.cat = _cat
+
+    if 'open' in methods or 'fetch_range' in methods:
+        open_file = fs._open
+
+        @functools.wraps(open_file)
+        def _open(path, *args, **kwargs) -> Any:
+            if 'open' in methods:
+                f = call(FileSystemRead('open', path), open_file, path, *args, **kwargs)
+            else:
+                f = open_file(path, *args, **kwargs)
+            if 'fetch_range' in methods and hasattr(f, '_fetch_range'):
+                fetch_range = f._fetch_range
+
+                def hooked_fetch_range(start: int, end: int) -> bytes:
+                    return call(
+                        FileSystemRead('fetch_range', path, start, end),
+                        fetch_range, start, end,
+                    )
+                f._fetch_range = hooked_fetch_range
+            return f
+        fs._open = _open
+
+    setattr(fs, marker, True)
+    return fs
@@ -1,3 +1,27 @@
-"""Init file for io_classes."""
-from catalog_to_xpublish.io.intake_io import IntakeToXarray
-from catalog_to_xpublish.io.stac_io import STACToXarray
+"""Init file for io_classes.
+
+NOTE: Implementations are imported on first access, so only the dependencies
+(i.e., intake or pystac) of the catalog types in use are imported.
+"""
+import importlib
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+_MODULES: Dict[str, str] = {
+    'IntakeToXarray': 'catalog_to_xpublish.io.intake_io',
+    'STACToXarray': 'catalog_to_xpublish.io.stac_io',
+}
+__all__: List[str] = list(_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _MODULES:
+        return getattr(importlib.import_module(_MODULES[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
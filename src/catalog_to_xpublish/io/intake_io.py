@@ -1,4 +1,5 @@
 import logging
+import fsspec
 import intake
 import xarray as xr
 from catalog_to_xpublish.base import (
@@ -14,6 +15,21 @@ from typing import (
 from catalog_to_xpublish.factory import (
     CatalogIOClass,
 )
+from catalog_to_xpublish.fetching import (
+    ConcurrentFetching,
+)
+from catalog_to_xpublish.chunking import (
+    DatasetChunking,
+)
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCache,
+)
+from catalog_to_xpublish.schema_store import (
+    SchemaStore,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +74,35 @@ class IntakeToXarray(CatalogToXarray):
 
         return ds
 
+    @staticmethod
+    def _with_filesystem(
+        intake_catalog_obj: intake.source.base.DataSource,
+        driver: str,
+    ) -> intake.source.base.DataSource:
+        """Returns the source reading through a concurrency limited, instrumented filesystem.
+
+        Intake drivers create their own (fsspec cached) filesystems, so zarr sources are
+        re-configured to read from a mapper on a private ConcurrentFetching filesystem.
+        Other drivers are returned as is, and their reads are not limited or counted.
+        """
+        urlpath: Any = getattr(intake_catalog_obj, 'urlpath', None)
+        if driver != 'zarr' or not isinstance(urlpath, str) or '::' in urlpath or '*' in urlpath:
+            return intake_catalog_obj
+        protocol: str | None = fsspec.core.split_protocol(urlpath)[0]
+        if protocol is None:
+            return intake_catalog_obj
+        fs: fsspec.AbstractFileSystem = ConcurrentFetching.get_filesystem(
+            protocol,
+            storage_options=getattr(intake_catalog_obj, 'storage_options', None),
+        )
+        # only sources whose changes can be detected have their coordinates cached
+        if CoordinateCache.ENABLED:
+            CoordinateCache.validate(SchemaStore.get_validator(urlpath, fs))
+        return intake_catalog_obj.configure_new(
+            urlpath=fs.get_mapper(urlpath),
+            storage_options=None,
+        )
+
     def get_dataset_from_catalog(
         self,
         dataset_id: str,
@@ -89,8 +134,22 @@ class IntakeToXarray(CatalogToXarray):
                 f'Please install the necessary intake plugin!',
             )
 
+        # limit and count the source's remote reads (see _with_filesystem)
+        intake_catalog_obj = self._with_filesystem(intake_catalog_obj, driver)
+
         # open as a xarray dataset and add attributes
-        ds: xr.Dataset = intake_catalog_obj.to_dask()
+        with Tracer.span('intake.to_dask', **{'intake.driver': driver}):
+            ds: xr.Dataset = intake_catalog_obj.to_dask()
+
+        # apply the chunking policy (explicit driver chunks are left as is)
+        chunking_overrides: Dict[str, Any] | None = info_dict.get(
+            'metadata',
+            {},
+        ).get(DatasetChunking.CHUNKING_KEY)
+        if chunking_overrides is None and 'chunks' in info_dict.get('args', {}):
+            chunking_overrides = {'strategy': 'none'}
+        ds = DatasetChunking.apply(ds, chunking_overrides)
+
         ds = self.write_attributes(ds, info_dict)
 
         # return the dataset
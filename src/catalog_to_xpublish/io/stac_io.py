@@ -7,6 +7,7 @@ from catalog_to_xpublish.base import CatalogToXarray
 from pathlib import Path
 from typing import (
     Dict,
+    List,
     Tuple,
     Union,
     Any,
@@ -15,6 +16,22 @@ from typing import (
 from catalog_to_xpublish.factory import (
     CatalogIOClass,
 )
+from catalog_to_xpublish.fetching import (
+    ConcurrentFetching,
+)
+from catalog_to_xpublish.chunking import (
+    DatasetChunking,
+)
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCache,
+)
+from catalog_to_xpublish.schema_store import (
+    SchemaFSStore,
+    SchemaStore,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -120,13 +137,13 @@ class STACToXarray(CatalogToXarray):
     ) -> xr.Dataset:
         # get the endpoint type
         endpoint_key: str = asset.href.split(':')[0]
-        if endpoint_key not in ['s3', 'https']:
+        if endpoint_key not in ['s3', 'https', 'http', 'file']:
             if endpoint_key in list(string.ascii_uppercase):
                 endpoint_key = 'file'
             else:
                 raise ValueError(
                     f'Endpoint type {endpoint_key} not supported. '
-                    f'Please use s3, https, or file.',
+                    f'Please use s3, http(s), or file.',
                 )
 
         # get storage options
@@ -135,27 +152,54 @@ class STACToXarray(CatalogToXarray):
         except KeyError:
             storage_options = {}
 
-        # start an appropriate filesystem
-        fs = fsspec.filesystem(
+        # start an appropriate filesystem (async ones fetch chunks concurrently)
+        fs = ConcurrentFetching.get_filesystem(
             endpoint_key,
-            **storage_options,
+            storage_options=storage_options,
         )
 
         engine: str = asset.extra_fields['xarray:open_kwargs']['engine']
+
         if engine == 'zarr':
-            open_file = fsspec.mapping.FSMap(
-                asset.href,
-                fs,
-            )
+            # serve zarr metadata from the persistent schema store if enabled
+            if SchemaStore.ENABLED:
+                open_file = SchemaStore.open_store(asset.href, fs)
+            else:
+                open_file = fsspec.mapping.FSMap(
+                    asset.href,
+                    fs,
+                )
 
         # all other files can be opened as a file
         else:
             open_file = fs.open(asset.href)
 
-        return xr.open_dataset(
+        # only sources whose changes can be detected have their coordinates cached
+        if CoordinateCache.ENABLED:
+            if isinstance(open_file, SchemaFSStore) and open_file.validator is not None:
+                validator: str | None = open_file.validator
+            elif engine == 'zarr':
+                validator = SchemaStore.get_validator(asset.href, fs)
+            else:
+                validator = SchemaStore.get_file_validator(asset.href, fs)
+            CoordinateCache.validate(validator)
+
+        # skip reading coordinates already in the shared coordinate cache
+        open_kwargs: Dict[str, Any] = dict(asset.extra_fields['xarray:open_kwargs'])
+        cached_variables: List[str] = CoordinateCache.cached_variables()
+        if cached_variables:
+            drop_variables: str | List[str] = open_kwargs.get('drop_variables') or []
+            if isinstance(drop_variables, str):
+                drop_variables = [drop_variables]
+            open_kwargs['drop_variables'] = list(drop_variables) + cached_variables
+
+        ds: xr.Dataset = xr.open_dataset(
             open_file,
-            **asset.extra_fields['xarray:open_kwargs'],
+            **open_kwargs,
         )
+        if isinstance(open_file, SchemaFSStore):
+            SchemaStore.save(open_file)
+        return ds
 
     def get_dataset_from_catalog(
         self,
@@ -187,7 +231,17 @@ class STACToXarray(CatalogToXarray):
                 '',
             )
 
-        ds: xr.Dataset = self._read_zarr(stac_asset)
+        with Tracer.span('stac._read_zarr', **{'asset.href': stac_asset.href}):
+            ds: xr.Dataset = self._read_zarr(stac_asset)
+
+        # apply the chunking policy (explicit open_kwargs chunks are left as is)
+        chunking_overrides: Dict[str, Any] | None = stac_asset.extra_fields.get(
+            DatasetChunking.CHUNKING_KEY,
+        )
+        if chunking_overrides is None and 'chunks' in stac_asset.extra_fields['xarray:open_kwargs']:
+            chunking_overrides = {'strategy': 'none'}
+        ds = DatasetChunking.apply(ds, chunking_overrides)
+
         ds = self.write_attributes(ds, info_dict)
         ds.attrs['url_path'] = stac_asset.href
 
@@ -1,6 +1,18 @@
+import atexit
+import json
 import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+)
 from pathlib import Path
 from typing import (
+    Any,
+    Dict,
     List,
     TypedDict,
     Optional,
@@ -17,18 +29,135 @@ class LoggingConfigDict(TypedDict):
         date_format: The format of the date.
         log_file: The path to the log file.
         stream_handler: The stream handler or list of stream handlers.
+        use_queue: If True, records are handed to a background thread that formats
+            and writes them, so logging never blocks on handler I/O.
+        json_format: If True, records are written as one JSON object per line.
+        sample_rate: The fraction of records below WARNING to keep (default is 1.0).
+        rate_limit: The max records below WARNING per second, per logger.
     """
     level: Optional[str | int]
     log_format: Optional[str]
     date_format: Optional[str]
     log_file: Optional[str | Path]
     stream_handler: Optional[logging.Handler | List[logging.Handler]]
+    use_queue: Optional[bool]
+    json_format: Optional[bool]
+    sample_rate: Optional[float]
+    rate_limit: Optional[float]
+
+
+# the default LogRecord attributes (anything else was passed in via extra=)
+RECORD_ATTRIBUTES: List[str] = list(
+    logging.LogRecord('', 0, '', 0, '', (), None).__dict__.keys(),
+) + ['message', 'asctime']
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single line JSON objects (w/ any extra= fields)."""
+
+    def format(
+        self,
+        record: logging.LogRecord,
+    ) -> str:
+        log_dict: Dict[str, Any] = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                log_dict[key] = value
+        if record.exc_info:
+            log_dict['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(log_dict, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random fraction of records below WARNING."""
+
+    def __init__(
+        self,
+        sample_rate: float,
+    ) -> None:
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(
+        self,
+        record: logging.LogRecord,
+    ) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.sample_rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Limits records below WARNING to rate_limit per second, per logger.
+
+    The next record that passes carries the number of suppressed records
+    as record.suppressed.
+    """
+
+    def __init__(
+        self,
+        rate_limit: float,
+    ) -> None:
+        super().__init__()
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        # logger name -> [tokens, last refill time, suppressed count]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def filter(
+        self,
+        record: logging.LogRecord,
+    ) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now: float = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(
+                record.name,
+                [self.rate_limit, now, 0],
+            )
+            bucket[0] = min(
+                self.rate_limit,
+                bucket[0] + (now - bucket[1]) * self.rate_limit,
+            )
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = int(bucket[2])
+                bucket[2] = 0
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """A QueueHandler that leaves formatting to the listener thread.
+
+    The stdlib QueueHandler formats records in the calling thread (to make them
+    picklable), which is not needed for an in-process queue.
+    """
+
+    def prepare(
+        self,
+        record: logging.LogRecord,
+    ) -> logging.LogRecord:
+        # merge the args now, since they may be mutated after this call
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
 
 class APILogging:
     """A class to hold the logging configuration."""
 
     LOGGER: logging.Logger | None = None
+    LISTENER: QueueListener | None = None
     LOG_NAME: str = 'catalog_to_xpublish'
     LOG_LEVEL: str = 'INFO'
     LOG_FORMAT: str = '[%(asctime)s] %(levelname)s - %(message)s'
@@ -104,6 +233,39 @@ class APILogging:
 
         return handlers
 
+    @staticmethod
+    def __validate_rate(
+        name: str,
+        rate: float,
+        max_rate: Optional[float] = None,
+    ) -> float:
+        """Validate a sample_rate or rate_limit argument."""
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate <= 0:
+            raise ValueError(
+                f'{name}={rate} must be a positive number.',
+            )
+        if max_rate is not None and rate > max_rate:
+            raise ValueError(
+                f'{name}={rate} must be <= {max_rate}.',
+            )
+        return float(rate)
+
+    @classmethod
+    def stop_listener(cls) -> None:
+        """Write any queued records and stop the background logging thread."""
+        if cls.LISTENER is not None:
+            cls.LISTENER.stop()
+            for handler in cls.LISTENER.handlers:
+                handler.close()
+            cls.LISTENER = None
+
+    @classmethod
+    def reset_after_fork(cls) -> None:
+        """Restart the background logging thread in a forked worker (threads don't survive fork)."""
+        if cls.LISTENER is not None:
+            cls.LISTENER._thread = None
+            cls.LISTENER.start()
+
     @classmethod
     def config_logger(
         cls,
@@ -141,11 +303,48 @@ class APILogging:
             log_file=log_file,
         )
 
+        # get the formatter
+        if config_dict.get('json_format', False):
+            formatter: logging.Formatter = JSONFormatter(datefmt=date_format)
+        else:
+            formatter = logging.Formatter(log_format, datefmt=date_format)
+        for handler in handlers:
+            if handler.formatter is None:
+                handler.setFormatter(formatter)
+
+        # get the filters (records are dropped before they are queued/formatted)
+        filters: List[logging.Filter] = []
+        if config_dict.get('sample_rate') is not None:
+            filters.append(
+                SamplingFilter(
+                    cls.__validate_rate('sample_rate', config_dict['sample_rate'], 1),
+                ),
+            )
+        if config_dict.get('rate_limit') is not None:
+            filters.append(
+                RateLimitFilter(
+                    cls.__validate_rate('rate_limit', config_dict['rate_limit']),
+                ),
+            )
+
+        # optionally format and write records on a background thread
+        cls.stop_listener()
+        if config_dict.get('use_queue', False):
+            cls.LISTENER = QueueListener(
+                queue.SimpleQueue(),
+                *handlers,
+                respect_handler_level=True,
+            )
+            cls.LISTENER.start()
+            handlers = [_NonBlockingQueueHandler(cls.LISTENER.queue)]
+
+        for handler in handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+
         # config the logger
         logging.basicConfig(
             level=level,
-            format=log_format,
-            datefmt=date_format,
             handlers=handlers,
             force=True,
         )
@@ -153,3 +352,7 @@ class APILogging:
         # set the logger as a class attribute
         cls.LOGGER = logging.getLogger()
         cls.LOGGER.name = cls.LOG_NAME
+
+
+# flush any queued records on exit
+atexit.register(APILogging.stop_listener)
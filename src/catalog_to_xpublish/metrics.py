@@ -0,0 +1,559 @@
+"""
+In-process runtime metrics exposed in the Prometheus text format (no external service required).
+"""
+import contextvars
+import logging
+import threading
+import time
+import fsspec
+from contextlib import contextmanager
+from starlette.responses import PlainTextResponse
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+    LRUCache,
+)
+from catalog_to_xpublish.fs_hooks import (
+    FileSystemRead,
+    hook_filesystem,
+)
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsConfigDict(TypedDict):
+    """A dictionary to hold the optional metrics configuration args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        enabled: Whether to serve /metrics and time requests (default is True).
+        buckets: The latency histogram bucket upper bounds in seconds.
+        account_dask_io: If True, dask's threaded scheduler runs tasks in a shared pool
+            that keeps their request's context, so remote reads inside dask tasks are
+            counted for the request (default is False).
+    """
+    enabled: Optional[bool]
+    buckets: Optional[List[float]]
+    account_dask_io: Optional[bool]
+
+
+def _format_labels(
+    labels: Tuple[Tuple[str, str], ...],
+    extra: Optional[Tuple[str, str]] = None,
+) -> str:
+    """Formats label pairs as {a="1",b="2"}."""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = [
+        (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    ]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class _Metric:
+    """A base class for a labelled metric."""
+    metric_type: str = 'untyped'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def get(self, **labels: str) -> float:
+        """Returns the current value for a set of labels."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def reset(self) -> None:
+        """Drops all values."""
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f'{self.name}{_format_labels(key)} {value}'
+
+    def render(self) -> str:
+        """Returns the metric in the Prometheus text exposition format."""
+        with self._lock:
+            samples = list(self._samples())
+        return '\n'.join([
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+            *samples,
+        ])
+
+
+class Counter(_Metric):
+    """A monotonically increasing value."""
+    metric_type: str = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+    metric_type: str = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets."""
+    metric_type: str = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: List[float],
+    ) -> None:
+        super().__init__(name, documentation)
+        self.buckets: List[float] = sorted(buckets)
+        self._counts: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the wall time of a block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels: str) -> int:
+        """Returns the number of observations for a set of labels."""
+        return sum(self._counts.get(self._key(labels), []))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._counts.clear()
+
+    def _samples(self) -> Iterator[str]:
+        for key, counts in sorted(self._counts.items()):
+            cumulative: int = 0
+            for bound, count in zip(self.buckets + [float('inf')], counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield f'{self.name}_bucket{_format_labels(key, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(key)} {self._values[key]}'
+            yield f'{self.name}_count{_format_labels(key)} {cumulative}'
+
+
+class IOTotals:
+    """The remote read requests and bytes of a dataset open or request."""
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.bytes: int = 0
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+
+
+# the open I/O accounts of the current request/dataset open (innermost last)
+_IO_ACCOUNTS: contextvars.ContextVar[Tuple[IOTotals, ...]] = contextvars.ContextVar(
+    'catalog_to_xpublish_io_accounts',
+    default=(),
+)
+
+
+class Metrics:
+    """A class to hold the shared runtime metrics.
+
+    Metrics are recorded in-process and rendered on request at /metrics.
+    """
+
+    ENABLED: bool = True
+    ACCOUNT_DASK_IO: bool = False
+    PREFIX: str = 'catalog_to_xpublish'
+    BUCKETS: List[float] = [
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+    ]
+
+    REQUEST_DURATION: Histogram = Histogram(
+        f'{PREFIX}_http_request_duration_seconds',
+        'HTTP request latency by route template.',
+        BUCKETS,
+    )
+    REQUESTS_IN_FLIGHT: Gauge = Gauge(
+        f'{PREFIX}_http_requests_in_flight',
+        'HTTP requests currently being served.',
+    )
+    DATASET_OPEN_DURATION: Histogram = Histogram(
+        f'{PREFIX}_dataset_open_duration_seconds',
+        'Dataset open latency (cache misses) by catalog type.',
+        BUCKETS,
+    )
+    DATASET_OPENS_IN_FLIGHT: Gauge = Gauge(
+        f'{PREFIX}_dataset_opens_in_flight',
+        'Dataset opens currently in progress.',
+    )
+    DATASET_OPEN_ERRORS: Counter = Counter(
+        f'{PREFIX}_dataset_open_errors_total',
+        'Dataset opens that raised an exception.',
+    )
+    CRAWL_DURATION: Gauge = Gauge(
+        f'{PREFIX}_catalog_crawl_duration_seconds',
+        'Wall time of the last catalog crawl (parse_catalog).',
+    )
+    CATALOG_ENDPOINTS: Gauge = Gauge(
+        f'{PREFIX}_catalog_endpoints',
+        'The number of catalog endpoints found by the last crawl.',
+    )
+    FSSPEC_REQUESTS: Counter = Counter(
+        f'{PREFIX}_fsspec_requests_total',
+        'Remote read requests made through fsspec filesystems.',
+    )
+    FSSPEC_BYTES: Counter = Counter(
+        f'{PREFIX}_fsspec_read_bytes_total',
+        'Bytes read through fsspec filesystems.',
+    )
+    REMOTE_REQUESTS: Counter = Counter(
+        f'{PREFIX}_remote_requests_total',
+        'Remote read requests by catalog endpoint, dataset and source (open or request).',
+    )
+    REMOTE_BYTES: Counter = Counter(
+        f'{PREFIX}_remote_read_bytes_total',
+        'Remote bytes read by catalog endpoint, dataset and source (open or request).',
+    )
+    ADMISSION_ACTIVE: Gauge = Gauge(
+        f'{PREFIX}_admission_active_requests',
+        'Requests holding an admission slot by limit scope (global, catalog, endpoint or dataset).',
+    )
+    ADMISSION_QUEUE_DEPTH: Gauge = Gauge(
+        f'{PREFIX}_admission_queue_depth',
+        'Requests waiting for an admission slot by limit scope (global, catalog, endpoint or dataset).',
+    )
+    ADMISSION_WAIT: Histogram = Histogram(
+        f'{PREFIX}_admission_wait_seconds',
+        'Time admitted requests waited for their admission slots.',
+        BUCKETS,
+    )
+    ADMISSION_REJECTIONS: Counter = Counter(
+        f'{PREFIX}_admission_rejections_total',
+        'Requests shed by admission control by limit scope, reason, catalog endpoint and dataset.',
+    )
+    COORDINATE_CACHE_LOOKUPS: Counter = Counter(
+        f'{PREFIX}_coordinate_cache_lookups_total',
+        'Shared coordinate cache lookups on dataset opens by result (hit, miss, stale or unvalidated).',
+    )
+    SCHEMA_STORE_LOOKUPS: Counter = Counter(
+        f'{PREFIX}_schema_store_lookups_total',
+        'Persistent schema store lookups on dataset opens by result (hit, miss, stale or unvalidated).',
+    )
+
+    @classmethod
+    def all_metrics(cls) -> List[_Metric]:
+        """Returns all recorded metrics."""
+        return [
+            value for value in vars(cls).values()
+            if isinstance(value, _Metric)
+        ]
+
+    @classmethod
+    def config_metrics(
+        cls,
+        config_dict: Optional[MetricsConfigDict] = None,
+    ) -> None:
+        """Configure (and reset) the runtime metrics.
+
+        Arguments:
+            config_dict: A dictionary of optional metrics configuration args.
+
+        Returns:
+            None. Sets the global metrics configuration.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        cls.ENABLED = bool(config_dict.get('enabled', True))
+        cls.ACCOUNT_DASK_IO = bool(config_dict.get('account_dask_io', False))
+        buckets: List[float] = config_dict.get('buckets', cls.BUCKETS)
+        if not isinstance(buckets, list) or not buckets or not all(
+            isinstance(b, (int, float)) and b > 0 for b in buckets
+        ):
+            raise ValueError(
+                f'buckets must be a list of positive numbers, not {buckets}',
+            )
+
+        for metric in cls.all_metrics():
+            metric.reset()
+            if isinstance(metric, Histogram):
+                metric.buckets = sorted(float(b) for b in buckets)
+
+    @classmethod
+    @contextmanager
+    def account_io(cls) -> Iterator[IOTotals]:
+        """Counts the remote reads made in this context (incl. dask tasks and fsspec coroutines).
+
+        Accounts can be nested (i.e., a dataset open within a request), reads are
+        added to all open accounts.
+        """
+        totals = IOTotals()
+        token = _IO_ACCOUNTS.set(_IO_ACCOUNTS.get() + (totals,))
+        try:
+            yield totals
+        finally:
+            _IO_ACCOUNTS.reset(token)
+
+    @classmethod
+    def record_io(
+        cls,
+        totals: IOTotals,
+        source: str,
+        endpoint: str,
+        dataset: str,
+        route: Optional[str] = None,
+    ) -> None:
+        """Adds an account's totals to the remote I/O metrics (and logs them).
+
+        NOTE: Request totals include the reads of any dataset opens they trigger.
+        """
+        if not totals.requests:
+            return None
+        labels: Dict[str, str] = {
+            'endpoint': endpoint,
+            'dataset': dataset,
+            'source': source,
+        }
+        cls.REMOTE_REQUESTS.inc(totals.requests, **labels)
+        cls.REMOTE_BYTES.inc(totals.bytes, **labels)
+        logger.info(
+            f'Remote I/O for {source}{f" {route}" if route else ""} '
+            f'(endpoint={endpoint}, dataset={dataset}): '
+            f'{totals.requests} requests, {totals.bytes} bytes.',
+        )
+
+    @classmethod
+    def _cache_metrics(cls) -> List[str]:
+        """Renders the dataset/result cache statistics."""
+        caches: Dict[str, LRUCache] = {
+            'datasets': DatasetCache.DATASETS,
+            'results': DatasetCache.RESULTS,
+        }
+        lines: List[str] = []
+        for stat, metric_type, documentation in [
+            ('hits', 'counter', 'Cache hits.'),
+            ('misses', 'counter', 'Cache misses.'),
+            ('evictions', 'counter', 'Cache evictions.'),
+            ('expirations', 'counter', 'Cache entries expired (by their ttl).'),
+            ('hit_ratio', 'gauge', 'Cache hits / (hits + misses).'),
+            ('entries', 'gauge', 'Cached entries.'),
+            ('size', 'gauge', 'Cache size (entries for datasets, bytes for results).'),
+        ]:
+            name = f'{cls.PREFIX}_cache_{stat}'
+            if metric_type == 'counter':
+                name += '_total'
+            lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+            for cache_name, cache in caches.items():
+                lines.append(f'{name}{{cache="{cache_name}"}} {cache.stats()[stat]}')
+
+        # each (federated) catalog's share of the shared caches
+        name = f'{cls.PREFIX}_cache_catalog_size'
+        lines += [
+            f'# HELP {name} Cache size used by each federated catalog.',
+            f'# TYPE {name} gauge',
+        ]
+        for cache_name, cache in caches.items():
+            for group, size in list(cache.group_sizes.items()):
+                lines.append(f'{name}{{cache="{cache_name}",catalog="{group}"}} {size}')
+        return lines
+
+    @classmethod
+    def render(cls) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        blocks: List[str] = [metric.render() for metric in cls.all_metrics()]
+        blocks.append('\n'.join(cls._cache_metrics()))
+        return '\n'.join(blocks) + '\n'
+
+    @classmethod
+    def get_metrics(cls) -> PlainTextResponse:
+        """Returns runtime metrics in the Prometheus text format.
+
+        Will be added to the main application as @app.get('/metrics').
+        """
+        return PlainTextResponse(
+            cls.render(),
+            media_type='text/plain; version=0.0.4',
+        )
+
+    @classmethod
+    def instrument_filesystem(
+        cls,
+        fs: fsspec.AbstractFileSystem,
+        protocol: str,
+    ) -> fsspec.AbstractFileSystem:
+        """Counts the read requests and bytes of a filesystem (in place).
+
+        Async filesystems are counted per fetched key/range (_cat_file) and per
+        buffered file range read, sync filesystems per cat_file() call.
+        """
+        def record(
+            read: FileSystemRead,
+            state: None,
+            data: bytes | None,
+            error: BaseException | None,
+        ) -> None:
+            if error is not None:
+                return None
+            nbytes: int = len(data or b'')
+            cls.FSSPEC_REQUESTS.inc(protocol=protocol)
+            cls.FSSPEC_BYTES.inc(nbytes, protocol=protocol)
+            for totals in _IO_ACCOUNTS.get():
+                totals.add(nbytes)
+
+        return hook_filesystem(fs, 'metrics', after=record)
+
+
+def get_route_template(
+    scope: Scope,
+    root_path: str = '',
+) -> str:
+    """Returns the route template of a served request.
+
+    The template is the mount prefix plus the matched route path
+    (i.e., /sub/catalog/datasets/{dataset_id}/zarr/{var}/{chunk}), so concrete
+    dataset ids and chunk keys do not create new label values.
+
+    NOTE: The matched route's path does not include the prefix of the router(s) it
+        was included from (i.e., xpublish's /datasets/{dataset_id}), so the prefix
+        is rebuilt from the request path and the remaining path parameters.
+
+    Arguments:
+        scope: The ASGI scope after the request was routed.
+        root_path: The scope's root_path before routing.
+    """
+    route = scope.get('route')
+    if route is None or not hasattr(route, 'path'):
+        return 'unmatched'
+
+    path_segments: List[str] = scope.get('path', '')[
+        len(scope.get('root_path', '')):
+    ].strip('/').split('/')
+    route_segments: List[str] = route.path.strip('/').split('/')
+    prefix: str = ''
+    if len(path_segments) > len(route_segments):
+        params: Dict[str, str] = {
+            name: str(value)
+            for name, value in scope.get('path_params', {}).items()
+            if '{' + name not in route.path
+        }
+        for segment in path_segments[:len(path_segments) - len(route_segments)]:
+            name = next((k for k, v in params.items() if v == segment), None)
+            if name is not None:
+                del params[name]
+                segment = '{' + name + '}'
+            prefix += '/' + segment
+    return get_mount_path(scope, root_path) + prefix + route.path
+
+
+def get_mount_path(
+    scope: Scope,
+    root_path: str = '',
+) -> str:
+    """Returns the prefix of the mounted (xpublish) app that served a request."""
+    return scope.get('root_path', '')[len(root_path):]
+
+
+class MetricsMiddleware:
+    """A pure ASGI middleware recording request latency by route template."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+    ) -> None:
+        self.app = app
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        if scope['type'] != 'http' or not Metrics.ENABLED:
+            await self.app(scope, receive, send)
+            return None
+
+        root_path: str = scope.get('root_path', '')
+        status_code: List[int] = [500]
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                status_code[0] = message['status']
+            await send(message)
+
+        Metrics.REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with Metrics.account_io() as totals:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            Metrics.REQUESTS_IN_FLIGHT.dec()
+            route: str = get_route_template(scope, root_path)
+            Metrics.REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope.get('method', ''),
+                route=route,
+                status=str(status_code[0]),
+            )
+            Metrics.record_io(
+                totals,
+                source='request',
+                endpoint=get_mount_path(scope, root_path) or '/',
+                dataset=scope.get('path_params', {}).get('dataset_id', ''),
+                route=route,
+            )
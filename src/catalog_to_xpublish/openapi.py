@@ -0,0 +1,237 @@
+"""
+Lazily generated, cached (and optionally collapsed) OpenAPI schemas.
+"""
+import copy
+import functools
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.openapi.utils import get_openapi
+from fastapi.routing import APIRoute
+from fastapi.utils import generate_unique_id
+from starlette.routing import BaseRoute
+from catalog_to_xpublish.base import (
+    CatalogRouter,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+# the path parameter of collapsed (templated) routes
+CATALOG_PATH_PARAMETER: Dict[str, Any] = {
+    'name': 'catalog_path',
+    'in': 'path',
+    'required': True,
+    'description': 'The path of a catalog endpoint (i.e., sub/catalog).',
+    'schema': {'type': 'string', 'title': 'Catalog Path'},
+}
+
+
+class OpenAPIConfigDict(TypedDict):
+    """A dictionary to hold the optional OpenAPI schema args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        collapse: If True, the main application's schema documents each catalog route,
+            and the routes of the endpoints' xpublish apps, once under a templated
+            /{catalog_path} prefix, instead of once per catalog endpoint (default is True).
+    """
+    collapse: Optional[bool]
+
+
+class OpenAPIDocs:
+    """A class to generate OpenAPI schemas on the first /openapi.json (or /docs) request.
+
+    Schemas are cached once generated. Mounted xpublish apps w/ the same routes share
+    one generated schema (only their titles differ).
+    """
+
+    ENABLED: bool = False
+    COLLAPSE: bool = True
+
+    # generated xpublish app schemas by their route signature
+    SCHEMAS: Dict[Tuple, Dict[str, Any]] = {}
+
+    @staticmethod
+    def __validate_collapse(collapse: bool) -> bool:
+        if not isinstance(collapse, bool):
+            raise ValueError(
+                f'collapse must be a bool, not {collapse}',
+            )
+        return collapse
+
+    @classmethod
+    def config_openapi(
+        cls,
+        config_dict: Optional[OpenAPIConfigDict] = None,
+    ) -> None:
+        """Configure OpenAPI schema generation.
+
+        Arguments:
+            config_dict: A dictionary of optional OpenAPI schema args.
+                If None, each app generates its own (full) schema on first request.
+
+        Returns:
+            None. Sets the global OpenAPI schema configuration.
+        """
+        cls.SCHEMAS = {}
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        cls.COLLAPSE = cls.__validate_collapse(config_dict.get('collapse', True))
+        cls.ENABLED = True
+        logger.info(
+            f'OpenAPI schemas are generated on first request'
+            f'{" (collapsed)" if cls.COLLAPSE else ""}.',
+        )
+
+    @classmethod
+    def install(
+        cls,
+        app: FastAPI,
+        routes: List[BaseRoute],
+        catalog_routers: List[CatalogRouter],
+        xpublish_apps: List[FastAPI],
+    ) -> None:
+        """Replaces the schema generation of the main application and its xpublish apps.
+
+        Arguments:
+            app: The main application.
+            routes: The main application's routes, other than its catalog routes.
+            catalog_routers: The catalog routers included in the main application.
+            xpublish_apps: The xpublish apps serving the catalog endpoints' datasets.
+        """
+        for xpublish_app in xpublish_apps:
+            xpublish_app.openapi = functools.partial(
+                cls.get_cached_schema,
+                xpublish_app,
+                functools.partial(cls.build_xpublish_schema, xpublish_app),
+            )
+        if cls.COLLAPSE:
+            build = functools.partial(
+                cls.build_collapsed_schema,
+                app,
+                routes,
+                catalog_routers,
+                xpublish_apps,
+            )
+        else:
+            build = functools.partial(FastAPI.openapi, app)
+        app.openapi = functools.partial(cls.get_cached_schema, app, build)
+
+    @staticmethod
+    def get_cached_schema(
+        app: FastAPI,
+        build: Callable[[], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Returns an app's cached schema, building it on the first call."""
+        if app.openapi_schema is None:
+            start: float = time.perf_counter()
+            app.openapi_schema = build()
+            logger.info(
+                f'Generated the OpenAPI schema of {app.title} in '
+                f'{time.perf_counter() - start:.3f}s.',
+            )
+        return app.openapi_schema
+
+    @staticmethod
+    def get_route_signature(app: FastAPI) -> Tuple:
+        """Returns the paths, methods and endpoints of an app's documented routes."""
+        return tuple(
+            (
+                route.path_format,
+                tuple(sorted(route.methods)),
+                getattr(route.endpoint, '__qualname__', route.name),
+            )
+            for route in app.routes
+            if isinstance(route, APIRoute) and route.include_in_schema
+        )
+
+    @classmethod
+    def build_xpublish_schema(
+        cls,
+        app: FastAPI,
+    ) -> Dict[str, Any]:
+        """Builds (or shares) the schema of a xpublish app, w/ its own title."""
+        signature: Tuple = cls.get_route_signature(app)
+        schema: Dict[str, Any] | None = cls.SCHEMAS.get(signature)
+        if schema is None:
+            schema = FastAPI.openapi(app)
+            cls.SCHEMAS[signature] = schema
+        return {**schema, 'info': {**schema['info'], 'title': app.title}}
+
+    @staticmethod
+    def get_templated_routes(
+        catalog_routers: List[CatalogRouter],
+    ) -> List[BaseRoute]:
+        """Returns the catalog routes of each router type once, under the /{catalog_path} prefix.
+
+        The root catalog's routes are returned as is.
+        """
+        routes: List[BaseRoute] = []
+        router_types: set = set()
+        for catalog_router in catalog_routers:
+            if catalog_router.catalog_endpoint_obj.catalog_path == '/':
+                routes += catalog_router.router.routes
+                continue
+            if type(catalog_router) in router_types:
+                continue
+            router_types.add(type(catalog_router))
+            for route in catalog_router.router.routes:
+                templated: APIRoute = copy.copy(route)
+                templated.path = templated.path_format = (
+                    '/{catalog_path}' + route.path_format[route.path_format.rfind('/'):]
+                )
+                templated.unique_id = generate_unique_id(templated)
+                routes.append(templated)
+        return routes
+
+    @classmethod
+    def build_collapsed_schema(
+        cls,
+        app: FastAPI,
+        routes: List[BaseRoute],
+        catalog_routers: List[CatalogRouter],
+        xpublish_apps: List[FastAPI],
+    ) -> Dict[str, Any]:
+        """Builds the main application's schema w/ templated catalog and dataset routes."""
+        schema: Dict[str, Any] = get_openapi(
+            title=app.title,
+            version=app.version,
+            openapi_version=app.openapi_version,
+            description=app.description,
+            routes=routes + cls.get_templated_routes(catalog_routers),
+            tags=app.openapi_tags,
+            servers=app.servers,
+        )
+
+        # document one xpublish app's (dataset) routes under the templated prefix
+        if xpublish_apps:
+            xpublish_schema: Dict[str, Any] = xpublish_apps[0].openapi()
+            for path, operations in xpublish_schema.get('paths', {}).items():
+                schema.setdefault('paths', {}).setdefault('/{catalog_path}' + path, dict(operations))
+            for name, components in xpublish_schema.get('components', {}).items():
+                for key, component in components.items():
+                    schema.setdefault('components', {}).setdefault(name, {}).setdefault(key, component)
+
+        for path, operations in schema.get('paths', {}).items():
+            if not path.startswith('/{catalog_path}'):
+                continue
+            for method, operation in list(operations.items()):
+                parameters: List[Dict[str, Any]] = operation.get('parameters', [])
+                if any(parameter['name'] == 'catalog_path' for parameter in parameters):
+                    continue
+                operations[method] = {
+                    **operation,
+                    'parameters': [CATALOG_PATH_PARAMETER] + parameters,
+                }
+        return schema
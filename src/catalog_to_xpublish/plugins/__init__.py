@@ -0,0 +1,11 @@
+"""Init file for catalog_to_xpublish's own xpublish plugins."""
+from catalog_to_xpublish.plugins.encoding_plugin import (
+    ChunkEncodingPool,
+    ProcessPoolZarrPlugin,
+)
+from catalog_to_xpublish.plugins.reduce_plugin import (
+    ReducePlugin,
+)
+from catalog_to_xpublish.plugins.subset_plugin import (
+    SubsetPlugin,
+)
@@ -0,0 +1,288 @@
+"""
+A drop-in replacement for the xpublish zarr plugin that encodes chunks in a process pool.
+"""
+import asyncio
+import logging
+import multiprocessing
+import sys
+import cachey
+import numpy as np
+import xarray as xr
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+)
+from numcodecs.abc import Codec
+from numcodecs.compat import ensure_bytes
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from xpublish import (
+    Dependencies,
+    hookimpl,
+)
+from xpublish.dependencies import (
+    get_zmetadata,
+    get_zvariables,
+)
+from xpublish.plugins.included.zarr import ZarrPlugin
+from xpublish.utils.api import (
+    DATASET_ID_ATTR_KEY,
+    JSONResponse,
+)
+from xpublish.utils.cache import CostTimer
+from xpublish.utils.zarr import (
+    encode_chunk,
+    get_data_chunk,
+)
+from zarr.storage import (
+    array_meta_key,
+    attrs_key,
+    group_meta_key,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+from typing import (
+    List,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EncodingConfigDict(TypedDict):
+    """A dictionary to hold the optional chunk encoding pool args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        max_workers: The number of encoding processes. Defaults to the CPU count.
+        shared_memory: Whether to pass decoded chunks to the workers via shared
+            memory (default) rather than pickling them.
+    """
+    max_workers: Optional[int]
+    shared_memory: Optional[bool]
+
+
+def _encode_bytes(
+    data: bytes,
+    filters: Optional[List[Codec]],
+    compressor: Optional[Codec],
+) -> bytes:
+    """Encode a pickled decoded chunk (runs in a worker process)."""
+    return ensure_bytes(
+        encode_chunk(data, filters=filters, compressor=compressor),
+    )
+
+
+def _encode_shared(
+    shm_name: str,
+    nbytes: int,
+    filters: Optional[List[Codec]],
+    compressor: Optional[Codec],
+) -> bytes:
+    """Encode a decoded chunk stored in shared memory (runs in a worker process)."""
+    # NOTE: the parent process owns (and unlinks) the block. Spawned workers share
+    # the parent's resource tracker, so attaching must not (un)register it again.
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray((nbytes,), dtype='u1', buffer=shm.buf)
+        echunk = ensure_bytes(
+            encode_chunk(data, filters=filters, compressor=compressor),
+        )
+        del data
+        return echunk
+    finally:
+        shm.close()
+
+
+class ChunkEncodingPool:
+    """A class to hold the shared chunk encoding process pool.
+
+    Chunk compression is CPU bound and holds the GIL, so encoding inside the web
+    worker limits throughput to ~one core. Once configured, chunks are encoded by
+    a pool of processes and the event loop only awaits the result.
+    """
+
+    POOL: ProcessPoolExecutor | None = None
+    MAX_WORKERS: int | None = None
+    SHARED_MEMORY: bool = True
+
+    @classmethod
+    def config_encoding(
+        cls,
+        config_dict: Optional[EncodingConfigDict] = None,
+    ) -> None:
+        """Start the chunk encoding process pool.
+
+        Arguments:
+            config_dict: A dictionary of optional encoding pool args.
+
+        Returns:
+            None. Sets the global POOL.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        max_workers: int | None = config_dict.get('max_workers', cls.MAX_WORKERS)
+        if max_workers is not None and (not isinstance(max_workers, int) or max_workers < 1):
+            raise ValueError(
+                f'max_workers must be a positive int, not {max_workers}',
+            )
+        cls.SHARED_MEMORY = bool(
+            config_dict.get('shared_memory', cls.SHARED_MEMORY),
+        )
+
+        cls.close()
+        cls.POOL = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        logger.info(
+            f'Encoding zarr chunks in a pool of {cls.POOL._max_workers} processes '
+            f'(shared_memory={cls.SHARED_MEMORY}).',
+        )
+
+    @classmethod
+    def reset_after_fork(cls) -> None:
+        """Start a new process pool in a forked worker (the inherited one can't be used)."""
+        if cls.POOL is not None:
+            cls.POOL = ProcessPoolExecutor(
+                max_workers=cls.POOL._max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+    @classmethod
+    def close(cls) -> None:
+        """Shutdown the process pool."""
+        if cls.POOL is not None:
+            cls.POOL.shutdown(wait=True, cancel_futures=True)
+            cls.POOL = None
+
+    @classmethod
+    async def encode(
+        cls,
+        data_chunk: np.ndarray,
+        filters: Optional[List[Codec]],
+        compressor: Optional[Codec],
+    ) -> bytes:
+        """Encode a decoded chunk in the process pool (or inline if not configured)."""
+        if cls.POOL is None:
+            return await run_in_threadpool(
+                _encode_bytes,
+                data_chunk.tobytes(),
+                filters,
+                compressor,
+            )
+
+        loop = asyncio.get_running_loop()
+        if not cls.SHARED_MEMORY:
+            return await loop.run_in_executor(
+                cls.POOL,
+                _encode_bytes,
+                data_chunk.tobytes(),
+                filters,
+                compressor,
+            )
+
+        nbytes: int = data_chunk.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        try:
+            buffer = np.ndarray(
+                data_chunk.shape,
+                dtype=data_chunk.dtype,
+                buffer=shm.buf,
+            )
+            buffer[...] = data_chunk
+            del buffer
+            return await loop.run_in_executor(
+                cls.POOL,
+                _encode_shared,
+                shm.name,
+                nbytes,
+                filters,
+                compressor,
+            )
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class ProcessPoolZarrPlugin(ZarrPlugin):
+    """Adds Zarr-like accessing endpoints for datasets, encoding chunks in a process pool.
+
+    Registered in place of the default xpublish 'zarr' plugin.
+    """
+
+    @hookimpl
+    def dataset_router(self, deps: Dependencies) -> APIRouter:
+        # re-use the default metadata routes, and swap in an async chunk route
+        router: APIRouter = super().dataset_router(deps=deps)
+        router.routes = [
+            route for route in router.routes
+            if not route.path.endswith('/{var}/{chunk}')
+        ]
+
+        @router.get('/{var}/{chunk}')
+        async def get_variable_chunk(
+            var: str = Path(description='Variable in dataset'),
+            chunk: str = Path(description='Zarr chunk'),
+            dataset: xr.Dataset = Depends(deps.dataset),
+            cache: cachey.Cache = Depends(deps.cache),
+        ):
+            """Get a zarr array chunk.
+
+            This will return cached responses when available.
+            """
+            zvariables = await run_in_threadpool(get_zvariables, dataset, cache)
+            zmetadata = await run_in_threadpool(get_zmetadata, dataset, cache, zvariables)
+
+            # First check that this request wasn't for variable metadata
+            if array_meta_key in chunk:
+                return zmetadata['metadata'][f'{var}/{array_meta_key}']
+            elif attrs_key in chunk:
+                return JSONResponse(zmetadata['metadata'][f'{var}/{attrs_key}'])
+            elif group_meta_key in chunk:
+                raise HTTPException(status_code=404, detail='No subgroups')
+
+            cache_key = dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + f'{var}/{chunk}'
+            response = cache.get(cache_key)
+
+            if response is None:
+                with CostTimer() as ct:
+                    arr_meta = zmetadata['metadata'][f'{var}/{array_meta_key}']
+
+                    # reading/decoding is I/O bound: use the thread pool
+                    with Tracer.span('zarr.read_chunk', **{'zarr.key': f'{var}/{chunk}'}):
+                        data_chunk: np.ndarray = await run_in_threadpool(
+                            get_data_chunk,
+                            zvariables[var].data,
+                            chunk,
+                            out_shape=arr_meta['chunks'],
+                        )
+
+                    # encoding is CPU bound: use the process pool
+                    with Tracer.span('zarr.encode_chunk', **{'zarr.key': f'{var}/{chunk}'}):
+                        echunk: bytes = await ChunkEncodingPool.encode(
+                            data_chunk,
+                            filters=arr_meta['filters'],
+                            compressor=arr_meta['compressor'],
+                        )
+
+                    response = Response(
+                        echunk,
+                        media_type='application/octet-stream',
+                    )
+
+                cache.put(cache_key, response, ct.time, len(echunk))
+
+            return response
+
+        return router
@@ -0,0 +1,237 @@
+"""
+An xpublish plugin for cached server-side reductions (i.e., temporal means or area averages).
+"""
+import json
+import logging
+import dask.base
+import xarray as xr
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+)
+from starlette.responses import (
+    Response,
+    StreamingResponse,
+)
+from xpublish import (
+    Dependencies,
+    Plugin,
+    hookimpl,
+)
+from xpublish.utils.api import (
+    DATASET_ID_ATTR_KEY,
+    JSONResponse,
+)
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+from catalog_to_xpublish.plugins.selection import (
+    auto_chunk,
+    parse_list,
+    parse_selectors,
+    select_dataset,
+)
+from catalog_to_xpublish.plugins.subset_plugin import (
+    stream_netcdf,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+)
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS: List[str] = [
+    'mean',
+    'min',
+    'max',
+    'sum',
+]
+
+
+def dataset_version(dataset: xr.Dataset) -> str:
+    """Returns the version of a dataset opened by DatasetProviderPlugin.
+
+    Datasets served from elsewhere are tokenized (which may not be deterministic,
+    so at worst their results are never re-used).
+    """
+    version: str | None = dataset.encoding.get(DatasetCache.VERSION_KEY)
+    if version is None:
+        version = dask.base.tokenize(dataset)
+    return version
+
+
+def reduce_dataset(
+    dataset: xr.Dataset,
+    operation: str,
+    dims: Optional[List[str]] = None,
+    resample: Optional[str] = None,
+    resample_dim: str = 'time',
+) -> xr.Dataset:
+    """Lazily reduces a dataset.
+
+    Arguments:
+        dataset: The dataset to reduce.
+        operation: One of OPERATIONS.
+        dims: The dimensions to reduce over. Defaults to all (unless resampling).
+        resample: An optional frequency (i.e., '1MS') to resample resample_dim to first.
+        resample_dim: The dimension to resample.
+
+    Returns:
+        The lazy (dask) reduced dataset.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(
+            f'operation={operation} is not supported. Choose from {OPERATIONS}',
+        )
+    for dim in (dims or []) + ([resample_dim] if resample else []):
+        if dim not in dataset.dims:
+            raise KeyError(
+                f'Dimension {dim} is not in the dataset. '
+                f'Choose from {list(dataset.dims)}',
+            )
+
+    # reduce w/ dask so the raw data is never fully in memory
+    dataset = auto_chunk(dataset)
+
+    if resample:
+        dataset = getattr(dataset.resample({resample_dim: resample}), operation)()
+        dims = [d for d in (dims or []) if d != resample_dim]
+        if not dims:
+            return dataset
+    return getattr(dataset, operation)(dim=dims or None, keep_attrs=True)
+
+
+class ReducePlugin(Plugin):
+    """Adds an endpoint for cached server-side reductions of a dataset."""
+
+    name: str = 'reduce'
+
+    dataset_router_prefix: str = '/reduce'
+    dataset_router_tags: Sequence[str] = ['reduce']
+
+    @hookimpl
+    def dataset_router(self, deps: Dependencies) -> APIRouter:
+        router = APIRouter(
+            prefix=self.dataset_router_prefix,
+            tags=list(self.dataset_router_tags),
+        )
+
+        @router.get('/{operation}')
+        def get_reduction(
+            operation: Literal['mean', 'min', 'max', 'sum'],
+            dims: Optional[str] = Query(
+                None,
+                description='Comma separated dimensions to reduce over (default is all).',
+            ),
+            resample: Optional[str] = Query(
+                None,
+                description='A frequency to resample to first (i.e., 1MS for monthly).',
+            ),
+            resample_dim: str = Query(
+                'time',
+                description='The dimension to resample.',
+            ),
+            variables: Optional[str] = Query(
+                None,
+                description='Comma separated data variables to reduce (default is all).',
+            ),
+            sel: Optional[str] = Query(
+                None,
+                description='JSON label based selectors applied first, lists are slices.',
+            ),
+            isel: Optional[str] = Query(
+                None,
+                description='JSON index based selectors applied first, lists are slices.',
+            ),
+            format: Literal['json', 'netcdf'] = Query(
+                'json',
+                description='JSON (xarray.Dataset.to_dict) or NetCDF4.',
+            ),
+            dataset: xr.Dataset = Depends(deps.dataset),
+        ) -> Response:
+            """Reduces the dataset over dimensions, memoized by dataset version and parameters."""
+            params: Dict[str, Any] = {
+                'dims': parse_list(dims),
+                'resample': resample,
+                'resample_dim': resample_dim,
+                'variables': parse_list(variables),
+                'sel': parse_selectors(sel, 'sel'),
+                'isel': parse_selectors(isel, 'isel'),
+            }
+            # equivalent requests (i.e., reordered selectors) share a key
+            cache_key = (
+                dataset_version(dataset),
+                operation,
+                json.dumps(params, sort_keys=True, default=repr),
+            )
+
+            result: xr.Dataset | None = DatasetCache.RESULTS.get(cache_key)
+            cache_status: str = 'HIT'
+            if result is None:
+                cache_status = 'MISS'
+                try:
+                    selected = select_dataset(
+                        dataset,
+                        variables=params['variables'],
+                        sel=params['sel'],
+                        isel=params['isel'],
+                    )
+                    result = reduce_dataset(
+                        selected,
+                        operation=operation,
+                        dims=params['dims'],
+                        resample=resample,
+                        resample_dim=resample_dim,
+                    )
+                except (KeyError, ValueError, TypeError, IndexError) as e:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f'Invalid reduction request: {e}',
+                    )
+                if result.nbytes > DatasetCache.MAX_COMPUTE_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=(
+                            f'The reduction result ({result.nbytes} bytes) exceeds the '
+                            f'{DatasetCache.MAX_COMPUTE_BYTES} bytes limit. Reduce over '
+                            f'more dims, or select less data first.'
+                        ),
+                    )
+                with Tracer.span('reduce.compute', **{'reduce.operation': operation}):
+                    result = result.compute()
+                result.attrs.pop(DATASET_ID_ATTR_KEY, None)
+                DatasetCache.RESULTS.put(
+                    cache_key,
+                    result,
+                    group=dataset.encoding.get(DatasetCache.CATALOG_KEY),
+                )
+
+            logger.info(
+                f'Reduction cache {cache_status} for {operation} of '
+                f'{dataset.attrs.get(DATASET_ID_ATTR_KEY, "dataset")}.',
+            )
+            headers: Dict[str, str] = {'X-Cache': cache_status}
+            if format == 'netcdf':
+                return StreamingResponse(
+                    stream_netcdf(result),
+                    media_type='application/x-netcdf',
+                    headers=headers,
+                )
+            with Tracer.span('reduce.encode', **{'reduce.format': format}):
+                return JSONResponse(
+                    result.to_dict(data='list'),
+                    headers=headers,
+                    render_kwargs={'default': str},
+                )
+
+        return router
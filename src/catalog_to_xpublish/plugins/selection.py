@@ -0,0 +1,115 @@
+"""
+Shared helpers to parse and apply dataset selections for the dataset plugins.
+"""
+import json
+import xarray as xr
+from fastapi import HTTPException
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+
+def parse_selectors(
+    selectors: Optional[str],
+    name: str,
+) -> Dict[str, Any]:
+    """Parses a JSON dict of dimension selectors (i.e., '{"lat": [10, 20]}').
+
+    Two or three item lists are converted to slices, all other values are
+    passed to xarray as is.
+    """
+    if not selectors:
+        return {}
+    try:
+        selectors = json.loads(selectors)
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f'{name} must be a JSON object, not {selectors}. Error: {e}',
+        )
+    if not isinstance(selectors, dict):
+        raise HTTPException(
+            status_code=400,
+            detail=f'{name} must be a JSON object, not {type(selectors)}',
+        )
+
+    parsed: Dict[str, Any] = {}
+    for dim, value in selectors.items():
+        if isinstance(value, list) and len(value) in [2, 3]:
+            value = slice(*value)
+        parsed[dim] = value
+    return parsed
+
+
+def parse_list(
+    values: Optional[str],
+) -> List[str] | None:
+    """Parses a comma separated query parameter (i.e., 'temp,precip')."""
+    if not values:
+        return None
+    return [v.strip() for v in values.split(',') if v.strip()]
+
+
+def select_dataset(
+    dataset: xr.Dataset,
+    variables: Optional[List[str]] = None,
+    sel: Optional[Dict[str, Any]] = None,
+    isel: Optional[Dict[str, Any]] = None,
+    method: Optional[str] = None,
+) -> xr.Dataset:
+    """Lazily selects variables and a region of a dataset.
+
+    Arguments:
+        dataset: The dataset to select from.
+        variables: A list of data variables to keep. Defaults to all.
+        sel: A dict of label based selectors (values or slices).
+        isel: A dict of index based selectors (integers or slices).
+        method: The method used for non-slice label selection (i.e., 'nearest').
+
+    Returns:
+        The selected dataset.
+    """
+    if variables:
+        missing: List[str] = [v for v in variables if v not in dataset.data_vars]
+        if missing:
+            raise KeyError(
+                f'Variables {missing} are not in the dataset. '
+                f'Choose from {list(dataset.data_vars)}',
+            )
+        dataset = dataset[variables]
+
+    if isel:
+        dataset = dataset.isel(isel)
+
+    if sel:
+        # xarray does not allow a method w/ slices
+        slices = {k: v for k, v in sel.items() if isinstance(v, slice)}
+        labels = {k: v for k, v in sel.items() if not isinstance(v, slice)}
+        if slices:
+            dataset = dataset.sel(slices)
+        if labels:
+            dataset = dataset.sel(labels, method=method)
+    return dataset
+
+
+def auto_chunk(
+    dataset: xr.Dataset,
+) -> xr.Dataset:
+    """Chunks all non-index variables w/ regular ('auto' sized) dask chunks.
+
+    This lets writes and reductions stream through the data chunk-by-chunk,
+    even if the dataset was opened without dask.
+    """
+    chunked: Dict[str, xr.Variable] = {}
+    for name, var in dataset.variables.items():
+        if name in dataset.indexes or var.dtype.kind == 'O':
+            continue
+        chunked[name] = var.chunk('auto')
+    return dataset.assign(
+        {k: v for k, v in chunked.items() if k in dataset.data_vars},
+    ).assign_coords(
+        {k: v for k, v in chunked.items() if k in dataset.coords},
+    )
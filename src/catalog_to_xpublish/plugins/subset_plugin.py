@@ -0,0 +1,375 @@
+"""
+An xpublish plugin to download a server-side subset of a dataset as NetCDF or zipped zarr.
+"""
+import contextvars
+import io
+import logging
+import os
+import queue
+import tempfile
+import threading
+import zipfile
+import xarray as xr
+from collections.abc import MutableMapping
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+)
+from starlette.responses import StreamingResponse
+from xpublish import (
+    Dependencies,
+    Plugin,
+    hookimpl,
+)
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.plugins.selection import (
+    auto_chunk,
+    parse_list,
+    parse_selectors,
+    select_dataset,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+)
+
+logger = logging.getLogger(__name__)
+
+# encoding keys that are safe to carry over to a new file/store
+KEEP_ENCODING_KEYS: List[str] = [
+    'dtype',
+    '_FillValue',
+    'missing_value',
+    'scale_factor',
+    'add_offset',
+    'units',
+    'calendar',
+]
+
+# zarr metadata keys are held in memory and written last
+ZARR_META_KEYS: List[str] = [
+    '.zarray',
+    '.zattrs',
+    '.zgroup',
+    '.zmetadata',
+]
+
+_DONE = object()
+
+
+def subset_dataset(
+    dataset: xr.Dataset,
+    variables: Optional[List[str]] = None,
+    sel: Optional[Dict[str, Any]] = None,
+    isel: Optional[Dict[str, Any]] = None,
+    method: Optional[str] = None,
+) -> xr.Dataset:
+    """Lazily subsets a dataset and prepares it for writing.
+
+    Arguments:
+        dataset: The dataset to subset.
+        variables: A list of data variables to keep. Defaults to all.
+        sel: A dict of label based selectors (values or slices).
+        isel: A dict of index based selectors (integers or slices).
+        method: The method used for non-slice label selection (i.e., 'nearest').
+
+    Returns:
+        The subset dataset, chunked for incremental writing.
+    """
+    dataset = select_dataset(
+        dataset,
+        variables=variables,
+        sel=sel,
+        isel=isel,
+        method=method,
+    )
+
+    # drop source encodings (i.e., chunks/compressors) that may not fit the subset
+    dataset = dataset.copy(deep=False)
+    dataset.attrs.pop(DATASET_ID_ATTR_KEY, None)
+    dataset.encoding = {}
+    for var in dataset.variables.values():
+        var.encoding = {
+            k: v for k, v in var.encoding.items() if k in KEEP_ENCODING_KEYS
+        }
+
+    # write w/ regular dask chunks so the result is never fully in memory
+    return auto_chunk(dataset)
+
+
+class _QueueWriter(io.RawIOBase):
+    """A write-only, unseekable file object that puts bytes onto a bounded queue."""
+
+    def __init__(
+        self,
+        byte_queue: queue.Queue,
+        cancelled: threading.Event,
+    ) -> None:
+        super().__init__()
+        self.byte_queue = byte_queue
+        self.cancelled = cancelled
+        self.aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        # once aborted, writes (i.e., closing the zip) are dropped
+        if self.aborted:
+            return len(data)
+        while True:
+            if self.cancelled.is_set():
+                raise ConnectionAbortedError('The download was cancelled.')
+            try:
+                self.byte_queue.put(data, timeout=1)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+class ZipStreamStore(MutableMapping):
+    """A write-only zarr store that streams chunks into a zip archive as they are written.
+
+    Chunks are written to the archive immediately and never retained, while the
+    (small) metadata keys are kept in memory and written on close.
+    """
+
+    def __init__(
+        self,
+        fileobj: io.RawIOBase,
+    ) -> None:
+        self.fileobj = fileobj
+        self.zip_file = zipfile.ZipFile(
+            fileobj,
+            mode='w',
+            compression=zipfile.ZIP_STORED,
+            allowZip64=True,
+        )
+        self.meta: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _is_meta(key: str) -> bool:
+        return key.split('/')[-1] in ZARR_META_KEYS
+
+    def __setitem__(self, key: str, value) -> None:
+        if self._is_meta(key):
+            self.meta[key] = bytes(value)
+            return None
+        with self.lock:
+            self.zip_file.writestr(key, bytes(value))
+
+    def __getitem__(self, key: str) -> bytes:
+        return self.meta[key]
+
+    def __delitem__(self, key: str) -> None:
+        del self.meta[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.meta))
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def close(self) -> None:
+        """Writes the metadata keys and the zip central directory."""
+        with self.lock:
+            for key, value in self.meta.items():
+                self.zip_file.writestr(key, value)
+            self.zip_file.close()
+
+    def abort(self) -> None:
+        """Closes the zip archive w/o writing anything further (i.e., on cancel or error)."""
+        self.fileobj.aborted = True
+        with self.lock:
+            self.zip_file.close()
+
+
+def stream_zarr_zip(
+    dataset: xr.Dataset,
+    max_queued: int = 16,
+) -> Iterator[bytes]:
+    """Yields a zipped zarr store of the dataset as it is written.
+
+    The dataset is written chunk-by-chunk in a background thread, and the bounded
+    queue stops the writer from getting ahead of a slow client.
+    """
+    byte_queue: queue.Queue = queue.Queue(maxsize=max_queued)
+    cancelled = threading.Event()
+
+    def write() -> None:
+        store: Optional[ZipStreamStore] = None
+        try:
+            store = ZipStreamStore(_QueueWriter(byte_queue, cancelled))
+            # the store lives in this process, so do not ship writes to a cluster
+            # (the scheduler is passed to this write only, not set process wide)
+            with Tracer.span('subset.encode', **{'subset.format': 'zarr'}):
+                dataset.to_zarr(
+                    store,
+                    mode='w',
+                    consolidated=True,
+                    compute=False,
+                ).compute(scheduler='threads')
+            store.close()
+            item = _DONE
+        except BaseException as e:
+            # close the zip here, rather than raise from its __del__ during GC
+            if store is not None:
+                store.abort()
+            item = e
+        while not cancelled.is_set():
+            try:
+                byte_queue.put(item, timeout=1)
+                break
+            except queue.Full:
+                continue
+
+    # run the writer in this context so its spans belong to the request
+    writer = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(write,),
+        daemon=True,
+    )
+    writer.start()
+    try:
+        while True:
+            item = byte_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # unblock the writer if the client disconnected
+        cancelled.set()
+        writer.join()
+
+
+def stream_netcdf(
+    dataset: xr.Dataset,
+    block_size: int = 2**20,
+) -> Iterator[bytes]:
+    """Yields a NetCDF4 file of the dataset in blocks.
+
+    NetCDF can not be streamed while writing, so the file is written chunk-by-chunk
+    to a temporary file, streamed, and deleted.
+    """
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    os.close(fd)
+    try:
+        with Tracer.span('subset.encode', **{'subset.format': 'netcdf'}):
+            dataset.to_netcdf(
+                path,
+                engine='h5netcdf',
+                compute=False,
+            ).compute(scheduler='threads')
+        with open(path, 'rb') as f:
+            while block := f.read(block_size):
+                yield block
+    finally:
+        os.remove(path)
+
+
+class SubsetPlugin(Plugin):
+    """Adds an endpoint to download a server-side subset of a dataset."""
+
+    name: str = 'subset'
+
+    dataset_router_prefix: str = '/subset'
+    dataset_router_tags: Sequence[str] = ['subset']
+
+    @hookimpl
+    def dataset_router(self, deps: Dependencies) -> APIRouter:
+        router = APIRouter(
+            prefix=self.dataset_router_prefix,
+            tags=list(self.dataset_router_tags),
+        )
+
+        @router.get('/')
+        def get_subset(
+            variables: Optional[str] = Query(
+                None,
+                description='Comma separated data variables to keep (default is all).',
+            ),
+            sel: Optional[str] = Query(
+                None,
+                description=(
+                    'JSON label based selectors, lists are slices '
+                    '(i.e., {"lat": [10, 20], "time": "2020-01-01"}).'
+                ),
+            ),
+            isel: Optional[str] = Query(
+                None,
+                description='JSON index based selectors, lists are slices (i.e., {"time": [0, 10]}).',
+            ),
+            method: Optional[Literal['nearest', 'pad', 'backfill']] = Query(
+                None,
+                description='The method used for non-slice sel values.',
+            ),
+            format: Literal['netcdf', 'zarr'] = Query(
+                'netcdf',
+                description='NetCDF4 or a zipped zarr store.',
+            ),
+            dataset: xr.Dataset = Depends(deps.dataset),
+        ) -> StreamingResponse:
+            """Streams a subset of the dataset as a NetCDF4 file or zipped zarr store."""
+            try:
+                subset = subset_dataset(
+                    dataset,
+                    variables=parse_list(variables),
+                    sel=parse_selectors(sel, 'sel'),
+                    isel=parse_selectors(isel, 'isel'),
+                    method=method,
+                )
+            except (KeyError, ValueError, TypeError, IndexError) as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f'Invalid subset request: {e}',
+                )
+
+            if subset.nbytes > DatasetCache.MAX_SUBSET_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=(
+                        f'The subset ({subset.nbytes} bytes) exceeds the '
+                        f'{DatasetCache.MAX_SUBSET_BYTES} bytes limit. Select less data, '
+                        f'or fewer variables.'
+                    ),
+                )
+
+            dataset_id: str = dataset.attrs.get(DATASET_ID_ATTR_KEY, 'subset')
+            logger.info(
+                f'Streaming a {subset.nbytes / 2**20:.2f} MiB (uncompressed) '
+                f'{format} subset of {dataset_id}.',
+            )
+            if format == 'zarr':
+                return StreamingResponse(
+                    stream_zarr_zip(subset),
+                    media_type='application/zip',
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{dataset_id}.zarr.zip"',
+                    },
+                )
+            return StreamingResponse(
+                stream_netcdf(subset),
+                media_type='application/x-netcdf',
+                headers={
+                    'Content-Disposition': f'attachment; filename="{dataset_id}.nc"',
+                },
+            )
+
+        return router
@@ -0,0 +1,344 @@
+"""
+An opt-in, low-overhead sampling profiler for individual requests.
+"""
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import anyio
+from collections import Counter
+from pathlib import Path
+from starlette.responses import JSONResponse
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.metrics import (
+    get_route_template,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+# (file name, function) pairs of a thread waiting for work (not worth sampling)
+IDLE_FRAMES: List[Tuple[str, str]] = [
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('_thread.py', 'run'),
+]
+
+# a function is identified by (file name, first line, name)
+FunctionKey = Tuple[str, int, str]
+
+
+class ProfilingConfigDict(TypedDict):
+    """A dictionary to hold the optional request profiling args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        profile_dir: The directory to write per-request JSON profiles to.
+        sample_rate: The fraction of requests to profile (default is 0.0).
+        admin_header: A request header that forces profiling (default is X-Profile).
+        admin_token: The value the admin header must carry. If not provided, the
+            admin header is ignored (only sampled requests are profiled).
+        interval: The stack sampling interval in seconds (default is 0.005).
+        max_profiles: The number of profiles to keep on disk (default is 100).
+    """
+    profile_dir: Optional[str | Path]
+    sample_rate: Optional[float]
+    admin_header: Optional[str]
+    admin_token: Optional[str]
+    interval: Optional[float]
+    max_profiles: Optional[int]
+
+
+class StackSampler:
+    """Samples the stacks of all busy threads at a fixed interval.
+
+    NOTE: Work for a request is spread over the event loop and the thread pool
+    (i.e., opening datasets, reading/encoding chunks), so all threads are sampled.
+    Only one request is profiled at a time, but concurrent requests may appear.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+    ) -> None:
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.n_samples: int = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='catalog_to_xpublish-profiler',
+            daemon=True,
+        )
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.n_samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident or self._is_idle(frame):
+                    continue
+                stack: List[FunctionKey] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self.samples[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def summarize(self) -> Dict[str, Any]:
+        """Returns the samples as function stats and collapsed stacks."""
+        self_samples: Counter = Counter()
+        cumulative_samples: Counter = Counter()
+        stacks: Dict[str, int] = {}
+        for stack, count in self.samples.items():
+            self_samples[stack[-1]] += count
+            for function in set(stack):
+                cumulative_samples[function] += count
+            collapsed = ';'.join(
+                f'{name} ({os.path.basename(file)}:{line})' for file, line, name in stack
+            )
+            stacks[collapsed] = count
+
+        functions: List[Dict[str, Any]] = [
+            {
+                'function': name,
+                'file': file,
+                'line': line,
+                'self_seconds': self_samples[(file, line, name)] * self.interval,
+                'cumulative_seconds': count * self.interval,
+            }
+            for (file, line, name), count in cumulative_samples.most_common()
+        ]
+        return {
+            'interval': self.interval,
+            'n_samples': self.n_samples,
+            'functions': functions,
+            'stacks': stacks,
+        }
+
+
+class RequestProfiler:
+    """A class to hold the request profiling configuration."""
+
+    ENABLED: bool = False
+    PROFILE_DIR: Path = Path('profiles')
+    SAMPLE_RATE: float = 0.0
+    ADMIN_HEADER: str = 'X-Profile'
+    ADMIN_TOKEN: str | None = None
+    INTERVAL: float = 0.005
+    MAX_PROFILES: int = 100
+    _LOCK: threading.Lock = threading.Lock()
+
+    @classmethod
+    def config_profiling(
+        cls,
+        config_dict: Optional[ProfilingConfigDict] = None,
+    ) -> None:
+        """Configure request profiling.
+
+        Arguments:
+            config_dict: A dictionary of optional profiling args.
+                If None, no requests are profiled.
+
+        Returns:
+            None. Sets the global profiling configuration.
+        """
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        profile_dir = Path(config_dict.get('profile_dir', cls.PROFILE_DIR))
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+        sample_rate: float = config_dict.get('sample_rate', 0.0)
+        if not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+            raise ValueError(
+                f'sample_rate must be between 0 and 1, not {sample_rate}',
+            )
+        interval: float = config_dict.get('interval', 0.005)
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise ValueError(
+                f'interval must be a positive number of seconds, not {interval}',
+            )
+        max_profiles: int = config_dict.get('max_profiles', 100)
+        if not isinstance(max_profiles, int) or max_profiles < 1:
+            raise ValueError(
+                f'max_profiles must be a positive int, not {max_profiles}',
+            )
+
+        cls.ENABLED = True
+        cls.PROFILE_DIR = profile_dir
+        cls.SAMPLE_RATE = float(sample_rate)
+        cls.ADMIN_HEADER = config_dict.get('admin_header', 'X-Profile')
+        cls.ADMIN_TOKEN = config_dict.get('admin_token', None)
+        cls.INTERVAL = float(interval)
+        cls.MAX_PROFILES = max_profiles
+        logger.info(
+            f'Profiling {cls.SAMPLE_RATE:.1%} of requests'
+            f'{f" (and requests w/ the {cls.ADMIN_HEADER} header)" if cls.ADMIN_TOKEN else ""}'
+            f' to {cls.PROFILE_DIR}.',
+        )
+
+    @classmethod
+    def should_profile(
+        cls,
+        scope: Scope,
+    ) -> bool:
+        """Returns True if a request was sampled or carries the admin header (and token)."""
+        if cls.ADMIN_TOKEN is not None:
+            header: bytes = cls.ADMIN_HEADER.lower().encode()
+            for key, value in scope.get('headers', []):
+                if key == header:
+                    return hmac.compare_digest(value, cls.ADMIN_TOKEN.encode())
+        return cls.SAMPLE_RATE > 0 and random.random() < cls.SAMPLE_RATE
+
+    @classmethod
+    def write_profile(
+        cls,
+        profile: Dict[str, Any],
+    ) -> Path:
+        """Writes a profile to disk and removes the oldest beyond MAX_PROFILES."""
+        path: Path = cls.PROFILE_DIR / f'{profile["id"]}.json'
+        path.write_text(json.dumps(profile))
+
+        profiles: List[Path] = sorted(
+            cls.PROFILE_DIR.glob('*.json'),
+            key=lambda p: p.stat().st_mtime,
+        )
+        for old_path in profiles[:-cls.MAX_PROFILES]:
+            old_path.unlink(missing_ok=True)
+        return path
+
+    @classmethod
+    def get_profiles_summary(
+        cls,
+        route: Optional[str] = None,
+        limit: int = 25,
+    ) -> JSONResponse:
+        """Returns the top functions by cumulative time across stored profiles.
+
+        Will be added to the main application as @app.get('/profiles').
+        Use ?route= to filter by route template and ?limit= to set the number of functions.
+        """
+        profiles: List[Dict[str, Any]] = []
+        totals: Dict[FunctionKey, Dict[str, float]] = {}
+        for path in sorted(cls.PROFILE_DIR.glob('*.json'), reverse=True):
+            try:
+                profile: Dict[str, Any] = json.loads(path.read_text())
+            except (OSError, json.JSONDecodeError):
+                continue
+            if route and profile['request']['route'] != route:
+                continue
+            profiles.append({'id': profile['id'], **profile['request']})
+            for f in profile['functions']:
+                key = (f['file'], f['line'], f['function'])
+                total = totals.setdefault(key, {'self_seconds': 0.0, 'cumulative_seconds': 0.0})
+                total['self_seconds'] += f['self_seconds']
+                total['cumulative_seconds'] += f['cumulative_seconds']
+
+        top = sorted(
+            totals.items(),
+            key=lambda item: item[1]['cumulative_seconds'],
+            reverse=True,
+        )[:limit]
+        return JSONResponse({
+            'n_profiles': len(profiles),
+            'top_functions': [
+                {'function': name, 'file': file, 'line': line, **seconds}
+                for (file, line, name), seconds in top
+            ],
+            'profiles': profiles,
+        })
+
+
+class ProfilingMiddleware:
+    """A pure ASGI middleware profiling sampled (or admin header) requests."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+    ) -> None:
+        self.app = app
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        if (
+            scope['type'] != 'http'
+            or not RequestProfiler.ENABLED
+            or not RequestProfiler.should_profile(scope)
+            # only one request is profiled at a time
+            or not RequestProfiler._LOCK.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return None
+
+        profile_id: str = f'{time.strftime("%Y%m%dT%H%M%S")}_{uuid.uuid4().hex[:8]}'
+        root_path: str = scope.get('root_path', '')
+        status_code: List[int] = [500]
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                status_code[0] = message['status']
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [
+                    (b'x-profile-id', profile_id.encode()),
+                ]
+            await send(message)
+
+        sampler = StackSampler(RequestProfiler.INTERVAL)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            RequestProfiler._LOCK.release()
+            profile: Dict[str, Any] = {
+                'id': profile_id,
+                'request': {
+                    'method': scope.get('method', ''),
+                    'path': scope.get('path', ''),
+                    'route': get_route_template(scope, root_path),
+                    'status': status_code[0],
+                    'duration_seconds': time.perf_counter() - start,
+                },
+                **sampler.summarize(),
+            }
+            # don't block the event loop on disk I/O
+            await anyio.to_thread.run_sync(RequestProfiler.write_profile, profile)
@@ -1,3 +1,4 @@
+import functools
 import xarray as xr
 # NOTE: I had to add a import dask.array line to zarr.py in the xpublish source code.
 # a bit wierd... since I can just get dask.array.Array in my terminal
@@ -6,17 +7,110 @@ from catalog_to_xpublish.base import (
     CatalogEndpoint,
     CatalogToXarray,
 )
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCache,
+)
+from catalog_to_xpublish.deadlines import (
+    Deadlines,
+)
+from catalog_to_xpublish.federation import (
+    Federation,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
 from xpublish import (
     Plugin,
     hookimpl,
 )
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
+from urllib.parse import (
+    quote,
+    unquote,
+)
 from typing import (
     Any,
     List,
     Dict,
+    Optional,
+    Tuple,
 )
 
 
+def get_cached_dataset(
+    catalog_endpoint: CatalogEndpoint,
+    io_obj: CatalogToXarray,
+    dataset_id: str,
+    xpublish_id: Optional[str] = None,
+) -> xr.Dataset:
+    """Returns a catalog endpoint's (lazy) dataset, opening and caching it on a miss.
+
+    Arguments:
+        catalog_endpoint: The catalog endpoint holding the dataset.
+        io_obj: The endpoint's catalog to xarray reader.
+        dataset_id: The dataset's id in the catalog endpoint.
+        xpublish_id: The id xpublish serves the dataset as (default is dataset_id).
+    """
+    # re-use the opened (lazy) dataset if its catalog entry is unchanged
+    version: str = DatasetCache.dataset_version(
+        catalog_endpoint,
+        dataset_id,
+    )
+    cache_key = (catalog_endpoint.catalog_path, dataset_id, version)
+    ds: xr.Dataset | None = DatasetCache.DATASETS.get(cache_key)
+    if ds is None:
+        catalog_type: str = io_obj.catalog_type
+        Metrics.DATASET_OPENS_IN_FLIGHT.inc(catalog_type=catalog_type)
+        try:
+            # a timed out/cancelled open raises, so it is never cached
+            with (
+                Deadlines.scope(Deadlines.OPEN_TIMEOUT),
+                CoordinateCache.scope(version),
+                Metrics.DATASET_OPEN_DURATION.time(catalog_type=catalog_type),
+                Metrics.account_io() as totals,
+                Tracer.span(
+                    'get_dataset_from_catalog',
+                    **{
+                        'catalog.type': catalog_type,
+                        'catalog.path': catalog_endpoint.catalog_path,
+                        'dataset.id': dataset_id,
+                    },
+                ),
+            ):
+                ds = io_obj.get_dataset_from_catalog(dataset_id)
+                ds = CoordinateCache.attach(
+                    ds,
+                    reopen=functools.partial(io_obj.get_dataset_from_catalog, dataset_id),
+                )
+        except Exception:
+            Metrics.DATASET_OPEN_ERRORS.inc(catalog_type=catalog_type)
+            raise
+        finally:
+            Metrics.DATASET_OPENS_IN_FLIGHT.dec(catalog_type=catalog_type)
+        Metrics.record_io(
+            totals,
+            source='open',
+            endpoint=catalog_endpoint.catalog_path,
+            dataset=dataset_id,
+        )
+
+        # xpublish keys its zarr metadata/chunk caches on the dataset id
+        ds.attrs[DATASET_ID_ATTR_KEY] = xpublish_id or dataset_id
+        ds.encoding[DatasetCache.VERSION_KEY] = version
+        # count the dataset (and its results) against its federated catalog's quotas
+        catalog: str | None = Federation.get_catalog(catalog_endpoint.catalog_path)
+        if catalog is not None:
+            ds.encoding[DatasetCache.CATALOG_KEY] = catalog
+        DatasetCache.DATASETS.put(cache_key, ds, group=catalog)
+    return ds
+
+
 class DatasetProviderPlugin(Plugin):
     """A dataset router plugin for the xpublish-opendap-server.
 
@@ -62,6 +156,93 @@ class DatasetProviderPlugin(Plugin):
         self,
         dataset_id: str,
     ) -> xr.Dataset | None:
-        if dataset_id in self.catalog_endpoint_obj.dataset_ids:
-            return self.io_class.get_dataset_from_catalog(dataset_id)
-        return None
+        if dataset_id not in self.catalog_endpoint_obj.dataset_ids:
+            return None
+        return get_cached_dataset(
+            self.catalog_endpoint_obj,
+            self.io_class,
+            dataset_id,
+        )
+
+
+def dataset_key(
+    catalog_path: str,
+    dataset_id: str,
+) -> str:
+    """Returns the (url encoded, so slash free) id the shared xpublish app serves a dataset as."""
+    return quote(f'{catalog_path.rstrip("/")}/{dataset_id}', safe='')
+
+
+class SharedDatasetProviderPlugin(Plugin):
+    """A dataset router plugin serving the datasets of all catalog endpoints.
+
+    Datasets are served as {catalog_path}/{dataset_id} (url encoded, see dataset_key()),
+    so one xpublish app (w/ one set of plugin instances) serves every catalog endpoint.
+    """
+    name: str = 'catalog-endpoints-provider'
+    catalog_endpoints: Dict[str, CatalogEndpoint] = {}
+    io_classes: Dict[str, Any] = {}
+    io_objs: Dict[str, CatalogToXarray] = {}
+    model_config: Dict[str, Any] = {'arbitrary_types_allowed': True}
+
+    def __init__(
+        self,
+        catalog_endpoints: List[Tuple[CatalogEndpoint, type[CatalogToXarray]]],
+        *args,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+
+        # check the input types
+        for catalog_endpoint, io_class in catalog_endpoints:
+            if not isinstance(catalog_endpoint, CatalogEndpoint):
+                raise ValueError(
+                    'catalog_endpoints must hold instances of CatalogEndpoint',
+                )
+            if not issubclass(io_class, CatalogToXarray):
+                raise ValueError(
+                    'io_class must be a subclass of CatalogToXarray',
+                )
+
+        # init the class variables (readers are created on an endpoint's first open)
+        self.catalog_endpoints = {
+            catalog_endpoint.catalog_path: catalog_endpoint
+            for catalog_endpoint, _ in catalog_endpoints
+        }
+        self.io_classes = {
+            catalog_endpoint.catalog_path: io_class
+            for catalog_endpoint, io_class in catalog_endpoints
+        }
+        self.io_objs = {}
+
+    @hookimpl
+    def get_datasets(self) -> List[str]:
+        return [
+            dataset_key(catalog_path, dataset_id)
+            for catalog_path, catalog_endpoint in self.catalog_endpoints.items()
+            for dataset_id in catalog_endpoint.dataset_ids
+        ]
+
+    @hookimpl
+    def get_dataset(
+        self,
+        dataset_id: str,
+    ) -> xr.Dataset | None:
+        catalog_path, _, endpoint_dataset_id = unquote(dataset_id).rpartition('/')
+        catalog_path = catalog_path or '/'
+        catalog_endpoint: CatalogEndpoint | None = self.catalog_endpoints.get(catalog_path)
+        if catalog_endpoint is None or endpoint_dataset_id not in catalog_endpoint.dataset_ids:
+            return None
+
+        io_obj: CatalogToXarray | None = self.io_objs.get(catalog_path)
+        if io_obj is None:
+            io_obj = self.io_classes[catalog_path](
+                catalog_obj=catalog_endpoint.catalog_obj,
+            )
+            self.io_objs[catalog_path] = io_obj
+        return get_cached_dataset(
+            catalog_endpoint,
+            io_obj,
+            endpoint_dataset_id,
+            xpublish_id=dataset_id,
+        )
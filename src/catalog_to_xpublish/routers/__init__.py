@@ -1,7 +1,27 @@
-"""Init file for catalog routers (and any others)."""
-from catalog_to_xpublish.routers.intake_router import (
-    IntakeRouter,
-)
-from catalog_to_xpublish.routers.stac_router import (
-    STACRouter,
+"""Init file for catalog routers (and any others).
+
+NOTE: Implementations are imported on first access, so only the dependencies
+(i.e., intake or pystac) of the catalog types in use are imported.
+"""
+import importlib
+from typing import (
+    Any,
+    Dict,
+    List,
 )
+
+_MODULES: Dict[str, str] = {
+    'IntakeRouter': 'catalog_to_xpublish.routers.intake_router',
+    'STACRouter': 'catalog_to_xpublish.routers.stac_router',
+}
+__all__: List[str] = list(_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _MODULES:
+        return getattr(importlib.import_module(_MODULES[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
@@ -1,11 +1,17 @@
+import copy
 import json
+import pystac
 import yaml
 from fastapi.responses import (
     HTMLResponse,
     PlainTextResponse,
     JSONResponse,
+    StreamingResponse,
 )
 from typing import (
+    Any,
+    Dict,
+    Iterator,
     List,
     Optional,
 )
@@ -18,6 +24,11 @@ from catalog_to_xpublish.base import (
 from catalog_to_xpublish.factory import (
     CatalogRouterClass,
 )
+from catalog_to_xpublish.streaming import (
+    StreamingJSONResponse,
+    dumps,
+    iter_chunks,
+)
 
 
 @CatalogRouterClass
@@ -49,25 +60,51 @@ class STACRouter(CatalogRouter):
             :int(self.catalog_endpoint_obj.catalog_path.rfind('/')) + 1
         ]
 
-    def get_catalog_as_yaml(self) -> PlainTextResponse:
-        """Returns the catalog yaml as plain text."""
-        return PlainTextResponse(
-            content=yaml.dump(
-                json.loads(
-                    json.dumps(
-                        self.catalog_endpoint_obj.catalog_obj.to_dict(),
-                    ),
-                ),
-            ),
+    def get_catalog_dict(self) -> Dict[str, Any]:
+        """Returns the catalog as a dictionary, w/ its links as a generator.
+
+        Catalogs w/ tens of thousands of links are serialized one link at a time,
+        instead of holding all link dictionaries at once (as to_dict() does).
+        """
+        catalog_obj = self.catalog_endpoint_obj.catalog_obj
+        catalog_copy = copy.copy(catalog_obj)
+        catalog_copy.links = []
+        catalog_dict: Dict[str, Any] = catalog_copy.to_dict()
+        catalog_dict['links'] = (
+            link.to_dict()
+            for link in catalog_obj.links
+            if link.rel != pystac.RelType.ROOT or link.get_href() is not None
+        )
+        return catalog_dict
+
+    def iter_catalog_yaml(self) -> Iterator[str]:
+        """Yields the catalog yaml key by key (and link by link)."""
+        catalog_dict: Dict[str, Any] = self.get_catalog_dict()
+        for key in sorted(catalog_dict):
+            if key != 'links':
+                yield yaml.dump(json.loads(dumps({key: catalog_dict[key]})))
+                continue
+            empty: bool = True
+            for link in catalog_dict['links']:
+                if empty:
+                    yield 'links:\n'
+                    empty = False
+                yield yaml.dump([json.loads(dumps(link))])
+            if empty:
+                yield 'links: []\n'
+
+    def get_catalog_as_yaml(self) -> StreamingResponse:
+        """Returns the catalog yaml as (streamed) plain text."""
+        return StreamingResponse(
+            content=iter_chunks(self.iter_catalog_yaml()),
             media_type='text/plain',
             status_code=200,
         )
 
-    def get_catalog_as_json(self) -> JSONResponse:
-        """Returns the catalog as JSON."""
-        return JSONResponse(
-            content=self.catalog_endpoint_obj.catalog_obj.to_dict(),
-            media_type='application/json',
+    def get_catalog_as_json(self) -> StreamingJSONResponse:
+        """Returns the catalog as (streamed) JSON."""
+        return StreamingJSONResponse(
+            content=self.get_catalog_dict(),
             status_code=200,
         )
 
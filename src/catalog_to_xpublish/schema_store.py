@@ -0,0 +1,284 @@
+"""
+A persistent (sqlite) store of zarr dataset schemas, so dataset opens skip remote metadata reads.
+"""
+import json
+import logging
+import sqlite3
+import time
+import fsspec
+from contextlib import closing
+from pathlib import Path
+from zarr.storage import FSStore
+from catalog_to_xpublish.cache import (
+    get_user_cache_dir,
+    make_private_dir,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Sequence,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaStoreConfigDict(TypedDict):
+    """A dictionary to hold the optional schema store args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        path: The sqlite database file, in a directory only the server user can access.
+            Workers (and servers) on a host sharing it share the stored schemas (default
+            is schemas.sqlite in the user cache dir, i.e., ~/.cache/catalog_to_xpublish).
+        validate: Whether to check a stored schema against the source's consolidated
+            metadata ETag/mtime/size (one metadata request) before using it. Schemas of
+            unconsolidated stores can't be validated, so are not stored. If False, stored
+            schemas are used until max_age (default is True).
+        max_age: Seconds a stored schema is used for (default is no limit).
+    """
+    path: Optional[str | Path]
+    validate: Optional[bool]
+    max_age: Optional[float]
+
+
+# the zarr (v2) metadata keys a dataset open reads
+METADATA_KEYS: tuple[str, ...] = ('.zmetadata', '.zgroup', '.zattrs', '.zarray')
+
+# source info fields (across fsspec filesystems) that change when a file does
+VALIDATOR_FIELDS: tuple[str, ...] = (
+    'ETag', 'Last-Modified', 'Content-MD5', 'LastModified', 'generation', 'md5Hash', 'mtime', 'size',
+)
+
+
+class SchemaFSStore(FSStore):
+    """A zarr FSStore serving metadata (and listings) from a stored schema.
+
+    Metadata keys missing from the schema are read from the source and recorded
+    (including missing ones, i.e., .zmetadata of an unconsolidated store), so
+    the schema can be stored once the dataset is opened. Chunks are always read
+    from the source.
+
+    Arguments:
+        url: The zarr store's URL.
+        fs: The filesystem to read the store w/.
+        schema: A stored schema (if None, one is recorded).
+        validator: The source's validator when the schema was read/recorded.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        fs: fsspec.AbstractFileSystem,
+        schema: Optional[Dict[str, Any]] = None,
+        validator: Optional[str] = None,
+    ) -> None:
+        super().__init__(url, fs=fs, mode='r')
+        self.url = url
+        self.validator = validator
+        self.schema: Dict[str, Any] = schema or {'keys': {}, 'listdir': {}}
+        self.modified: bool = schema is None
+
+    @staticmethod
+    def is_metadata_key(key: str) -> bool:
+        return key.rsplit('/', 1)[-1] in METADATA_KEYS
+
+    def __getitem__(self, key: str) -> bytes:
+        if not self.is_metadata_key(key):
+            return super().__getitem__(key)
+        keys: Dict[str, str | None] = self.schema['keys']
+        if key not in keys:
+            try:
+                keys[key] = super().__getitem__(key).decode()
+            except KeyError:
+                keys[key] = None
+            self.modified = True
+        if keys[key] is None:
+            raise KeyError(key)
+        return keys[key].encode()
+
+    def __contains__(self, key: str) -> bool:
+        if not self.is_metadata_key(key):
+            return super().__contains__(key)
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def getitems(
+        self,
+        keys: Sequence[str],
+        *,
+        contexts: Mapping[str, Any],
+    ) -> Mapping[str, Any]:
+        metadata_keys: List[str] = [key for key in keys if self.is_metadata_key(key)]
+        results: Dict[str, Any] = {}
+        if len(metadata_keys) < len(keys):
+            results.update(
+                super().getitems(
+                    [key for key in keys if not self.is_metadata_key(key)],
+                    contexts=contexts,
+                ),
+            )
+        for key in metadata_keys:
+            try:
+                results[key] = self[key]
+            except KeyError:
+                pass
+        return results
+
+    def listdir(
+        self,
+        path: Optional[str] = None,
+    ) -> List[str]:
+        listings: Dict[str, List[str]] = self.schema['listdir']
+        if (path or '') not in listings:
+            listings[path or ''] = super().listdir(path)
+            self.modified = True
+        return listings[path or '']
+
+
+class SchemaStore:
+    """A class to hold the schema store configuration.
+
+    The schema of an opened zarr dataset (its metadata keys, holding the dims,
+    variables, dtypes, chunking, attrs and encodings) is stored by the dataset's
+    URL in a sqlite database shared by all workers. Later opens (i.e., after a
+    restart) rebuild the lazy dataset from the stored schema, so only data (chunk)
+    reads touch the source.
+
+    NOTE: Index coordinates are still read when opening (see CoordinateCache).
+    """
+
+    ENABLED: bool = False
+    PATH: Path = get_user_cache_dir() / 'schemas.sqlite'
+    VALIDATE: bool = True
+    MAX_AGE: float | None = None
+
+    @classmethod
+    def connect(cls) -> sqlite3.Connection:
+        """Returns a new connection (sqlite connections can't be shared across threads)."""
+        connection = sqlite3.connect(cls.PATH, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    @classmethod
+    def config_schema_store(
+        cls,
+        config_dict: Optional[SchemaStoreConfigDict] = None,
+    ) -> None:
+        """Configure the persistent schema store.
+
+        Arguments:
+            config_dict: A dictionary of optional schema store args.
+                If None, dataset metadata is read from the source on every open.
+
+        Returns:
+            None. Sets the global schema store configuration.
+        """
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        max_age: float | None = config_dict.get('max_age')
+        if max_age is not None and (
+            not isinstance(max_age, (int, float)) or isinstance(max_age, bool) or max_age <= 0
+        ):
+            raise ValueError(f'max_age must be a positive number of seconds, not {max_age}')
+
+        cls.PATH = Path(config_dict.get('path') or get_user_cache_dir() / 'schemas.sqlite')
+        cls.VALIDATE = bool(config_dict.get('validate', True))
+        cls.MAX_AGE = max_age
+        make_private_dir(cls.PATH.parent)
+        with closing(cls.connect()) as connection, connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS schemas ('
+                'url TEXT PRIMARY KEY, validator TEXT, schema TEXT, stored REAL)',
+            )
+        cls.ENABLED = True
+        logger.info(
+            f'Storing dataset schemas in {cls.PATH} '
+            f'(validate={cls.VALIDATE}, max_age={cls.MAX_AGE}).',
+        )
+
+    @staticmethod
+    def get_file_validator(
+        path: str,
+        fs: fsspec.AbstractFileSystem,
+    ) -> str | None:
+        """Returns the ETag/mtime/size of a file (None if it does not exist)."""
+        try:
+            info: Dict[str, Any] = fs.info(path)
+        except (FileNotFoundError, KeyError):
+            return None
+        return json.dumps(
+            {field: str(info[field]) for field in VALIDATOR_FIELDS if field in info},
+            sort_keys=True,
+        )
+
+    @classmethod
+    def get_validator(
+        cls,
+        url: str,
+        fs: fsspec.AbstractFileSystem,
+    ) -> str | None:
+        """Returns the ETag/mtime/size of a zarr store's consolidated metadata.
+
+        Returns None for an unconsolidated store, as changing an array (i.e., a resize)
+        only rewrites that array's .zarray, so no one key validates the whole schema.
+        """
+        return cls.get_file_validator(f'{url.rstrip("/")}/.zmetadata', fs)
+
+    @classmethod
+    def open_store(
+        cls,
+        url: str,
+        fs: fsspec.AbstractFileSystem,
+    ) -> SchemaFSStore:
+        """Returns a zarr store for a URL, serving metadata from its stored schema if valid."""
+        validator: str | None = None
+        if cls.VALIDATE:
+            validator = cls.get_validator(url, fs)
+            if validator is None:
+                Metrics.SCHEMA_STORE_LOOKUPS.inc(result='unvalidated')
+                return SchemaFSStore(url, fs)
+        with closing(cls.connect()) as connection:
+            row = connection.execute(
+                'SELECT validator, schema, stored FROM schemas WHERE url = ?',
+                (url,),
+            ).fetchone()
+
+        schema: Dict[str, Any] | None = None
+        if row is None:
+            result = 'miss'
+        elif (cls.VALIDATE and row[0] != validator) or (
+            cls.MAX_AGE is not None and time.time() - row[2] > cls.MAX_AGE
+        ):
+            result = 'stale'
+        else:
+            result = 'hit'
+            schema = json.loads(row[1])
+        Metrics.SCHEMA_STORE_LOOKUPS.inc(result=result)
+        return SchemaFSStore(url, fs, schema=schema, validator=validator)
+
+    @classmethod
+    def save(
+        cls,
+        store: SchemaFSStore,
+    ) -> None:
+        """Stores the (newly recorded) schema of an opened store, if it can be validated."""
+        if not store.modified or (cls.VALIDATE and store.validator is None):
+            return None
+        with closing(cls.connect()) as connection, connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO schemas (url, validator, schema, stored) VALUES (?, ?, ?, ?)',
+                (store.url, store.validator, json.dumps(store.schema), time.time()),
+            )
+        store.modified = False
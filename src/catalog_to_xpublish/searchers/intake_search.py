@@ -7,6 +7,15 @@ from catalog_to_xpublish.base import (
 from catalog_to_xpublish.factory import (
     CatalogSearcherClass,
 )
+from catalog_to_xpublish.sharding import (
+    Sharding,
+)
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
 from typing import (
     List,
     Dict,
@@ -90,16 +99,22 @@ class IntakeCatalogSearch(CatalogSearcher):
         sub_catalogs: List[str] = []
 
         # use recursion to drill down into the catalog
-        for child_name, child in catalog.items():
+        for child_name, child in StartupReport.timed(
+            catalog.items(),
+            kind='entry',
+            get_path=lambda name_child: parent_path + '/' + name_child[0],
+        ):
             path: str = parent_path + '/' + child_name
 
-            # if a catalog, drill deeper
+            # if a catalog, drill deeper (unless only other shards serve it)
             if isinstance(child, intake.catalog.Catalog):
-                list_of_catalog_endpoints = self.parse_catalog(
-                    catalog=child,
-                    parent_path=path,
-                    list_of_catalog_endpoints=list_of_catalog_endpoints,
-                )
+                if Sharding.should_crawl(path):
+                    with Tracer.span('parse_catalog', **{'catalog.path': path}):
+                        list_of_catalog_endpoints = self.parse_catalog(
+                            catalog=child,
+                            parent_path=path,
+                            list_of_catalog_endpoints=list_of_catalog_endpoints,
+                        )
                 sub_catalogs.append(child_name)
 
             # if the catalog contains a data source, make it a valid get dataset router
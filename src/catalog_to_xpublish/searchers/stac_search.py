@@ -7,6 +7,15 @@ from catalog_to_xpublish.base import (
 from catalog_to_xpublish.factory import (
     CatalogSearcherClass,
 )
+from catalog_to_xpublish.sharding import (
+    Sharding,
+)
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
 from pathlib import Path
 from typing import (
     List,
@@ -145,17 +154,23 @@ class STACCatalogSearch(CatalogSearcher):
         # use recursion to drill down into the catalog
         if isinstance(catalog, pystac.Catalog) or isinstance(catalog, pystac.Collection):
 
-            for child in IteratorHandler(catalog.get_children()):
+            for child in StartupReport.timed(
+                IteratorHandler(catalog.get_children()),
+                kind='catalog',
+                get_path=lambda child: parent_path + '/' + child.id,
+            ):
                 child_name = child.id
                 path: str = parent_path + '/' + child_name
 
-                # if a catalog, drill deeper
+                # if a catalog, drill deeper (unless only other shards serve it)
                 if isinstance(child, pystac.Catalog) or isinstance(child, pystac.Collection):
-                    list_of_catalog_endpoints = self.parse_catalog(
-                        catalog=child,
-                        parent_path=path,
-                        list_of_catalog_endpoints=list_of_catalog_endpoints,
-                    )
+                    if Sharding.should_crawl(path):
+                        with Tracer.span('parse_catalog', **{'catalog.path': path}):
+                            list_of_catalog_endpoints = self.parse_catalog(
+                                catalog=child,
+                                parent_path=path,
+                                list_of_catalog_endpoints=list_of_catalog_endpoints,
+                            )
                     sub_catalogs.append(child_name)
 
         # if its a collection search for assets too
@@ -166,7 +181,11 @@ class STACCatalogSearch(CatalogSearcher):
                 dataset_info_dicts=dataset_info_dicts,
             )
         elif isinstance(catalog, pystac.Catalog):
-            for item in IteratorHandler(catalog.get_items()):
+            for item in StartupReport.timed(
+                IteratorHandler(catalog.get_items()),
+                kind='item',
+                get_path=lambda item: parent_path + '/' + item.id,
+            ):
 
                 self._parse_assets(
                     pystac_obj=item,
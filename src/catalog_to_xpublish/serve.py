@@ -0,0 +1,371 @@
+"""
+A preforking production server: the catalog is crawled once, then workers are forked and share it.
+
+Usage:
+    python -m catalog_to_xpublish.serve path/to/catalog.json --catalog-type stac --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import time
+import uvicorn
+from fastapi import FastAPI
+from catalog_to_xpublish.compute import (
+    DaskCompute,
+)
+from catalog_to_xpublish.log import (
+    APILogging,
+)
+from catalog_to_xpublish.plugins.encoding_plugin import (
+    ChunkEncodingPool,
+)
+from catalog_to_xpublish.server_functions import (
+    create_app,
+)
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _WorkerServer(uvicorn.Server):
+    """A uvicorn server that tells the parent process once it is serving."""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        ready_fd: Optional[int] = None,
+    ) -> None:
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(
+        self,
+        sockets: Optional[List[socket.socket]] = None,
+    ) -> None:
+        await super().startup(sockets=sockets)
+        if self.started and self.ready_fd is not None:
+            os.write(self.ready_fd, b'.')
+
+
+class PreforkServer:
+    """Serves an app from forked worker processes sharing one listening socket.
+
+    The app (i.e., the crawled catalog endpoints and mounted xpublish apps) is built
+    once in the parent. Before forking, gc.freeze() moves every object into a permanent
+    generation, so garbage collections in the workers don't write to (and copy) the
+    shared memory pages holding them.
+
+    NOTE: Requires os.fork() (i.e., Linux/macOS). Each worker has its own dataset cache
+        and metrics (/metrics reports the worker that served the request).
+
+    Arguments:
+        app: The FastAPI app returned by create_app().
+        workers: The number of worker processes (default is the CPU count).
+        host: The interface to bind to.
+        port: The port to bind to (0 picks a free port).
+        uvicorn_kwargs: Kwargs passed into uvicorn.Config() (i.e., log_level).
+        ready_timeout: Seconds to wait for all workers to start serving.
+        restart_delay: Seconds to wait before replacing a worker that crashed (exited
+            w/in min_uptime of starting), doubled per consecutive crash (up to 60s).
+        max_restarts: The number of consecutive crashes after which the server stops
+            (instead of replacing workers forever).
+        min_uptime: Seconds a worker must run for its exit not to count as a crash.
+    """
+
+    MAX_RESTART_DELAY: float = 60.0
+
+    def __init__(
+        self,
+        app: FastAPI,
+        workers: Optional[int] = None,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        uvicorn_kwargs: Optional[Dict[str, Any]] = None,
+        ready_timeout: float = 60.0,
+        restart_delay: float = 1.0,
+        max_restarts: int = 5,
+        min_uptime: float = 10.0,
+    ) -> None:
+        if not hasattr(os, 'fork'):
+            raise OSError('PreforkServer requires os.fork() (i.e., Linux or macOS).')
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError(f'workers must be a positive int, not {workers}')
+        if not isinstance(max_restarts, int) or max_restarts < 0:
+            raise ValueError(f'max_restarts must be a non-negative int, not {max_restarts}')
+
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.uvicorn_kwargs: Dict[str, Any] = uvicorn_kwargs or {}
+        self.ready_timeout = ready_timeout
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+        self.min_uptime = min_uptime
+        self.pids: List[int] = []
+        self._started: Dict[int, float] = {}
+        self.socket: socket.socket | None = None
+        self._ready_read: int | None = None
+        self._ready_write: int | None = None
+        self._stopping: bool = False
+
+    def bind(self) -> socket.socket:
+        """Binds the listening socket shared by all workers."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def _run_worker(
+        self,
+        ready_fd: Optional[int],
+    ) -> None:
+        """Runs in a forked worker: restarts background threads/pools, then serves."""
+        os.close(self._ready_read)
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            signal.signal(signum, signal.SIG_DFL)
+
+        # threads and pools don't survive fork
+        APILogging.reset_after_fork()
+        DaskCompute.reset_after_fork()
+        Tracer.reset_after_fork()
+        ChunkEncodingPool.reset_after_fork()
+
+        server = _WorkerServer(
+            uvicorn.Config(self.app, **self.uvicorn_kwargs),
+            ready_fd=ready_fd,
+        )
+        server.run(sockets=[self.socket])
+
+    def _spawn(
+        self,
+        report_ready: bool = True,
+    ) -> int:
+        """Forks a worker process (replacements don't report to the, unread, ready pipe)."""
+        pid: int = os.fork()
+        if pid == 0:
+            exit_code: int = 0
+            try:
+                self._run_worker(self._ready_write if report_ready else None)
+            except BaseException:
+                logger.exception(f'Worker {os.getpid()} failed.')
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.pids.append(pid)
+        self._started[pid] = time.monotonic()
+        return pid
+
+    def start(self) -> None:
+        """Binds the socket and forks the workers, returning once all are serving."""
+        start: float = time.perf_counter()
+        self.socket = self.bind()
+        self._ready_read, self._ready_write = os.pipe()
+
+        # freeze the (read-only) app so workers share its pages copy-on-write
+        gc.collect()
+        gc.freeze()
+        for _ in range(self.workers):
+            self._spawn()
+
+        n_ready: int = 0
+        deadline: float = time.monotonic() + self.ready_timeout
+        while n_ready < self.workers:
+            remaining: float = deadline - time.monotonic()
+            readable, _, _ = select.select([self._ready_read], [], [], max(remaining, 0))
+            if not readable:
+                self.stop()
+                raise TimeoutError(
+                    f'Only {n_ready}/{self.workers} workers started within {self.ready_timeout}s.',
+                )
+            n_ready += len(os.read(self._ready_read, self.workers))
+        logger.info(
+            f'{self.workers} workers serving @ http://{self.host}:{self.port} '
+            f'(forked and ready in {time.perf_counter() - start:.2f}s).',
+        )
+
+    def _sleep(
+        self,
+        seconds: float,
+    ) -> bool:
+        """Sleeps (returning early once stopping), and returns whether still running."""
+        end: float = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < end:
+            time.sleep(min(0.1, max(end - time.monotonic(), 0)))
+        return not self._stopping
+
+    def supervise(self) -> None:
+        """Waits on the workers, replacing any that exit until stop() is called.
+
+        Workers that crash (exit w/in min_uptime) are replaced w/ an exponential
+        backoff. After max_restarts consecutive crashes a RuntimeError is raised.
+        """
+        crashes: int = 0
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            if pid in self.pids:
+                self.pids.remove(pid)
+            uptime: float = time.monotonic() - self._started.pop(pid, 0.0)
+            if self._stopping:
+                continue
+
+            crashes = crashes + 1 if uptime < self.min_uptime else 0
+            if crashes > self.max_restarts:
+                raise RuntimeError(
+                    f'Workers crashed {crashes} times in a row (w/in {self.min_uptime}s '
+                    f'of starting), not replacing them.',
+                )
+            delay: float = 0.0
+            if crashes:
+                delay = min(self.restart_delay * 2 ** (crashes - 1), self.MAX_RESTART_DELAY)
+            logger.warning(
+                f'Worker {pid} exited (status={status}) after {uptime:.1f}s, '
+                f'starting a replacement in {delay:.1f}s.',
+            )
+            if self._sleep(delay):
+                self._spawn(report_ready=False)
+
+    def stop(
+        self,
+        timeout: float = 30.0,
+    ) -> None:
+        """Gracefully stops the workers (killing any still running after timeout)."""
+        self._stopping = True
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline: float = time.monotonic() + timeout
+        while self.pids and time.monotonic() < deadline:
+            for pid in list(self.pids):
+                try:
+                    reaped, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    reaped = pid
+                if reaped:
+                    self.pids.remove(pid)
+            time.sleep(0.05)
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.pids = []
+        self._started = {}
+
+        for fd in [self._ready_read, self._ready_write]:
+            if fd is not None:
+                os.close(fd)
+        self._ready_read = self._ready_write = None
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def run(self) -> None:
+        """Starts the workers and supervises them until SIGINT/SIGTERM."""
+
+        def handle_signal(signum: int, frame: Any) -> None:
+            logger.info(f'Received signal {signum}, stopping workers.')
+            self._stopping = True
+            for pid in self.pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+        self.start()
+        try:
+            self.supervise()
+        finally:
+            self.stop()
+
+
+def serve(
+    catalog_path: Path | str,
+    catalog_type: str,
+    workers: Optional[int] = None,
+    host: str = '127.0.0.1',
+    port: int = 8000,
+    uvicorn_kwargs: Optional[Dict[str, Any]] = None,
+    **create_app_kwargs: Any,
+) -> None:
+    """Crawls a catalog once, then serves it from forked worker processes.
+
+    Args:
+        catalog_path: The path to the catalog file (i.e., yaml or json).
+        catalog_type: The type of catalog to parse.
+        workers: The number of worker processes (default is the CPU count).
+        host: The interface to bind to.
+        port: The port to bind to.
+        uvicorn_kwargs: Kwargs passed into uvicorn.Config() (i.e., log_level).
+        create_app_kwargs: Kwargs passed into create_app() (i.e., config_cache_dict).
+    """
+    if create_app_kwargs.get('config_compute_dict') is not None:
+        raise ValueError(
+            'config_compute_dict is not supported w/ forked workers, as a dask.distributed '
+            'client does not survive fork. Use create_app() w/ one process per worker instead.',
+        )
+    app: FastAPI = create_app(
+        catalog_path=catalog_path,
+        catalog_type=catalog_type,
+        **create_app_kwargs,
+    )
+    PreforkServer(
+        app,
+        workers=workers,
+        host=host,
+        port=port,
+        uvicorn_kwargs=uvicorn_kwargs,
+    ).run()
+
+
+def main() -> None:
+    """Command line entry point (python -m catalog_to_xpublish.serve)."""
+    parser = argparse.ArgumentParser(
+        description='Crawl a catalog once, then serve it from forked worker processes.',
+    )
+    parser.add_argument('catalog_path', help='The path to the catalog file.')
+    parser.add_argument('--catalog-type', default='stac', help='The catalog type (stac or intake).')
+    parser.add_argument('--workers', type=int, default=None, help='Default is the CPU count.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--log-level', default='info', help='The uvicorn log level.')
+    args = parser.parse_args()
+    serve(
+        catalog_path=args.catalog_path,
+        catalog_type=args.catalog_type,
+        workers=args.workers,
+        host=args.host,
+        port=args.port,
+        uvicorn_kwargs={'log_level': args.log_level},
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,107 @@
 import logging
 import dataclasses
+import time
 import xpublish
 from fastapi import FastAPI
+from starlette.routing import (
+    BaseRoute,
+    Mount,
+)
 from catalog_to_xpublish.base import (
     CatalogEndpoint,
+    CatalogRouter,
 )
 from catalog_to_xpublish.log import (
     LoggingConfigDict,
     APILogging,
 )
+from catalog_to_xpublish.fetching import (
+    FetchingConfigDict,
+    ConcurrentFetching,
+)
+from catalog_to_xpublish.chunking import (
+    ChunkingConfigDict,
+    DatasetChunking,
+)
+from catalog_to_xpublish.cache import (
+    CacheConfigDict,
+    DatasetCache,
+)
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCacheConfigDict,
+    CoordinateCache,
+)
+from catalog_to_xpublish.schema_store import (
+    SchemaStoreConfigDict,
+    SchemaStore,
+)
+from catalog_to_xpublish.sharding import (
+    ShardingConfigDict,
+    Sharding,
+)
+from catalog_to_xpublish.federation import (
+    CatalogConfigDict,
+    Federation,
+)
+from catalog_to_xpublish.admission import (
+    AdmissionConfigDict,
+    AdmissionControl,
+    AdmissionMiddleware,
+)
+from catalog_to_xpublish.deadlines import (
+    DeadlineConfigDict,
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    Deadlines,
+    RequestCancelled,
+)
+from catalog_to_xpublish.metrics import (
+    MetricsConfigDict,
+    Metrics,
+    MetricsMiddleware,
+)
+from catalog_to_xpublish.profiling import (
+    ProfilingConfigDict,
+    ProfilingMiddleware,
+    RequestProfiler,
+)
+from catalog_to_xpublish.openapi import (
+    OpenAPIConfigDict,
+    OpenAPIDocs,
+)
+from catalog_to_xpublish.startup import (
+    StartupConfigDict,
+    StartupReport,
+)
+from catalog_to_xpublish.tracing import (
+    TracingConfigDict,
+    Tracer,
+    TracingMiddleware,
+)
+from catalog_to_xpublish.compute import (
+    ComputeConfigDict,
+    DaskCompute,
+)
+from catalog_to_xpublish.plugins.encoding_plugin import (
+    EncodingConfigDict,
+    ChunkEncodingPool,
+    ProcessPoolZarrPlugin,
+)
+from catalog_to_xpublish.plugins.reduce_plugin import (
+    ReducePlugin,
+)
+from catalog_to_xpublish.plugins.subset_plugin import (
+    SubsetPlugin,
+)
 from catalog_to_xpublish.provider_plugin import (
     DatasetProviderPlugin,
+    SharedDatasetProviderPlugin,
+)
+from catalog_to_xpublish.catalog_routes import (
+    TemplatedCatalogRoutes,
+)
+from catalog_to_xpublish.shared_app import (
+    SharedXpublishMiddleware,
 )
 from catalog_to_xpublish.factory import (
     CatalogImplementation,
@@ -18,8 +109,10 @@ from catalog_to_xpublish.factory import (
 )
 from pathlib import Path
 from typing import (
+    Dict,
     List,
     Optional,
+    Tuple,
 )
 
 logger = logging.getLogger(__name__)
@@ -58,12 +151,15 @@ def validate_arguments(
             f'catalog_type must be a str, not {type(catalog_type)}',
         )
     catalog_type = catalog_type.lower()
-    catalog_implementations = CatalogImplementationFactory.get_all_implementations()
-    if not catalog_type in catalog_implementations.keys():
+    catalog_types: List[str] = CatalogImplementationFactory.get_catalog_types()
+    if not catalog_type in catalog_types:
         raise KeyError(
-            f'catalog_type={catalog_type} is not in {catalog_implementations.keys()}.',
+            f'catalog_type={catalog_type} is not in {catalog_types}.',
         )
-    catalog_implementation = catalog_implementations[catalog_type]
+    # NOTE: only the requested catalog type's dependencies are imported
+    catalog_implementation = CatalogImplementationFactory.get_catalog_implementation(
+        catalog_type,
+    )
 
     # check app name argument
     if not app_name:
@@ -90,13 +186,80 @@ def validate_arguments(
     )
 
 
+def register_plugins(
+    rest_server: xpublish.Rest,
+    xpublish_plugins: List[type[xpublish.Plugin]],
+    process_pool_encoding: bool = False,
+) -> None:
+    """Registers our (and any external) non-dataset provider plugins on a Xpublish server."""
+    # swap in the process pool zarr plugin
+    if process_pool_encoding:
+        rest_server.register_plugin(
+            plugin=ProcessPoolZarrPlugin(),
+            overwrite=True,
+        )
+
+    # add the subset download and reduction endpoints
+    rest_server.register_plugin(
+        plugin=SubsetPlugin(),
+    )
+    rest_server.register_plugin(
+        plugin=ReducePlugin(),
+    )
+
+    # add all non-dataset provider plugins
+    for plugin in xpublish_plugins:
+        assert issubclass(plugin, xpublish.Plugin)
+        plugin = plugin()
+        if plugin.name not in rest_server.plugins:
+            try:
+                rest_server.register_plugin(
+                    plugin=plugin,
+                )
+                assert plugin.name in rest_server.plugins
+                logger.info(
+                    f'Added Xpublish plugin={plugin.name} to the server.',
+                )
+            except AssertionError:
+                logger.warn(
+                    f'Could not add Xpublish plugin={plugin} to the server.',
+                )
+                continue
+
+    # return a 504 (not a 500) for reads past their deadline
+    if Deadlines.ENABLED:
+        for exception in [DeadlineExceeded, RequestCancelled]:
+            rest_server.app.add_exception_handler(
+                exception,
+                Deadlines.handle_exception,
+            )
+
+
 def create_app(
-    catalog_path: Path,
-    catalog_type: str,
+    catalog_path: Optional[Path] = None,
+    catalog_type: Optional[str] = None,
     app_name: Optional[str] = None,
     xpublish_plugins: Optional[List[xpublish.Plugin]] = None,
     fastapi_kwargs: Optional[dict] = None,
     config_logging_dict: Optional[LoggingConfigDict] = None,
+    config_fetching_dict: Optional[FetchingConfigDict] = None,
+    config_chunking_dict: Optional[ChunkingConfigDict] = None,
+    config_compute_dict: Optional[ComputeConfigDict] = None,
+    config_encoding_dict: Optional[EncodingConfigDict] = None,
+    config_cache_dict: Optional[CacheConfigDict] = None,
+    config_metrics_dict: Optional[MetricsConfigDict] = None,
+    config_profiling_dict: Optional[ProfilingConfigDict] = None,
+    config_startup_dict: Optional[StartupConfigDict] = None,
+    config_tracing_dict: Optional[TracingConfigDict] = None,
+    config_admission_dict: Optional[AdmissionConfigDict] = None,
+    config_deadline_dict: Optional[DeadlineConfigDict] = None,
+    config_coordinate_cache_dict: Optional[CoordinateCacheConfigDict] = None,
+    config_schema_store_dict: Optional[SchemaStoreConfigDict] = None,
+    config_sharding_dict: Optional[ShardingConfigDict] = None,
+    config_openapi_dict: Optional[OpenAPIConfigDict] = None,
+    catalogs: Optional[Dict[str, CatalogConfigDict]] = None,
+    shared_xpublish_app: bool = False,
+    templated_catalog_routes: bool = False,
 ) -> FastAPI:
     """Main function to create the server app.
 
@@ -107,117 +270,426 @@ def create_app(
         xpublish_plugins: A list of external xpublish plugin classes to use.
         fastapi_kwargs: A dictionary of kwargs passed into fastapi.FastAPI().
         config_logging_dict: A dictionary of logging configuration parameters.
+        config_fetching_dict: A dictionary of chunk fetching configuration parameters.
+        config_chunking_dict: A dictionary defining the server-level dask chunking policy.
+        config_compute_dict: A dictionary of dask.distributed configuration parameters.
+            If provided, dataset operations run on a shared dask.distributed cluster.
+        config_encoding_dict: A dictionary of chunk encoding process pool parameters.
+            If provided, zarr chunks are encoded in a process pool.
+        config_cache_dict: A dictionary of dataset and result cache sizes.
+        config_metrics_dict: A dictionary of runtime metrics (/metrics) parameters.
+        config_profiling_dict: A dictionary of request profiling parameters.
+            If provided, sampled requests are profiled and summarized at /profiles.
+        config_startup_dict: A dictionary of startup report (/startup) parameters.
+        config_tracing_dict: A dictionary of tracing parameters.
+            If provided, spans are recorded for requests, catalog crawls, dataset opens and reads.
+        config_admission_dict: A dictionary of global/per endpoint/per dataset concurrency limits.
+            If provided, requests over a limit are queued, and shed w/ a 429/503 once queues are full.
+        config_deadline_dict: A dictionary of dataset open/request read deadlines.
+            If provided, remote reads are aborted past their deadline (504) or on client disconnect.
+        config_coordinate_cache_dict: A dictionary of shared on-disk coordinate cache parameters.
+            If provided, coordinate arrays are cached as .npy files and memory mapped by all workers.
+        config_schema_store_dict: A dictionary of persistent (sqlite) schema store parameters.
+            If provided, zarr dataset metadata is stored, and later opens skip reading it remotely.
+        config_sharding_dict: A dictionary defining the subtree/hash partition of the catalog to serve.
+            If provided, only the shard's catalog endpoints are crawled and served (see create_gateway()).
+        config_openapi_dict: A dictionary of OpenAPI schema parameters.
+            If provided, xpublish apps share their schemas, and the main schema is collapsed to templated routes.
+        catalogs: A dictionary of catalogs (paths, types and resource quotas) by URL prefix.
+            If provided (instead of catalog_path/catalog_type), all catalogs are served from one app,
+            sharing its caches, filesystems, worker pools and metrics.
+        shared_xpublish_app: If True, one Xpublish app (w/ one set of plugin instances) serves
+            the datasets of all catalog endpoints, instead of mounting an app per endpoint.
+        templated_catalog_routes: If True, the catalog routes of the endpoints served by the main
+            application are added once (i.e., /{catalog_path:path}/catalogs), instead of per endpoint.
     Returns:
         A FastAPI app object.
     """
-    # config logging
-    APILogging.config_logger(
-        config_dict=config_logging_dict,
-    )
+    if (catalogs is None) == (catalog_path is None):
+        raise ValueError(
+            'Provide either catalog_path and catalog_type, or catalogs (to serve multiple catalogs).',
+        )
+    if catalogs is not None and config_sharding_dict is not None:
+        raise ValueError(
+            'config_sharding_dict can not be combined w/ catalogs, shard each catalog separately.',
+        )
 
-    # 0. validate input arguments
-    app_inputs: AppComponents = validate_arguments(
-        catalog_path=catalog_path,
-        catalog_type=catalog_type,
-        app_name=app_name,
-        xpublish_plugins=xpublish_plugins,
+    # config (and reset) the startup report
+    StartupReport.config_startup(
+        config_dict=config_startup_dict,
     )
 
-    # 1. parse catalog using appropriate catalog search method
-    logger.info(
-        f'Spinning up server from {catalog_type} catalog at {catalog_path}.',
-    )
-    catalog_searcher = app_inputs.catalog_implementation.catalog_search(
-        catalog_path=catalog_path,
-    )
-    catalog_endpoints: List[CatalogEndpoint] = catalog_searcher.parse_catalog()
+    with StartupReport.stage('configure'):
+        # undo a previous app's dask pool (re-installed below by the features using it)
+        DaskCompute.restore_pool()
+
+        # config logging
+        APILogging.config_logger(
+            config_dict=config_logging_dict,
+        )
+
+        # config concurrent chunk fetching
+        ConcurrentFetching.config_fetching(
+            config_dict=config_fetching_dict,
+        )
+
+        # config the dataset chunking policy
+        DatasetChunking.config_chunking(
+            config_dict=config_chunking_dict,
+        )
+
+        # config the dataset and result caches
+        DatasetCache.config_cache(
+            config_dict=config_cache_dict,
+        )
 
-    # 2. Start a Xpublish server
+        # config the federated catalogs (and their cache quotas)
+        Federation.config_federation(
+            catalogs=catalogs,
+        )
+
+        # config the shared (memory mapped) coordinate cache
+        CoordinateCache.config_coordinate_cache(
+            config_dict=config_coordinate_cache_dict,
+        )
+
+        # config the persistent dataset schema store
+        SchemaStore.config_schema_store(
+            config_dict=config_schema_store_dict,
+        )
+
+        # config runtime metrics
+        Metrics.config_metrics(
+            config_dict=config_metrics_dict,
+        )
+
+        # config request profiling
+        RequestProfiler.config_profiling(
+            config_dict=config_profiling_dict,
+        )
+
+        # config tracing
+        Tracer.config_tracing(
+            config_dict=config_tracing_dict,
+        )
+
+        # config admission control (per catalog concurrency quotas need it)
+        if config_admission_dict is None and Federation.has_concurrency_quotas():
+            config_admission_dict = {}
+        AdmissionControl.config_admission(
+            config_dict=config_admission_dict,
+        )
+
+        # config deadlines and cancellation
+        Deadlines.config_deadlines(
+            config_dict=config_deadline_dict,
+        )
+
+        # config the part of the catalog this server serves
+        Sharding.config_sharding(
+            config_dict=config_sharding_dict,
+        )
+
+        # config lazily generated (shared/collapsed) OpenAPI schemas
+        OpenAPIDocs.config_openapi(
+            config_dict=config_openapi_dict,
+        )
+
+    # 0. validate input arguments (of each catalog by its prefix, '' if not federated)
+    if catalogs is None:
+        catalogs = {
+            '': {'catalog_path': catalog_path, 'catalog_type': catalog_type},
+        }
+    with StartupReport.stage('validate arguments'):
+        catalog_inputs: Dict[str, AppComponents] = {
+            prefix: validate_arguments(
+                catalog_path=config_dict['catalog_path'],
+                catalog_type=config_dict['catalog_type'],
+                app_name=app_name,
+                xpublish_plugins=xpublish_plugins,
+            )
+            for prefix, config_dict in catalogs.items()
+        }
+
+    # 1. parse catalogs using appropriate catalog search method
+    endpoint_inputs: List[Tuple[AppComponents, CatalogEndpoint]] = []
+    crawl_durations: Dict[str, float] = {}
+    endpoint_counts: Dict[str, int] = {}
+    for prefix, app_inputs in catalog_inputs.items():
+        catalog_type = app_inputs.catalog_implementation.catalog_search.catalog_type
+        logger.info(
+            f'Spinning up server from {catalog_type} catalog at {app_inputs.catalog_path}'
+            f'{f" @ {prefix}" if prefix else ""}.',
+        )
+        catalog_searcher = app_inputs.catalog_implementation.catalog_search(
+            catalog_path=app_inputs.catalog_path,
+        )
+        start: float = time.perf_counter()
+        with (
+            StartupReport.stage('parse catalog'),
+            Tracer.span('parse_catalog', **{'catalog.path': prefix or '/'}),
+        ):
+            catalog_endpoints: List[CatalogEndpoint] = catalog_searcher.parse_catalog()
+        crawl_durations[catalog_type] = (
+            crawl_durations.get(catalog_type, 0.0) + time.perf_counter() - start
+        )
+        # only keep the endpoints this shard serves (all of them if not sharded)
+        catalog_endpoints = Sharding.filter_endpoints(catalog_endpoints)
+        # serve a federated catalog's endpoints under its prefix
+        if prefix:
+            catalog_endpoints = Federation.prefix_endpoints(prefix, catalog_endpoints)
+        endpoint_counts[catalog_type] = endpoint_counts.get(catalog_type, 0) + len(catalog_endpoints)
+        endpoint_inputs += [(app_inputs, cat_end) for cat_end in catalog_endpoints]
+
+    for catalog_type, seconds in crawl_durations.items():
+        Metrics.CRAWL_DURATION.set(seconds, catalog_type=catalog_type)
+        Metrics.CATALOG_ENDPOINTS.set(endpoint_counts[catalog_type], catalog_type=catalog_type)
+    catalog_endpoints = [cat_end for _, cat_end in endpoint_inputs]
+
+    # 2. Start a Xpublish server (titled by app_name, not by any one of its catalogs)
+    title: str = app_name or (
+        'Catalog_Xpublish_Federation' if Federation.ENABLED else 'Catalog_Xpublish_Server'
+    )
     if not isinstance(fastapi_kwargs, dict):
         fastapi_kwargs = {}
     if 'title' in fastapi_kwargs:
         logger.warn(
-            f'Overwriting title={fastapi_kwargs["title"]} with title={app_inputs.name}! '
+            f'Overwriting title={fastapi_kwargs["title"]} with title={title}! '
             'Use param:app_name to set the title of the app, not param:faskapi_kwargs.',
         )
         del fastapi_kwargs['title']
-    app = FastAPI(title=app_inputs.name, **fastapi_kwargs)
+    app = FastAPI(title=title, **fastapi_kwargs)
 
-    # 2. Iterate through the endpoints and add them to the server
-    for cat_end in catalog_endpoints:
-        cat_prefix = cat_end.catalog_path
-        if cat_prefix == '/':
-            cat_prefix = ''
+    # 2. Optionally list the federated catalogs
+    if Federation.ENABLED:
+        app.add_api_route(
+            path='/catalogs',
+            endpoint=Federation.list_catalogs,
+            methods=['GET'],
+            tags=['catalogs'],
+        )
 
-        # 2.1 if the endpoint has data, mount a Xpublish server
-        if cat_end.contains_datasets:
+    # 2. Optionally serve all endpoints' datasets from one shared Xpublish server
+    # (the innermost middleware, so dataset requests skip matching the catalog routes)
+    if shared_xpublish_app:
+        with StartupReport.stage('build xpublish apps'):
             rest_server = xpublish.Rest()
             rest_server.init_app_kwargs(
                 app_kws={
-                    'title': app_inputs.catalog_name + cat_prefix,
+                    'title': title,
                 },
             )
-
-            # add dataset provider plugin
-            provider_plugin = DatasetProviderPlugin(
-                catalog_endpoint=cat_end,
-                io_class=app_inputs.catalog_implementation.catalog_to_xarray,
-            )
             rest_server.register_plugin(
-                plugin=provider_plugin,
-                plugin_name=cat_prefix,
+                plugin=SharedDatasetProviderPlugin(
+                    catalog_endpoints=[
+                        (cat_end, app_inputs.catalog_implementation.catalog_to_xarray)
+                        for app_inputs, cat_end in endpoint_inputs
+                        if cat_end.contains_datasets
+                    ],
+                ),
             )
-
-            # if cat_prefix == '', xpublish changes the name to the name of the plugin
-            if (bool(cat_prefix) and cat_prefix not in rest_server.plugins) | (not cat_prefix and provider_plugin.name not in rest_server.plugins):
-                logger.warn(
-                    f'Could not add dataset provider plugin for {cat_prefix} to the server!',
-                )
-                continue
-
-            # add all non-dataset provider plugins
-            for plugin in app_inputs.xpublish_plugins:
-                assert issubclass(plugin, xpublish.Plugin)
-                plugin = plugin()
-                if plugin.name not in rest_server.plugins:
-                    try:
-                        rest_server.register_plugin(
-                            plugin=plugin,
-                        )
-                        assert plugin.name in rest_server.plugins
-                        logger.info(
-                            f'Added Xpublish plugin={plugin.name} to the server.',
-                        )
-                    except AssertionError:
-                        logger.warn(
-                            f'Could not add Xpublish plugin={plugin} to the server.',
-                        )
-                        continue
-
-            # add the base router (for some reason this needs to come after)
-            router = app_inputs.catalog_implementation.catalog_router(
-                catalog_endpoint_obj=cat_end,
-                prefix='',
+            register_plugins(
+                rest_server=rest_server,
+                xpublish_plugins=xpublish_plugins or [],
+                process_pool_encoding=config_encoding_dict is not None,
             )
-            rest_server.app.include_router(router=router.router)
-
-            # mount to the main application
             logger.info(
-                f'Mounting a Xpublish server @ {cat_prefix} to the main application.',
+                f'Serving all catalog endpoints from one shared Xpublish server.',
             )
-            app.mount(
-                path=cat_prefix,
-                app=rest_server.app,
+            app.add_middleware(
+                SharedXpublishMiddleware,
+                rest_app=rest_server.app,
+                catalog_endpoints=[
+                    cat_end for cat_end in catalog_endpoints if cat_end.contains_datasets
+                ],
             )
 
-        # 2.2 if the endpoint has no data, add a router to the main application
-        else:
-            # make a router for each endpoint
-            router = app_inputs.catalog_implementation.catalog_router(
-                catalog_endpoint_obj=cat_end,
+    # 2. Optionally expose the startup report
+    if StartupReport.ENABLED:
+        app.add_api_route(
+            path='/startup',
+            endpoint=StartupReport.get_startup_report,
+            methods=['GET'],
+            tags=['startup'],
+        )
+
+    # 2. Optionally expose the shard's catalog paths (read by gateways)
+    if Sharding.ENABLED:
+        app.add_api_route(
+            path='/shard',
+            endpoint=Sharding.get_shard_info,
+            methods=['GET'],
+            tags=['shard'],
+        )
+
+    # 2. Optionally abort remote reads past their deadline or on client disconnect
+    if Deadlines.ENABLED:
+        app.add_middleware(DeadlineMiddleware)
+        for exception in [DeadlineExceeded, RequestCancelled]:
+            app.add_exception_handler(exception, Deadlines.handle_exception)
+
+    # 2. Optionally limit concurrent requests (innermost, so queued time is measured)
+    if AdmissionControl.ENABLED:
+        app.add_middleware(AdmissionMiddleware)
+
+    # 2. Optionally expose runtime metrics
+    if Metrics.ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        app.add_api_route(
+            path='/metrics',
+            endpoint=Metrics.get_metrics,
+            methods=['GET'],
+            tags=['metrics'],
+        )
+        # optionally run dask tasks in their request's context, so their remote reads are counted
+        if Metrics.ACCOUNT_DASK_IO and config_compute_dict is None:
+            DaskCompute.use_context_pool()
+
+    # 2. Optionally trace requests
+    if Tracer.ENABLED:
+        app.add_middleware(TracingMiddleware)
+
+    # 2. Optionally profile sampled requests
+    if RequestProfiler.ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+        app.add_api_route(
+            path='/profiles',
+            endpoint=RequestProfiler.get_profiles_summary,
+            methods=['GET'],
+            tags=['profiles'],
+        )
+
+    # 2. Optionally attach a shared dask.distributed cluster
+    if config_compute_dict is not None:
+        DaskCompute.config_compute(
+            config_dict=config_compute_dict,
+        )
+        app.router.add_event_handler('shutdown', DaskCompute.close)
+        app.add_api_route(
+            path='/compute',
+            endpoint=DaskCompute.get_compute_info,
+            methods=['GET'],
+            tags=['compute'],
+        )
+
+    # 2. Optionally encode zarr chunks in a process pool
+    if config_encoding_dict is not None:
+        ChunkEncodingPool.config_encoding(
+            config_dict=config_encoding_dict,
+        )
+        app.router.add_event_handler('shutdown', ChunkEncodingPool.close)
+
+    # 2. Iterate through the endpoints and add them to the server
+    main_routes: List[BaseRoute] = list(app.routes)
+    catalog_routers: List[CatalogRouter] = []
+    templated_endpoints: List[Tuple[CatalogEndpoint, type]] = []
+    for app_inputs, cat_end in endpoint_inputs:
+        cat_prefix = cat_end.catalog_path
+        if cat_prefix == '/':
+            cat_prefix = ''
+
+        # 2.1 if the endpoint has data, mount a Xpublish server
+        if cat_end.contains_datasets and not shared_xpublish_app:
+            with StartupReport.stage('build xpublish apps'):
+                rest_server = xpublish.Rest()
+                rest_server.init_app_kwargs(
+                    app_kws={
+                        'title': app_inputs.catalog_name + cat_prefix,
+                    },
+                )
+
+                # add dataset provider plugin
+                provider_plugin = DatasetProviderPlugin(
+                    catalog_endpoint=cat_end,
+                    io_class=app_inputs.catalog_implementation.catalog_to_xarray,
+                )
+                rest_server.register_plugin(
+                    plugin=provider_plugin,
+                    plugin_name=cat_prefix,
+                )
+
+                # if cat_prefix == '', xpublish changes the name to the name of the plugin
+                if (bool(cat_prefix) and cat_prefix not in rest_server.plugins) | (not cat_prefix and provider_plugin.name not in rest_server.plugins):
+                    logger.warn(
+                        f'Could not add dataset provider plugin for {cat_prefix} to the server!',
+                    )
+                    continue
+
+                register_plugins(
+                    rest_server=rest_server,
+                    xpublish_plugins=app_inputs.xpublish_plugins,
+                    process_pool_encoding=config_encoding_dict is not None,
+                )
+
+                # add the base router (for some reason this needs to come after)
+                router = app_inputs.catalog_implementation.catalog_router(
+                    catalog_endpoint_obj=cat_end,
+                    prefix='',
+                )
+                rest_server.app.include_router(router=router.router)
+
+                # mount to the main application
+                logger.info(
+                    f'Mounting a Xpublish server @ {cat_prefix} to the main application.',
+                )
+                app.mount(
+                    path=cat_prefix,
+                    app=rest_server.app,
+                )
+
+        # 2.2 if the endpoint has no data (or is served by the shared Xpublish server),
+        # add a router to the main application (or to the templated catalog routes)
+        elif templated_catalog_routes:
+            templated_endpoints.append(
+                (cat_end, app_inputs.catalog_implementation.catalog_router),
             )
-            # add prefix?
-            app.include_router(router=router.router, prefix=cat_prefix)
+        else:
+            with StartupReport.stage('build catalog routers'):
+                # make a router for each endpoint
+                router = app_inputs.catalog_implementation.catalog_router(
+                    catalog_endpoint_obj=cat_end,
+                )
+                # add prefix?
+                app.include_router(router=router.router, prefix=cat_prefix)
+                catalog_routers.append(router)
+
+    # 2.3 add one set of templated catalog routes (after the mounted Xpublish servers)
+    if templated_endpoints:
+        with StartupReport.stage('build catalog routers'):
+            catalog_routes = TemplatedCatalogRoutes(catalog_endpoints=templated_endpoints)
+            app.include_router(router=catalog_routes.router)
+            main_routes += catalog_routes.router.routes
+        logger.info(
+            f'Serving the catalog routes of {len(templated_endpoints)} endpoints from templated routes.',
+        )
+
+    # 3. OpenAPI schemas are generated on first request (optionally shared and collapsed)
+    mounted_apps: List[FastAPI] = [
+        route.app for route in app.routes if isinstance(route, Mount)
+    ]
+    if shared_xpublish_app:
+        mounted_apps.append(rest_server.app)
+    if OpenAPIDocs.ENABLED:
+        OpenAPIDocs.install(
+            app=app,
+            routes=main_routes,
+            catalog_routers=catalog_routers,
+            xpublish_apps=mounted_apps,
+        )
+
+    # 3. Optionally build (and cache) the OpenAPI schemas now to time them
+    if StartupReport.TIME_OPENAPI:
+        with StartupReport.stage('generate openapi'):
+            for sub_app in [app] + mounted_apps:
+                sub_app.openapi()
+
+    StartupReport.set_endpoint_counts(
+        catalog_endpoints=len(catalog_endpoints),
+        xpublish_apps=len(mounted_apps),
+        datasets=sum(len(cat_end.dataset_ids) for cat_end in catalog_endpoints),
+        routes=len(app.routes) + sum(len(sub_app.routes) for sub_app in mounted_apps),
+    )
+    StartupReport.log_report()
     logger.info(
         f'Returning successfully created server application!',
     )
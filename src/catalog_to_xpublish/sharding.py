@@ -0,0 +1,558 @@
+"""
+Horizontal sharding of a catalog across server processes, and a gateway routing requests to them.
+
+Usage (a local gateway + N shard processes):
+    python -m catalog_to_xpublish.sharding path/to/catalog.json --catalog-type stac --shards 4
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import socket
+import time
+import uvicorn
+from fastapi import (
+    FastAPI,
+    Request,
+)
+from fastapi.responses import (
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+)
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    List,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ShardingConfigDict(TypedDict):
+    """A dictionary to hold the optional sharding args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        subtree: Only serve catalog endpoints at or under this catalog path
+            (i.e., '/collection-a'). Default is '/' (the whole catalog).
+        shard_count: The number of hash partitions of the (sub)tree. Default is 1.
+        shard_index: The hash partition this server serves (0 to shard_count - 1).
+        partition_depth: The number of catalog levels (below subtree) whose paths are
+            hashed. Deeper endpoints go to the same shard as their ancestor at this
+            depth, so the crawl skips other shards' partitions. Default is 1.
+    """
+    subtree: Optional[str]
+    shard_count: Optional[int]
+    shard_index: Optional[int]
+    partition_depth: Optional[int]
+
+
+def split_path(path: str) -> List[str]:
+    """Returns the segments of a catalog path (i.e., '/a/b' -> ['a', 'b'])."""
+    return [segment for segment in path.split('/') if segment]
+
+
+class Sharding:
+    """A class to hold the sharding configuration.
+
+    A shard serves the catalog endpoints at or under SUBTREE whose partition hashes
+    to SHARD_INDEX. Catalog searchers check should_crawl() before descending into a
+    sub-catalog, so a shard never crawls (or holds) other shards' partitions.
+    """
+
+    ENABLED: bool = False
+    SUBTREE: str = '/'
+    SHARD_COUNT: int = 1
+    SHARD_INDEX: int = 0
+    PARTITION_DEPTH: int = 1
+    CATALOG_PATHS: List[str] = []
+
+    @staticmethod
+    def __validate_int(
+        name: str,
+        value: int,
+        minimum: int,
+    ) -> int:
+        if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+            raise ValueError(
+                f'{name} must be an int >= {minimum}, not {value}',
+            )
+        return value
+
+    @classmethod
+    def config_sharding(
+        cls,
+        config_dict: Optional[ShardingConfigDict] = None,
+    ) -> None:
+        """Configure which part of the catalog this server serves.
+
+        Arguments:
+            config_dict: A dictionary of optional sharding args.
+                If None, the whole catalog is served.
+
+        Returns:
+            None. Sets the global sharding configuration.
+        """
+        cls.CATALOG_PATHS = []
+        if config_dict is None:
+            cls.ENABLED = False
+            return None
+
+        subtree: str = config_dict.get('subtree') or '/'
+        if not isinstance(subtree, str) or not subtree.startswith('/'):
+            raise ValueError(f'subtree must be a catalog path starting w/ /, not {subtree}')
+        shard_count: int = cls.__validate_int(
+            'shard_count',
+            config_dict.get('shard_count', 1),
+            minimum=1,
+        )
+        shard_index: int = cls.__validate_int(
+            'shard_index',
+            config_dict.get('shard_index', 0),
+            minimum=0,
+        )
+        if shard_index >= shard_count:
+            raise ValueError(
+                f'shard_index must be less than shard_count={shard_count}, not {shard_index}',
+            )
+
+        cls.SUBTREE = '/' + '/'.join(split_path(subtree))
+        cls.SHARD_COUNT = shard_count
+        cls.SHARD_INDEX = shard_index
+        cls.PARTITION_DEPTH = cls.__validate_int(
+            'partition_depth',
+            config_dict.get('partition_depth', 1),
+            minimum=0,
+        )
+        cls.ENABLED = True
+        logger.info(
+            f'Serving shard {cls.SHARD_INDEX}/{cls.SHARD_COUNT} of subtree {cls.SUBTREE} '
+            f'(partition_depth={cls.PARTITION_DEPTH}).',
+        )
+
+    @classmethod
+    def in_subtree(
+        cls,
+        catalog_path: str,
+    ) -> bool:
+        """Returns whether a catalog path is at or under the subtree."""
+        return (
+            cls.SUBTREE == '/'
+            or catalog_path == cls.SUBTREE
+            or catalog_path.startswith(cls.SUBTREE + '/')
+        )
+
+    @classmethod
+    def partition_key(
+        cls,
+        catalog_path: str,
+    ) -> str:
+        """Returns the path a catalog path is hashed by (its ancestor at partition_depth)."""
+        depth: int = len(split_path(cls.SUBTREE)) + cls.PARTITION_DEPTH
+        return '/' + '/'.join(split_path(catalog_path)[:depth])
+
+    @classmethod
+    def shard_of(
+        cls,
+        catalog_path: str,
+    ) -> int:
+        """Returns the hash partition of a catalog path (stable across processes)."""
+        digest: str = hashlib.sha256(cls.partition_key(catalog_path).encode()).hexdigest()
+        return int(digest[:8], 16) % cls.SHARD_COUNT
+
+    @classmethod
+    def serves(
+        cls,
+        catalog_path: str,
+    ) -> bool:
+        """Returns whether this server serves a catalog endpoint."""
+        if not cls.ENABLED:
+            return True
+        return cls.in_subtree(catalog_path) and cls.shard_of(catalog_path) == cls.SHARD_INDEX
+
+    @classmethod
+    def should_crawl(
+        cls,
+        catalog_path: str,
+    ) -> bool:
+        """Returns whether a sub-catalog may contain endpoints this server serves.
+
+        Ancestors of the subtree are crawled (to reach it), other shards' partitions aren't.
+        """
+        if not cls.ENABLED:
+            return True
+        if not cls.in_subtree(catalog_path):
+            return (cls.SUBTREE + '/').startswith(catalog_path + '/')
+        depth: int = len(split_path(cls.SUBTREE)) + cls.PARTITION_DEPTH
+        if len(split_path(catalog_path)) >= depth:
+            return cls.shard_of(catalog_path) == cls.SHARD_INDEX
+        return True
+
+    @classmethod
+    def filter_endpoints(
+        cls,
+        catalog_endpoints: List[CatalogEndpoint],
+    ) -> List[CatalogEndpoint]:
+        """Returns the catalog endpoints this server serves."""
+        if cls.ENABLED:
+            catalog_endpoints = [
+                cat_end for cat_end in catalog_endpoints
+                if cls.serves(cat_end.catalog_path)
+            ]
+        cls.CATALOG_PATHS = sorted(cat_end.catalog_path for cat_end in catalog_endpoints)
+        return catalog_endpoints
+
+    @classmethod
+    def get_shard_info(cls) -> Dict[str, Any]:
+        """Returns the shard configuration and the catalog paths it serves.
+
+        Will be added to the main application as @app.get('/shard') (read by gateways).
+        """
+        return {
+            'subtree': cls.SUBTREE,
+            'shard_count': cls.SHARD_COUNT,
+            'shard_index': cls.SHARD_INDEX,
+            'partition_depth': cls.PARTITION_DEPTH,
+            'catalog_paths': cls.CATALOG_PATHS,
+        }
+
+
+# headers that only apply to a single connection, so aren't proxied
+HOP_BY_HOP_HEADERS: set[str] = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host',
+}
+
+
+class ShardGateway:
+    """Routes requests to the shard serving their catalog endpoint.
+
+    The gateway only holds the catalog path -> shard URL map (read from each
+    shard's /shard endpoint), and either proxies requests or redirects (307) them.
+
+    Arguments:
+        shard_urls: The base URLs of the shard servers.
+        mode: 'proxy' (default) or 'redirect'.
+        timeout: Seconds a proxied request may take.
+        startup_timeout: Seconds to wait for shards to come up when loading the map.
+    """
+
+    def __init__(
+        self,
+        shard_urls: List[str],
+        mode: str = 'proxy',
+        timeout: float = 60.0,
+        startup_timeout: float = 60.0,
+    ) -> None:
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                'httpx is required to run a shard gateway. '
+                'Please install it (i.e., pip install httpx).',
+            )
+        if mode not in ['proxy', 'redirect']:
+            raise ValueError(f'mode must be proxy or redirect, not {mode}')
+        if not shard_urls:
+            raise ValueError('Please provide at least one shard URL.')
+
+        self.httpx = httpx
+        self.shard_urls: List[str] = [url.rstrip('/') for url in shard_urls]
+        self.mode = mode
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.routes: Dict[str, str] = {}
+        self.client: Any = None
+
+    async def _get_shard_info(
+        self,
+        client: Any,
+        shard_url: str,
+    ) -> Dict[str, Any]:
+        """Reads a shard's /shard endpoint, retrying until it is up."""
+        deadline: float = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                response = await client.get(f'{shard_url}/shard')
+                response.raise_for_status()
+                return response.json()
+            except self.httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.25)
+
+    async def load_routes(self) -> None:
+        """Builds the catalog path -> shard URL map."""
+        async with self.httpx.AsyncClient(timeout=self.timeout) as client:
+            infos: List[Dict[str, Any]] = await asyncio.gather(
+                *[self._get_shard_info(client, url) for url in self.shard_urls],
+            )
+        routes: Dict[str, str] = {}
+        for shard_url, info in zip(self.shard_urls, infos):
+            for catalog_path in info['catalog_paths']:
+                if catalog_path in routes:
+                    logger.warning(
+                        f'{catalog_path} is served by {routes[catalog_path]} and {shard_url}, '
+                        f'routing to {routes[catalog_path]}.',
+                    )
+                    continue
+                routes[catalog_path] = shard_url
+        self.routes = routes
+        logger.info(
+            f'Routing {len(routes)} catalog endpoints to {len(self.shard_urls)} shards.',
+        )
+
+    def resolve(
+        self,
+        path: str,
+    ) -> str | None:
+        """Returns the URL of the shard serving a request path (its longest catalog path)."""
+        segments: List[str] = split_path(path)
+        for i in range(len(segments), -1, -1):
+            shard_url: str | None = self.routes.get('/' + '/'.join(segments[:i]))
+            if shard_url is not None:
+                return shard_url
+        return None
+
+    async def startup(self) -> None:
+        await self.load_routes()
+        if self.mode == 'proxy':
+            self.client = self.httpx.AsyncClient(timeout=self.timeout)
+
+    async def shutdown(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+
+    def get_routes(self) -> Dict[str, Any]:
+        """Returns the shards and the catalog path -> shard URL map.
+
+        Will be added to the gateway application as @app.get('/shards').
+        """
+        return {'shards': self.shard_urls, 'catalog_paths': self.routes}
+
+    async def route(
+        self,
+        request: Request,
+    ) -> Response:
+        """Proxies (or redirects) a request to its shard."""
+        shard_url: str | None = self.resolve(request.url.path)
+        if shard_url is None:
+            return JSONResponse(
+                {'detail': f'No shard serves {request.url.path}.'},
+                status_code=404,
+            )
+        url: str = shard_url + request.url.path
+        if request.url.query:
+            url += '?' + request.url.query
+        if self.mode == 'redirect':
+            return RedirectResponse(url, status_code=307)
+
+        upstream = await self.client.send(
+            self.client.build_request(
+                request.method,
+                url,
+                headers=[
+                    (key, value) for key, value in request.headers.items()
+                    if key.lower() not in HOP_BY_HOP_HEADERS
+                ],
+                content=await request.body(),
+            ),
+            stream=True,
+        )
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers={
+                key: value for key, value in upstream.headers.items()
+                if key.lower() not in HOP_BY_HOP_HEADERS
+            },
+            background=BackgroundTask(upstream.aclose),
+        )
+
+
+def create_gateway(
+    shard_urls: List[str],
+    mode: str = 'proxy',
+    timeout: float = 60.0,
+    startup_timeout: float = 60.0,
+    fastapi_kwargs: Optional[dict] = None,
+) -> FastAPI:
+    """Creates a gateway app routing requests to the shards serving them.
+
+    Args:
+        shard_urls: The base URLs of the shard servers (see create_app(config_sharding_dict)).
+        mode: 'proxy' (default) forwards requests, 'redirect' returns 307 redirects.
+        timeout: Seconds a proxied request may take.
+        startup_timeout: Seconds to wait for shards to come up.
+        fastapi_kwargs: A dictionary of kwargs passed into fastapi.FastAPI().
+    Returns:
+        A FastAPI app object.
+    """
+    gateway = ShardGateway(
+        shard_urls=shard_urls,
+        mode=mode,
+        timeout=timeout,
+        startup_timeout=startup_timeout,
+    )
+    app = FastAPI(**(fastapi_kwargs or {'title': 'Catalog_Xpublish_Gateway'}))
+    app.router.add_event_handler('startup', gateway.startup)
+    app.router.add_event_handler('shutdown', gateway.shutdown)
+    app.add_api_route(
+        path='/shards',
+        endpoint=gateway.get_routes,
+        methods=['GET'],
+        tags=['shards'],
+    )
+    app.add_api_route(
+        path='/{path:path}',
+        endpoint=gateway.route,
+        methods=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
+        include_in_schema=False,
+    )
+    return app
+
+
+def _free_port(host: str) -> int:
+    """Returns a free port to bind a shard to."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _run_shard(
+    catalog_path: Path | str,
+    catalog_type: str,
+    config_sharding_dict: ShardingConfigDict,
+    host: str,
+    port: int,
+    create_app_kwargs: Dict[str, Any],
+) -> None:
+    """Runs a shard server (in a child process)."""
+    from catalog_to_xpublish.server_functions import (
+        create_app,
+    )
+    app: FastAPI = create_app(
+        catalog_path=catalog_path,
+        catalog_type=catalog_type,
+        config_sharding_dict=config_sharding_dict,
+        **create_app_kwargs,
+    )
+    uvicorn.run(app, host=host, port=port, log_level='warning')
+
+
+def run_local_shards(
+    catalog_path: Path | str,
+    catalog_type: str,
+    shards: int = 2,
+    host: str = '127.0.0.1',
+    port: int = 8000,
+    mode: str = 'proxy',
+    partition_depth: int = 1,
+    subtree: str = '/',
+    **create_app_kwargs: Any,
+) -> None:
+    """Serves a catalog from local shard processes behind a gateway (i.e., for testing).
+
+    Args:
+        catalog_path: The path to the catalog file (i.e., yaml or json).
+        catalog_type: The type of catalog to parse.
+        shards: The number of shard processes (hash partitions).
+        host: The interface to bind the gateway and shards to.
+        port: The gateway's port (shards use free ports).
+        mode: The gateway mode (proxy or redirect).
+        partition_depth: The number of catalog levels whose paths are hashed.
+        subtree: The catalog path the shards partition.
+        create_app_kwargs: Kwargs passed into each shard's create_app().
+    """
+    context = multiprocessing.get_context('spawn')
+    processes: List[multiprocessing.Process] = []
+    shard_urls: List[str] = []
+    for shard_index in range(shards):
+        shard_port: int = _free_port(host)
+        shard_urls.append(f'http://{host}:{shard_port}')
+        process = context.Process(
+            target=_run_shard,
+            args=(
+                catalog_path,
+                catalog_type,
+                {
+                    'subtree': subtree,
+                    'shard_count': shards,
+                    'shard_index': shard_index,
+                    'partition_depth': partition_depth,
+                },
+                host,
+                shard_port,
+                create_app_kwargs,
+            ),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        uvicorn.run(
+            create_gateway(shard_urls, mode=mode),
+            host=host,
+            port=port,
+            log_level='info',
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=30)
+
+
+def main() -> None:
+    """Command line entry point (python -m catalog_to_xpublish.sharding)."""
+    parser = argparse.ArgumentParser(
+        description='Serve a catalog from local shard processes behind a gateway.',
+    )
+    parser.add_argument('catalog_path', nargs='?', help='The path to the catalog file.')
+    parser.add_argument('--catalog-type', default='stac', help='The catalog type (stac or intake).')
+    parser.add_argument('--shards', type=int, default=2, help='The number of shard processes.')
+    parser.add_argument('--partition-depth', type=int, default=1)
+    parser.add_argument('--subtree', default='/')
+    parser.add_argument('--mode', default='proxy', choices=['proxy', 'redirect'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help='The gateway port.')
+    parser.add_argument(
+        '--shard-urls',
+        nargs='+',
+        help='Only run a gateway in front of already running shards.',
+    )
+    args = parser.parse_args()
+    if args.shard_urls:
+        uvicorn.run(
+            create_gateway(args.shard_urls, mode=args.mode),
+            host=args.host,
+            port=args.port,
+        )
+    elif args.catalog_path:
+        run_local_shards(
+            catalog_path=args.catalog_path,
+            catalog_type=args.catalog_type,
+            shards=args.shards,
+            host=args.host,
+            port=args.port,
+            mode=args.mode,
+            partition_depth=args.partition_depth,
+            subtree=args.subtree,
+        )
+    else:
+        parser.error('Please provide a catalog_path or --shard-urls.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Serving every catalog endpoint's datasets from one shared xpublish app.
+"""
+import logging
+import re
+from starlette.types import (
+    ASGIApp,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+)
+from catalog_to_xpublish.provider_plugin import (
+    dataset_key,
+)
+from catalog_to_xpublish.streaming import (
+    FastJSONResponse,
+)
+from typing import (
+    Dict,
+    List,
+)
+
+logger = logging.getLogger(__name__)
+
+# matches {catalog endpoint}/datasets(/{dataset_id}(/...)) request paths
+DATASETS_PATH: re.Pattern = re.compile(r'^(.*?)/datasets(?:/([^/]+)(/.*)?)?/?$')
+
+
+class SharedXpublishMiddleware:
+    """A pure ASGI middleware routing dataset requests of all catalog endpoints to one xpublish app.
+
+    Added as the innermost middleware, so dataset requests are dispatched by a dict
+    lookup (instead of being matched against every catalog route). A
+    {catalog_path}/datasets/{dataset_id}/... request is passed to the shared xpublish
+    app as /datasets/{dataset_key}/..., w/ the catalog path as its root_path (like a
+    mounted app), so outer middlewares (metrics, tracing) see the same endpoint,
+    dataset id and route template as w/ an xpublish app per endpoint.
+
+    Arguments:
+        app: The main application's router (serving all other requests).
+        rest_app: The shared xpublish app (w/ a SharedDatasetProviderPlugin).
+        catalog_endpoints: The catalog endpoints w/ datasets.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rest_app: ASGIApp,
+        catalog_endpoints: List[CatalogEndpoint],
+    ) -> None:
+        self.app = app
+        self.rest_app = rest_app
+        self.catalog_endpoints: Dict[str, CatalogEndpoint] = {
+            catalog_endpoint.catalog_path: catalog_endpoint
+            for catalog_endpoint in catalog_endpoints
+        }
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        path: str = scope.get('path', '')
+        root_path: str = scope.get('root_path', '')
+        match = None
+        if scope['type'] == 'http' and path.startswith(root_path):
+            match = DATASETS_PATH.match(path[len(root_path):])
+        catalog_endpoint: CatalogEndpoint | None = self.catalog_endpoints.get(
+            (match.group(1) or '/') if match else '',
+        )
+        if catalog_endpoint is None:
+            await self.app(scope, receive, send)
+            return None
+
+        # {catalog_path}/datasets lists the endpoint's datasets
+        prefix, dataset_id, rest = match.groups()
+        if dataset_id is None:
+            response = FastJSONResponse(catalog_endpoint.dataset_ids)
+            await response(scope, receive, send)
+            return None
+
+        scope['root_path'] = root_path + prefix
+        scope['path'] = (
+            f'{root_path}{prefix}/datasets/'
+            f'{dataset_key(catalog_endpoint.catalog_path, dataset_id)}{rest or ""}'
+        )
+        try:
+            await self.rest_app(scope, receive, send)
+        finally:
+            # restore the request's path/dataset id (read by outer middlewares)
+            scope['path'] = path
+            if 'dataset_id' in scope.get('path_params', {}):
+                scope['path_params']['dataset_id'] = dataset_id
@@ -0,0 +1,217 @@
+"""
+A structured report of where create_app() startup time goes.
+"""
+import heapq
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from starlette.responses import JSONResponse
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StartupConfigDict(TypedDict):
+    """A dictionary to hold the optional startup report args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        enabled: Whether to serve the report at /startup (default is True).
+        slowest_n: The number of slowest sub-catalog/item fetches to keep (default is 10).
+        time_openapi: If True, OpenAPI schemas are generated (and cached) at startup
+            so their build time is reported (default is False).
+    """
+    enabled: Optional[bool]
+    slowest_n: Optional[int]
+    time_openapi: Optional[bool]
+
+
+def get_peak_rss_mb() -> float | None:
+    """Returns the peak resident set size of this process in MiB (if available)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    if sys.platform == 'darwin':
+        return max_rss / 2**20
+    return max_rss / 2**10
+
+
+class StartupReport:
+    """A class to hold the startup stage timings of the most recent create_app() call."""
+
+    ENABLED: bool = True
+    SLOWEST_N: int = 10
+    TIME_OPENAPI: bool = False
+
+    # package import timings are recorded once (and survive reset())
+    IMPORTS: Dict[str, float] = {}
+    STAGES: Dict[str, float] = {}
+    ENDPOINTS: Dict[str, int] = {}
+    # a min-heap of (seconds, kind, path) holding the slowest fetches
+    _FETCHES: List[Tuple[float, str, str]] = []
+    _LOCK: threading.Lock = threading.Lock()
+
+    @classmethod
+    def config_startup(
+        cls,
+        config_dict: Optional[StartupConfigDict] = None,
+    ) -> None:
+        """Configure (and reset) the startup report.
+
+        Arguments:
+            config_dict: A dictionary of optional startup report args.
+
+        Returns:
+            None. Sets the global startup report configuration.
+        """
+        if not config_dict:
+            config_dict = {}
+
+        slowest_n: int = config_dict.get('slowest_n', 10)
+        if not isinstance(slowest_n, int) or slowest_n < 0:
+            raise ValueError(
+                f'slowest_n must be a non-negative int, not {slowest_n}',
+            )
+        cls.ENABLED = config_dict.get('enabled', True)
+        cls.SLOWEST_N = slowest_n
+        cls.TIME_OPENAPI = config_dict.get('time_openapi', False)
+        cls.reset()
+
+    @classmethod
+    def reset(cls) -> None:
+        """Clears the stage, endpoint and fetch timings."""
+        with cls._LOCK:
+            cls.STAGES = {}
+            cls.ENDPOINTS = {}
+            cls._FETCHES = []
+
+    @classmethod
+    @contextmanager
+    def import_stage(
+        cls,
+        name: str,
+    ) -> Iterator[None]:
+        """Times a package import."""
+        start: float = time.perf_counter()
+        try:
+            yield None
+        finally:
+            cls.IMPORTS[name] = time.perf_counter() - start
+
+    @classmethod
+    @contextmanager
+    def stage(
+        cls,
+        name: str,
+    ) -> Iterator[None]:
+        """Times a startup stage (repeated stages are summed)."""
+        start: float = time.perf_counter()
+        try:
+            yield None
+        finally:
+            seconds: float = time.perf_counter() - start
+            with cls._LOCK:
+                cls.STAGES[name] = cls.STAGES.get(name, 0.0) + seconds
+
+    @classmethod
+    def record_fetch(
+        cls,
+        kind: str,
+        path: str,
+        seconds: float,
+    ) -> None:
+        """Records a sub-catalog/item fetch, keeping only the SLOWEST_N."""
+        if cls.SLOWEST_N == 0:
+            return None
+        with cls._LOCK:
+            if len(cls._FETCHES) < cls.SLOWEST_N:
+                heapq.heappush(cls._FETCHES, (seconds, kind, path))
+            else:
+                heapq.heappushpop(cls._FETCHES, (seconds, kind, path))
+
+    @classmethod
+    def timed(
+        cls,
+        iterable: Iterable[Any],
+        kind: str,
+        get_path: Callable[[Any], str],
+    ) -> Iterator[Any]:
+        """Yields from an iterable, recording how long each value took to fetch.
+
+        NOTE: Catalog children/items are resolved lazily as they are iterated over,
+        so the time spent in next() is the time to fetch (and parse) that child.
+        """
+        iterator: Iterator[Any] = iter(iterable)
+        while True:
+            start: float = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return None
+            cls.record_fetch(kind, get_path(value), time.perf_counter() - start)
+            yield value
+
+    @classmethod
+    def set_endpoint_counts(
+        cls,
+        **counts: int,
+    ) -> None:
+        cls.ENDPOINTS.update(counts)
+
+    @classmethod
+    def report(cls) -> Dict[str, Any]:
+        """Returns the startup report as a JSON serializable dictionary."""
+        with cls._LOCK:
+            fetches = sorted(cls._FETCHES, reverse=True)
+            stages = dict(cls.STAGES)
+        return {
+            'imports_seconds': dict(cls.IMPORTS),
+            'stages_seconds': stages,
+            'total_seconds': sum(stages.values()),
+            'slowest_fetches': [
+                {'kind': kind, 'path': path, 'seconds': seconds}
+                for seconds, kind, path in fetches
+            ],
+            'endpoints': dict(cls.ENDPOINTS),
+            'peak_rss_mb': get_peak_rss_mb(),
+        }
+
+    @classmethod
+    def log_report(cls) -> None:
+        """Logs a readable summary of the startup report."""
+        report: Dict[str, Any] = cls.report()
+        lines: List[str] = [
+            f'Startup took {report["total_seconds"]:.3f}s '
+            f'(peak RSS={report["peak_rss_mb"] or float("nan"):.1f} MiB).',
+        ]
+        for name, seconds in {**report['imports_seconds'], **report['stages_seconds']}.items():
+            lines.append(f'  {name}: {seconds:.3f}s')
+        lines.append(
+            '  endpoints: ' + ', '.join(f'{k}={v}' for k, v in report['endpoints'].items()),
+        )
+        for fetch in report['slowest_fetches']:
+            lines.append(f'  slow {fetch["kind"]} {fetch["path"]}: {fetch["seconds"]:.3f}s')
+        logger.info('\n'.join(lines))
+
+    @classmethod
+    def get_startup_report(cls) -> JSONResponse:
+        """Returns the startup report.
+
+        Will be added to the main application as @app.get('/startup').
+        """
+        return JSONResponse(cls.report())
@@ -0,0 +1,121 @@
+"""
+Streaming (and fast) JSON serialization of large catalog responses.
+"""
+import json
+from collections.abc import Iterator as IteratorABC
+from fastapi.responses import (
+    JSONResponse,
+    StreamingResponse,
+)
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the size of the chunks written to the client (and so the serialization buffer)
+CHUNK_SIZE: int = 64 * 2**10
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes a value as compact JSON (w/ orjson if installed)."""
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def is_lazy(value: Any) -> bool:
+    """Returns whether a value is (or its dictionaries hold) an iterator."""
+    if isinstance(value, Mapping):
+        return any(is_lazy(item) for item in value.values())
+    return isinstance(value, IteratorABC)
+
+
+def iter_json(value: Any) -> Iterator[bytes]:
+    """Yields the JSON encoding of a value in pieces.
+
+    Iterators (i.e., generators) are encoded as arrays one element at a time, and
+    dictionaries holding them item by item, so a value whose large parts are
+    generators is never held in memory (or encoded) all at once. Anything else is
+    encoded in one piece.
+    """
+    if isinstance(value, IteratorABC):
+        yield b'['
+        for i, item in enumerate(value):
+            if i:
+                yield b','
+            yield from iter_json(item)
+        yield b']'
+    elif isinstance(value, Mapping) and is_lazy(value):
+        yield b'{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (b',' if i else b'') + dumps(str(key)) + b':'
+            yield from iter_json(item)
+        yield b'}'
+    else:
+        yield dumps(value)
+
+
+def iter_chunks(
+    pieces: Iterable[bytes | str],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Joins (encoded) pieces into chunks of about chunk_size bytes."""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece.encode('utf-8') if isinstance(piece, str) else piece
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSONResponse encoded w/ orjson (if installed)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamingJSONResponse(StreamingResponse):
+    """A response streaming the JSON encoding of a value in chunks (see iter_json()).
+
+    Peak memory per response is bounded by the chunk size (plus the largest piece),
+    and the first chunk is sent before the rest of the value is encoded.
+
+    Arguments:
+        content: The value to encode (w/ its large parts as generators).
+        status_code: The response status code.
+        headers: Optional response headers.
+        chunk_size: The size of the chunks written to the client.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        super().__init__(
+            content=iter_chunks(iter_json(content), chunk_size=chunk_size),
+            status_code=status_code,
+            headers=headers,
+            media_type='application/json',
+        )
@@ -0,0 +1,466 @@
+"""
+Optional OpenTelemetry-compatible tracing spans w/ an offline OTLP/JSON file exporter.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import fsspec
+from contextlib import contextmanager
+from pathlib import Path
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
+from catalog_to_xpublish.compute import (
+    DaskCompute,
+)
+from catalog_to_xpublish.fs_hooks import (
+    FileSystemRead,
+    hook_filesystem,
+)
+from catalog_to_xpublish.metrics import (
+    get_route_template,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+    TypedDict,
+    Optional,
+)
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL: int = 1
+SPAN_KIND_SERVER: int = 2
+SPAN_KIND_CLIENT: int = 3
+STATUS_OK: int = 1
+STATUS_ERROR: int = 2
+
+EXPORTERS: List[str] = ['file', 'opentelemetry']
+
+
+class TracingConfigDict(TypedDict):
+    """A dictionary to hold the optional tracing configuration args.
+
+    NOTE: All arguments are optional.
+    Attributes:
+        exporter: 'file' to write OTLP/JSON lines to trace_file (works offline),
+            or 'opentelemetry' to use the opentelemetry-api global tracer provider.
+            Default is 'file'.
+        trace_file: The file to write OTLP/JSON lines to (default is traces.jsonl).
+        service_name: The service.name resource attribute.
+        sample_rate: The fraction of traces to record (default is 1.0).
+        batch_size: The max number of spans written per line (default is 256).
+    """
+    exporter: Optional[str]
+    trace_file: Optional[str | Path]
+    service_name: Optional[str]
+    sample_rate: Optional[float]
+    batch_size: Optional[int]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Converts a python value to an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    """A minimal span (trace/span ids, timing, attributes and status)."""
+
+    __slots__ = (
+        'name', 'kind', 'trace_id', 'span_id', 'parent_id', 'sampled',
+        'start_ns', 'end_ns', 'attributes', 'status', 'status_message',
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: int,
+        parent: Optional['Span'],
+        sampled: bool,
+        attributes: Dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id: str = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id: str = os.urandom(8).hex()
+        self.parent_id: str = parent.span_id if parent else ''
+        self.sampled = sampled
+        self.start_ns: int = time.time_ns()
+        self.end_ns: int = 0
+        self.attributes = attributes
+        self.status: int = STATUS_OK
+        self.status_message: str = ''
+
+    def set_attribute(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Returns the span as an OTLP/JSON span."""
+        otlp_span: Dict[str, Any] = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                {'key': key, 'value': _otlp_value(value)}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            'status': {'code': self.status, 'message': self.status_message},
+        }
+        if self.parent_id:
+            otlp_span['parentSpanId'] = self.parent_id
+        return otlp_span
+
+
+class _NoOpSpan:
+    """Returned by Tracer.span() when tracing is disabled."""
+
+    def set_attribute(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoOpSpan()
+_CURRENT_SPAN: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    'catalog_to_xpublish_span',
+    default=None,
+)
+
+
+class FileSpanExporter:
+    """Writes finished spans as OTLP/JSON ExportTraceServiceRequest lines.
+
+    Spans are written by a background thread, and each line can be POSTed as is
+    to an OpenTelemetry collector's /v1/traces endpoint later.
+    """
+
+    def __init__(
+        self,
+        trace_file: Path,
+        service_name: str,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.trace_file = trace_file
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='catalog_to_xpublish-span-exporter',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def export(
+        self,
+        span: Span,
+    ) -> None:
+        self._queue.put(span)
+
+    def _write(
+        self,
+        spans: List[Span],
+    ) -> None:
+        request: Dict[str, Any] = {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes': [
+                        {'key': 'service.name', 'value': _otlp_value(self.service_name)},
+                    ],
+                },
+                'scopeSpans': [{
+                    'scope': {'name': 'catalog_to_xpublish'},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }],
+        }
+        with open(self.trace_file, 'a') as f:
+            f.write(json.dumps(request) + '\n')
+
+    def _run(self) -> None:
+        spans: List[Span] = []
+        stop: bool = False
+        while not stop:
+            try:
+                span = self._queue.get(timeout=self.flush_interval)
+                if span is None:
+                    stop = True
+                else:
+                    spans.append(span)
+            except queue.Empty:
+                pass
+            if spans and (stop or len(spans) >= self.batch_size or self._queue.empty()):
+                try:
+                    self._write(spans)
+                except OSError as e:
+                    logger.warning(f'Could not write {len(spans)} spans: {e}')
+                spans = []
+
+    def close(self) -> None:
+        """Writes any queued spans and stops the exporter thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Tracer:
+    """A class to hold the tracing configuration."""
+
+    ENABLED: bool = False
+    SERVICE_NAME: str = 'catalog_to_xpublish'
+    SAMPLE_RATE: float = 1.0
+    EXPORTER: FileSpanExporter | None = None
+    OTEL_TRACER: Any = None
+
+    @classmethod
+    def config_tracing(
+        cls,
+        config_dict: Optional[TracingConfigDict] = None,
+    ) -> None:
+        """Configure tracing.
+
+        Arguments:
+            config_dict: A dictionary of optional tracing args.
+                If None, tracing is disabled.
+
+        Returns:
+            None. Sets the global tracing configuration.
+        """
+        cls.close()
+        if config_dict is None:
+            return None
+
+        exporter: str = config_dict.get('exporter', 'file')
+        if exporter not in EXPORTERS:
+            raise ValueError(
+                f'exporter={exporter} is not in {EXPORTERS}.',
+            )
+        sample_rate: float = config_dict.get('sample_rate', 1.0)
+        if not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+            raise ValueError(
+                f'sample_rate must be between 0 and 1, not {sample_rate}',
+            )
+        batch_size: int = config_dict.get('batch_size', 256)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError(
+                f'batch_size must be a positive int, not {batch_size}',
+            )
+        cls.SERVICE_NAME = config_dict.get('service_name', 'catalog_to_xpublish')
+        cls.SAMPLE_RATE = float(sample_rate)
+
+        if exporter == 'opentelemetry':
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError(
+                    'opentelemetry-api is required to use exporter=opentelemetry. '
+                    'Please install it (i.e., pip install opentelemetry-sdk).',
+                )
+            cls.OTEL_TRACER = trace.get_tracer('catalog_to_xpublish')
+        else:
+            trace_file = Path(config_dict.get('trace_file', 'traces.jsonl'))
+            if not trace_file.parent.exists():
+                raise ValueError(
+                    f'directory={trace_file.parent} does not exist.',
+                )
+            cls.EXPORTER = FileSpanExporter(
+                trace_file,
+                service_name=cls.SERVICE_NAME,
+                batch_size=batch_size,
+            )
+
+        # propagate the span context into dask's threaded scheduler tasks
+        DaskCompute.use_context_pool()
+
+        cls.ENABLED = True
+        logger.info(
+            f'Tracing {cls.SAMPLE_RATE:.1%} of requests w/ the {exporter} exporter.',
+        )
+
+    @classmethod
+    def reset_after_fork(cls) -> None:
+        """Restart the span exporter in a forked worker (its thread doesn't survive fork)."""
+        if cls.EXPORTER is not None:
+            exporter: FileSpanExporter = cls.EXPORTER
+            cls.EXPORTER = FileSpanExporter(
+                trace_file=exporter.trace_file,
+                service_name=exporter.service_name,
+                batch_size=exporter.batch_size,
+                flush_interval=exporter.flush_interval,
+            )
+
+    @classmethod
+    def close(cls) -> None:
+        """Disable tracing, writing any queued spans."""
+        cls.ENABLED = False
+        cls.OTEL_TRACER = None
+        if cls.EXPORTER is not None:
+            cls.EXPORTER.close()
+            cls.EXPORTER = None
+
+    @classmethod
+    def current_span(cls) -> Span | None:
+        return _CURRENT_SPAN.get()
+
+    @classmethod
+    @contextmanager
+    def span(
+        cls,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes: Any,
+    ) -> Iterator[Span | _NoOpSpan]:
+        """Records a span (a no-op if tracing is disabled).
+
+        New traces are sampled at SAMPLE_RATE, child spans follow their parent.
+        """
+        if not cls.ENABLED:
+            yield _NOOP_SPAN
+            return None
+
+        if cls.OTEL_TRACER is not None:
+            from opentelemetry.trace import SpanKind
+            with cls.OTEL_TRACER.start_as_current_span(
+                name,
+                kind=SpanKind(kind - 1),
+                attributes={k: v for k, v in attributes.items() if v is not None},
+            ) as otel_span:
+                yield otel_span
+            return None
+
+        parent: Span | None = _CURRENT_SPAN.get()
+        if parent is None:
+            sampled: bool = cls.SAMPLE_RATE >= 1 or random.random() < cls.SAMPLE_RATE
+        else:
+            sampled = parent.sampled
+        span = Span(name, kind, parent, sampled, attributes)
+        token = _CURRENT_SPAN.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = STATUS_ERROR
+            span.status_message = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            _CURRENT_SPAN.reset(token)
+            span.end_ns = time.time_ns()
+            if sampled and cls.EXPORTER is not None:
+                cls.EXPORTER.export(span)
+
+    @classmethod
+    def instrument_filesystem(
+        cls,
+        fs: fsspec.AbstractFileSystem,
+        protocol: str,
+    ) -> fsspec.AbstractFileSystem:
+        """Records a client span per filesystem read (in place).
+
+        NOTE: Hooks the same reads as Metrics.instrument_filesystem() (see
+        hook_filesystem()), spans are only recorded while tracing is enabled.
+        """
+        def start_span(read: FileSystemRead) -> Tuple[Any, Span | _NoOpSpan]:
+            span_context = cls.span(
+                f'fsspec.{read.method}',
+                kind=SPAN_KIND_CLIENT,
+                **{
+                    'fsspec.protocol': protocol,
+                    'fsspec.path': str(read.path),
+                    'fsspec.start': read.start,
+                    'fsspec.end': read.end,
+                },
+            )
+            return span_context, span_context.__enter__()
+
+        def end_span(
+            read: FileSystemRead,
+            state: Tuple[Any, Span | _NoOpSpan],
+            data: bytes | None,
+            error: BaseException | None,
+        ) -> None:
+            span_context, span = state
+            if error is None:
+                span.set_attribute('fsspec.bytes', len(data or b''))
+                span_context.__exit__(None, None, None)
+            else:
+                span_context.__exit__(type(error), error, error.__traceback__)
+
+        return hook_filesystem(fs, 'tracing', before=start_span, after=end_span)
+
+
+class TracingMiddleware:
+    """A pure ASGI middleware recording a server span per request."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+    ) -> None:
+        self.app = app
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        if scope['type'] != 'http' or not Tracer.ENABLED:
+            await self.app(scope, receive, send)
+            return None
+
+        root_path: str = scope.get('root_path', '')
+        method: str = scope.get('method', '')
+
+        with Tracer.span(
+            f'HTTP {method}',
+            kind=SPAN_KIND_SERVER,
+            **{'http.request.method': method, 'url.path': scope.get('path', '')},
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message['type'] == 'http.response.start':
+                    span.set_attribute('http.response.status_code', message['status'])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route: str = get_route_template(scope, root_path)
+                span.set_attribute('http.route', route)
+                if isinstance(span, Span):
+                    span.name = f'{method} {route}'
+                else:
+                    span.update_name(f'{method} {route}')
+
+
+# write any queued spans on exit
+atexit.register(Tracer.close)
@@ -0,0 +1,76 @@
+"""A pytest module for testing process pool chunk encoding."""
+import asyncio
+import numpy as np
+import pytest
+import xpublish
+from numcodecs import (
+    Blosc,
+    Delta,
+)
+from xpublish.utils.zarr import encode_chunk
+from catalog_to_xpublish.plugins import (
+    ChunkEncodingPool,
+    ProcessPoolZarrPlugin,
+)
+
+
+@pytest.fixture(scope='module')
+def data_chunk() -> np.ndarray:
+    """Returns a decoded chunk."""
+    return np.random.default_rng(0).random((64, 128), dtype='float32')
+
+
+@pytest.fixture(scope='module')
+def pool() -> ChunkEncodingPool:
+    """Start (and later shutdown) a small encoding pool."""
+    ChunkEncodingPool.config_encoding({'max_workers': 2})
+    yield ChunkEncodingPool
+    ChunkEncodingPool.close()
+
+
+@pytest.mark.parametrize('shared_memory', [True, False])
+def test_pool_matches_inline(
+    pool: ChunkEncodingPool,
+    data_chunk: np.ndarray,
+    shared_memory: bool,
+) -> None:
+    """Test that pool encoding matches xpublish's inline encoding."""
+    pool.SHARED_MEMORY = shared_memory
+    filters = [Delta(dtype='float32')]
+    compressor = Blosc(cname='zstd', clevel=3)
+
+    expected = encode_chunk(
+        data_chunk.tobytes(),
+        filters=filters,
+        compressor=compressor,
+    )
+
+    async def encode_many() -> list:
+        return await asyncio.gather(*[
+            pool.encode(data_chunk, filters=filters, compressor=compressor)
+            for _ in range(8)
+        ])
+
+    for echunk in asyncio.run(encode_many()):
+        assert echunk == expected
+        decoded = filters[0].decode(compressor.decode(echunk))
+        np.testing.assert_array_equal(decoded, data_chunk.ravel())
+
+
+def test_uncompressed_chunk(
+    pool: ChunkEncodingPool,
+    data_chunk: np.ndarray,
+) -> None:
+    """Test that chunks without codecs are returned as raw bytes."""
+    pool.SHARED_MEMORY = True
+    echunk = asyncio.run(pool.encode(data_chunk, filters=None, compressor=None))
+    assert echunk == data_chunk.tobytes()
+
+
+def test_plugin_replaces_zarr_router() -> None:
+    """Test that the plugin keeps one (async) chunk route."""
+    rest = xpublish.Rest({})
+    router = ProcessPoolZarrPlugin().dataset_router(deps=rest.dependencies())
+    paths = [route.path for route in router.routes]
+    assert paths.count('/zarr/{var}/{chunk}') == 1
+    assert '/zarr/.zmetadata' in paths
@@ -0,0 +1,167 @@
+"""A pytest module for testing the server-side subset download endpoint."""
+import gc
+import io
+import json
+import sys
+import zipfile
+import dask
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+import xpublish
+import zarr
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.plugins import (
+    SubsetPlugin,
+)
+from catalog_to_xpublish.plugins.subset_plugin import (
+    stream_zarr_zip,
+    subset_dataset,
+)
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory: pytest.TempPathFactory) -> xr.Dataset:
+    """Open a small zarr store with on-disk chunks (as the io classes do)."""
+    path = tmp_path_factory.mktemp('subset') / 'test.zarr'
+    ds = xr.Dataset(
+        data_vars={
+            'temp': (
+                ('time', 'lat', 'lon'),
+                np.arange(20 * 30 * 40, dtype='float32').reshape(20, 30, 40),
+            ),
+            'precip': (
+                ('time', 'lat', 'lon'),
+                np.ones((20, 30, 40), dtype='float64'),
+            ),
+        },
+        coords={
+            'time': pd.date_range('2020-01-01', periods=20),
+            'lat': np.linspace(-29, 29, 30),
+            'lon': np.arange(40),
+        },
+    )
+    ds.to_zarr(path, encoding={'temp': {'chunks': (7, 9, 11)}})
+    return xr.open_dataset(path, engine='zarr', chunks={})
+
+
+@pytest.fixture(scope='module')
+def client(dataset: xr.Dataset) -> TestClient:
+    """Serve the dataset w/ the subset plugin."""
+    rest = xpublish.Rest({'test': dataset})
+    rest.register_plugin(SubsetPlugin())
+    return TestClient(rest.app)
+
+
+def test_zarr_zip_subset(
+    client: TestClient,
+    dataset: xr.Dataset,
+    tmp_path: Path,
+) -> None:
+    """Test streaming a bbox/time window as a zipped zarr store."""
+    response = client.get(
+        '/datasets/test/subset/',
+        params={
+            'variables': 'temp',
+            'sel': json.dumps({'lat': [-10, 10], 'time': ['2020-01-03', '2020-01-12']}),
+            'isel': json.dumps({'lon': [5, 25]}),
+            'format': 'zarr',
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/zip'
+    assert 'test.zarr.zip' in response.headers['content-disposition']
+
+    zip_path = tmp_path / 'subset.zarr.zip'
+    zip_path.write_bytes(response.content)
+    with zipfile.ZipFile(zip_path) as zf:
+        assert '.zmetadata' in zf.namelist()
+
+    out = xr.open_zarr(zarr.storage.ZipStore(zip_path, mode='r'))
+    expected = dataset[['temp']].sel(
+        lat=slice(-10, 10),
+        time=slice('2020-01-03', '2020-01-12'),
+    ).isel(lon=slice(5, 25))
+    assert list(out.data_vars) == ['temp']
+    xr.testing.assert_identical(out.load(), expected.load())
+
+
+def test_netcdf_subset(
+    client: TestClient,
+    dataset: xr.Dataset,
+) -> None:
+    """Test streaming a nearest-point time series as NetCDF."""
+    response = client.get(
+        '/datasets/test/subset/',
+        params={
+            'sel': json.dumps({'lat': 0.5, 'lon': 3.2}),
+            'method': 'nearest',
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-netcdf'
+
+    out = xr.open_dataset(io.BytesIO(response.content), engine='h5netcdf')
+    expected = dataset.sel(lat=0.5, lon=3.2, method='nearest')
+    assert set(out.data_vars) == {'temp', 'precip'}
+    assert out['temp'].dims == ('time',)
+    np.testing.assert_array_equal(out['temp'].values, expected['temp'].values)
+
+
+def test_zarr_zip_stream_is_incremental(dataset: xr.Dataset) -> None:
+    """Test that bytes are yielded before the write finishes, and that closing early stops the writer."""
+    subset = subset_dataset(dataset).chunk({'time': 1})
+    stream = stream_zarr_zip(subset, max_queued=2)
+    first = next(stream)
+    assert first.startswith(b'PK')
+
+    # the writer's threaded scheduler is not visible to the rest of the process
+    assert dask.config.get('scheduler', None) != 'threads'
+
+    # i.e., the client disconnected, w/o the abandoned zip raising during GC
+    unraisable: list = []
+    hook = sys.unraisablehook
+    sys.unraisablehook = unraisable.append
+    try:
+        stream.close()
+        gc.collect()
+    finally:
+        sys.unraisablehook = hook
+    assert not unraisable
+
+
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'variables': 'not_a_var'},
+        {'sel': 'not json'},
+        {'isel': json.dumps({'not_a_dim': 0})},
+    ],
+)
+def test_bad_subset_request(
+    client: TestClient,
+    params: dict,
+) -> None:
+    """Test that invalid selectors are rejected before streaming."""
+    response = client.get('/datasets/test/subset/', params=params)
+    assert response.status_code == 400
+
+
+def test_subset_size_limit(client: TestClient) -> None:
+    """Test that subsets over max_subset_bytes are rejected (before writing)."""
+    DatasetCache.config_cache({'max_subset_bytes': 10000})
+    response = client.get('/datasets/test/subset/')
+    assert response.status_code == 413
+
+    # a single time step of temp fits
+    response = client.get(
+        '/datasets/test/subset/',
+        params={'variables': 'temp', 'isel': json.dumps({'time': 0})},
+    )
+    assert response.status_code == 200
+    DatasetCache.config_cache(None)
@@ -0,0 +1,261 @@
+"""A pytest module for testing the dataset/result caches and the reduction endpoint."""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+import xpublish
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from catalog_to_xpublish.base import (
+    CatalogEndpoint,
+    CatalogToXarray,
+)
+from catalog_to_xpublish import cache as cache_module
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+    LRUCache,
+)
+from catalog_to_xpublish.plugins import (
+    ReducePlugin,
+)
+from catalog_to_xpublish.provider_plugin import (
+    DatasetProviderPlugin,
+)
+
+
+class CountingToXarray(CatalogToXarray):
+    """An io class that counts how many times datasets are opened."""
+    catalog_type: str = 'counting'
+    opens: int = 0
+
+    def __init__(self, catalog_obj: object) -> None:
+        self.catalog = catalog_obj
+
+    def write_attributes(self, ds: xr.Dataset, info_dict: dict) -> xr.Dataset:
+        return ds
+
+    def get_dataset_from_catalog(self, dataset_id: str) -> xr.Dataset:
+        CountingToXarray.opens += 1
+        return xr.Dataset({'x': ('t', np.arange(3))})
+
+
+@pytest.fixture(autouse=True)
+def reset_caches() -> None:
+    """Start each test with empty caches."""
+    DatasetCache.config_cache({'max_datasets': 4, 'max_result_bytes': 2**20})
+
+
+@pytest.fixture(scope='module')
+def dataset() -> xr.Dataset:
+    """Returns a small dataset w/ a daily time axis."""
+    return xr.Dataset(
+        data_vars={
+            'temp': (
+                ('time', 'lat', 'lon'),
+                np.random.default_rng(0).random((60, 10, 12)),
+            ),
+        },
+        coords={
+            'time': pd.date_range('2020-01-01', periods=60),
+            'lat': np.arange(10),
+            'lon': np.arange(12),
+        },
+    )
+
+
+@pytest.fixture(scope='module')
+def client(dataset: xr.Dataset) -> TestClient:
+    """Serve the dataset w/ the reduction plugin."""
+    rest = xpublish.Rest({'test': dataset})
+    rest.register_plugin(ReducePlugin())
+    return TestClient(rest.app)
+
+
+def test_lru_cache() -> None:
+    """Test size-bounded LRU eviction and hit/miss stats."""
+    cache = LRUCache(10, sizeof=len)
+    assert cache.put('a', 'aaaa')
+    assert cache.put('b', 'bbbb')
+    assert cache.get('a') == 'aaaa'
+
+    # 'b' is the least recently used
+    assert cache.put('c', 'cccc')
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert not cache.put('d', 'd' * 11)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['size'] == 8
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 1
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_lru_cache_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that values expire (as misses) once older than the ttl."""
+    now: list = [100.0]
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    cache = LRUCache(10, sizeof=len, ttl=60)
+    assert cache.put('a', 'aaaa')
+    now[0] += 60
+    assert cache.get('a') == 'aaaa'
+    now[0] += 1
+    assert cache.get('a') is None
+    assert 'a' not in cache
+
+    stats = cache.stats()
+    assert stats['size'] == 0
+    assert stats['expirations'] == 1
+    assert stats['misses'] == 1
+
+
+def test_cache_config_validation() -> None:
+    """Test that bad cache sizes are rejected."""
+    with pytest.raises(ValueError):
+        DatasetCache.config_cache({'max_datasets': -1})
+    with pytest.raises(ValueError):
+        DatasetCache.config_cache({'max_compute_bytes': True})
+    with pytest.raises(ValueError):
+        DatasetCache.config_cache({'result_ttl': -1})
+    with pytest.raises(ValueError):
+        DatasetCache.config_cache({'result_ttl': '60'})
+    with pytest.raises(ValueError):
+        DatasetCache.config_cache({'dataset_ttl': True})
+    DatasetCache.config_cache({'result_ttl': None, 'dataset_ttl': 60})
+    assert DatasetCache.RESULTS.ttl is None
+    assert DatasetCache.DATASETS.ttl == 60
+    DatasetCache.config_cache(None)
+    assert DatasetCache.RESULTS.ttl == 300
+    assert DatasetCache.DATASETS.ttl is None
+
+
+def test_provider_caches_datasets() -> None:
+    """Test that opened datasets are re-used until their catalog entry changes."""
+    endpoint = CatalogEndpoint(
+        catalog_obj=None,
+        catalog_path='/sub',
+        dataset_ids=['ds'],
+        sub_catalogs=[],
+        dataset_info_dicts={'ds': {'href': 's3://bucket/v1.zarr'}},
+        contains_datasets=True,
+    )
+    plugin = DatasetProviderPlugin(
+        catalog_endpoint=endpoint,
+        io_class=CountingToXarray,
+    )
+    CountingToXarray.opens = 0
+
+    ds = plugin.get_dataset('ds')
+    assert plugin.get_dataset('ds') is ds
+    assert CountingToXarray.opens == 1
+    assert ds.attrs['_xpublish_id'] == 'ds'
+    assert plugin.get_dataset('not_a_dataset') is None
+
+    # a new catalog entry is a new dataset version
+    endpoint.dataset_info_dicts['ds'] = {'href': 's3://bucket/v2.zarr'}
+    assert plugin.get_dataset('ds') is not ds
+    assert CountingToXarray.opens == 2
+
+
+def test_reduction_is_cached(
+    client: TestClient,
+    dataset: xr.Dataset,
+) -> None:
+    """Test a temporal mean, and that repeating it is a cache hit."""
+    params = {'dims': 'time', 'variables': 'temp'}
+    response = client.get('/datasets/test/reduce/mean', params=params)
+    assert response.status_code == 200
+    assert response.headers['x-cache'] == 'MISS'
+
+    out = xr.Dataset.from_dict(response.json())
+    np.testing.assert_allclose(
+        out['temp'].values,
+        dataset['temp'].mean('time').values,
+    )
+
+    response = client.get('/datasets/test/reduce/mean', params=params)
+    assert response.headers['x-cache'] == 'HIT'
+    assert DatasetCache.RESULTS.stats()['hits'] == 1
+
+    # different parameters are a different result
+    response = client.get('/datasets/test/reduce/max', params=params)
+    assert response.headers['x-cache'] == 'MISS'
+
+
+def test_equivalent_selectors_share_a_result(client: TestClient) -> None:
+    """Test that selectors differing only in key order or whitespace are a cache hit."""
+    params = {'dims': 'time', 'isel': '{"lat": [0, 5], "lon": [2, 4]}'}
+    assert client.get('/datasets/test/reduce/mean', params=params).headers['x-cache'] == 'MISS'
+
+    params['isel'] = '{ "lon":[2,4],  "lat":[0,5] }'
+    assert client.get('/datasets/test/reduce/mean', params=params).headers['x-cache'] == 'HIT'
+
+
+def test_results_expire(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that results are recomputed once older than result_ttl."""
+    now: list = [100.0]
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    DatasetCache.config_cache({'result_ttl': 60})
+    params = {'dims': 'lat'}
+    assert client.get('/datasets/test/reduce/sum', params=params).headers['x-cache'] == 'MISS'
+    assert client.get('/datasets/test/reduce/sum', params=params).headers['x-cache'] == 'HIT'
+
+    now[0] += 61
+    assert client.get('/datasets/test/reduce/sum', params=params).headers['x-cache'] == 'MISS'
+    DatasetCache.config_cache(None)
+
+
+def test_result_size_limit(client: TestClient) -> None:
+    """Test that results over max_compute_bytes are rejected (before computing)."""
+    DatasetCache.config_cache({'max_compute_bytes': 1000})
+    response = client.get('/datasets/test/reduce/mean', params={'dims': 'lat'})
+    assert response.status_code == 413
+
+    # an area average (a 60 step time series) fits
+    response = client.get('/datasets/test/reduce/mean', params={'dims': 'lat,lon'})
+    assert response.status_code == 200
+    DatasetCache.config_cache(None)
+
+
+def test_resampled_area_average(
+    client: TestClient,
+    dataset: xr.Dataset,
+) -> None:
+    """Test a monthly area average w/ a selection."""
+    response = client.get(
+        '/datasets/test/reduce/mean',
+        params={
+            'dims': 'lat,lon',
+            'resample': '1MS',
+            'isel': '{"lat": [0, 5]}',
+        },
+    )
+    assert response.status_code == 200
+    out = xr.Dataset.from_dict(response.json())
+    expected = dataset.isel(lat=slice(0, 5)).resample(time='1MS').mean().mean(['lat', 'lon'])
+    assert out['temp'].dims == ('time',)
+    np.testing.assert_allclose(out['temp'].values, expected['temp'].values)
+
+
+@pytest.mark.parametrize(
+    'path, params, status_code',
+    [
+        ('/datasets/test/reduce/median', {}, 422),
+        ('/datasets/test/reduce/mean', {'dims': 'not_a_dim'}, 400),
+        ('/datasets/test/reduce/mean', {'resample': 'not_a_freq'}, 400),
+    ],
+)
+def test_bad_reduction_request(
+    client: TestClient,
+    path: str,
+    params: dict,
+    status_code: int,
+) -> None:
+    """Test that invalid reductions are rejected."""
+    response = client.get(path, params=params)
+    assert response.status_code == status_code
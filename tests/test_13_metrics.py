@@ -0,0 +1,120 @@
+"""A pytest module for testing the /metrics endpoint and runtime instrumentation."""
+import asyncio
+import catalog_to_xpublish
+import fsspec
+import pytest
+from fastapi.testclient import TestClient
+from fsspec.asyn import AsyncFileSystem
+from pathlib import Path
+from catalog_to_xpublish.metrics import (
+    Histogram,
+    Metrics,
+)
+
+
+class MemoryAsyncFileSystem(AsyncFileSystem):
+    """A tiny in-memory async filesystem."""
+
+    protocol = 'asyncmem'
+    store = {'bucket/a': b'abc', 'bucket/b': b'defgh'}
+
+    async def _cat_file(self, path, start=None, end=None, **kwargs):
+        await asyncio.sleep(0)
+        return self.store[self._strip_protocol(path)]
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def test_histogram_render() -> None:
+    """Test the Prometheus text format of a histogram."""
+    histogram = Histogram('test_seconds', 'A test histogram.', [0.1, 1.0])
+    histogram.observe(0.05, route='/a')
+    histogram.observe(0.5, route='/a')
+    histogram.observe(5.0, route='/a')
+
+    text = histogram.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{route="/a"} 3' in text
+    assert histogram.get_count(route='/a') == 3
+
+
+def test_config_validation() -> None:
+    """Test that bad metrics configs raise errors."""
+    with pytest.raises(ValueError):
+        Metrics.config_metrics({'buckets': []})
+    Metrics.config_metrics()
+
+
+def test_fsspec_counting() -> None:
+    """Test that filesystem reads are counted per protocol."""
+    Metrics.config_metrics()
+    fsspec.register_implementation('asyncmem', MemoryAsyncFileSystem, clobber=True)
+    fs = Metrics.instrument_filesystem(
+        fsspec.filesystem('asyncmem', skip_instance_cache=True),
+        'asyncmem',
+    )
+    # instrumenting twice must not double count
+    fs = Metrics.instrument_filesystem(fs, 'asyncmem')
+
+    fs.cat(['bucket/a', 'bucket/b'])
+    fs.cat_file('bucket/a')
+    assert Metrics.FSSPEC_REQUESTS.get(protocol='asyncmem') == 3
+    assert Metrics.FSSPEC_BYTES.get(protocol='asyncmem') == 11
+
+    memory_fs = Metrics.instrument_filesystem(fsspec.filesystem('memory'), 'memory')
+    memory_fs.pipe_file('/metrics_test', b'1234')
+    memory_fs.cat_file('/metrics_test')
+    assert Metrics.FSSPEC_BYTES.get(protocol='memory') == 4
+
+
+def test_metrics_endpoint(catalog_path: Path) -> None:
+    """Test request, crawl and cache metrics on a live app."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        app_name='metrics_test_app',
+    )
+    client = TestClient(app)
+    assert client.get('/json').status_code == 200
+    assert client.get('/not_a_route').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+
+    assert (
+        'catalog_to_xpublish_http_request_duration_seconds_count'
+        '{method="GET",route="/json",status="200"} 1'
+    ) in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'catalog_to_xpublish_catalog_crawl_duration_seconds{catalog_type="stac"}' in text
+    assert 'catalog_to_xpublish_cache_hit_ratio{cache="datasets"}' in text
+    assert Metrics.CATALOG_ENDPOINTS.get(catalog_type='stac') > 0
+
+
+def test_metrics_disabled(catalog_path: Path) -> None:
+    """Test that metrics can be turned off."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_metrics_dict={'enabled': False},
+    )
+    assert TestClient(app).get('/metrics').status_code == 404
+    Metrics.config_metrics()
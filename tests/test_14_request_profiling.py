@@ -0,0 +1,113 @@
+"""A pytest module for testing the opt-in request profiler."""
+import json
+import time
+import catalog_to_xpublish
+import pytest
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.profiling import (
+    RequestProfiler,
+    StackSampler,
+)
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def busy_function(seconds: float) -> None:
+    """Burns CPU for a while."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_stack_sampler() -> None:
+    """Test that busy functions show up in a sampled profile."""
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy_function(0.1)
+    sampler.stop()
+
+    summary = sampler.summarize()
+    assert summary['n_samples'] > 0
+    functions = [f['function'] for f in summary['functions']]
+    assert 'busy_function' in functions
+    assert any('busy_function' in stack for stack in summary['stacks'])
+
+
+def test_config_validation(tmp_path: Path) -> None:
+    """Test that bad profiling configs raise errors."""
+    with pytest.raises(ValueError):
+        RequestProfiler.config_profiling({'profile_dir': tmp_path, 'sample_rate': 2})
+    with pytest.raises(ValueError):
+        RequestProfiler.config_profiling({'profile_dir': tmp_path, 'max_profiles': 0})
+    RequestProfiler.config_profiling(None)
+    assert not RequestProfiler.ENABLED
+
+
+def test_admin_header_requires_token(tmp_path: Path) -> None:
+    """Test that the admin header is ignored unless an admin token is configured."""
+    scope: dict = {'type': 'http', 'headers': [(b'x-profile', b'1')]}
+    RequestProfiler.config_profiling({'profile_dir': tmp_path})
+    assert not RequestProfiler.should_profile(scope)
+
+    RequestProfiler.config_profiling({'profile_dir': tmp_path, 'admin_token': 'secret'})
+    assert not RequestProfiler.should_profile(scope)
+    assert RequestProfiler.should_profile({'type': 'http', 'headers': [(b'x-profile', b'secret')]})
+    RequestProfiler.config_profiling(None)
+
+
+def test_profiled_requests(
+    catalog_path: Path,
+    tmp_path: Path,
+) -> None:
+    """Test admin header profiling, retention and the summary endpoint."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_profiling_dict={
+            'profile_dir': tmp_path,
+            'admin_token': 'secret',
+            'max_profiles': 2,
+            'interval': 0.001,
+        },
+    )
+    client = TestClient(app)
+
+    # not sampled (sample_rate=0) and wrong/no token
+    assert 'x-profile-id' not in client.get('/json').headers
+    assert 'x-profile-id' not in client.get('/json', headers={'X-Profile': 'nope'}).headers
+    assert not list(tmp_path.glob('*.json'))
+
+    profile_ids = []
+    for _ in range(3):
+        response = client.get('/json', headers={'X-Profile': 'secret'})
+        assert response.status_code == 200
+        profile_ids.append(response.headers['x-profile-id'])
+        time.sleep(0.01)
+
+    # only the newest profiles are kept
+    stored = sorted(p.stem for p in tmp_path.glob('*.json'))
+    assert stored == sorted(profile_ids[1:])
+    profile = json.loads((tmp_path / f'{profile_ids[-1]}.json').read_text())
+    assert profile['request']['route'] == '/json'
+    assert profile['request']['status'] == 200
+
+    response = client.get('/profiles', params={'route': '/json', 'limit': 5})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary['n_profiles'] == 2
+    assert len(summary['top_functions']) <= 5
+    RequestProfiler.config_profiling(None)
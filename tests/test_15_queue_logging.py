@@ -0,0 +1,109 @@
+"""A pytest module for testing queued, structured, and sampled logging."""
+import json
+import logging
+import sys
+import threading
+import time
+import pytest
+from catalog_to_xpublish.log import (
+    APILogging,
+    JSONFormatter,
+    RateLimitFilter,
+)
+
+
+class ListHandler(logging.Handler):
+    """A handler that stores formatted records and the thread that wrote them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(self.format(record))
+        self.threads.append(threading.current_thread().name)
+
+
+@pytest.fixture(autouse=True)
+def reset_logging() -> None:
+    """Restore the default logging config after each test."""
+    yield
+    APILogging.config_logger()
+
+
+def test_queue_logging() -> None:
+    """Test that records are formatted and written on the listener thread."""
+    handler = ListHandler()
+    APILogging.config_logger({
+        'stream_handler': handler,
+        'use_queue': True,
+        'json_format': True,
+    })
+    assert APILogging.LISTENER is not None
+
+    args = {'n': 1}
+    logging.getLogger('queue_test').info('args=%s', args, extra={'route': '/json'})
+    # args are merged in the calling thread
+    args['n'] = 2
+    APILogging.stop_listener()
+
+    assert len(handler.messages) == 1
+    assert handler.threads[0] != threading.current_thread().name
+    record = json.loads(handler.messages[0])
+    assert record['message'] == "args={'n': 1}"
+    assert record['level'] == 'INFO'
+    assert record['route'] == '/json'
+
+
+def test_json_formatter_exceptions() -> None:
+    """Test that exceptions are included in JSON records."""
+    try:
+        raise ValueError('bad')
+    except ValueError:
+        record = logging.getLogger('json_test').makeRecord(
+            'json_test', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info(),
+        )
+    out = json.loads(JSONFormatter().format(record))
+    assert out['message'] == 'failed'
+    assert 'ValueError: bad' in out['exc_info']
+
+
+def test_sampling_keeps_warnings() -> None:
+    """Test that sampling drops INFO records but never warnings."""
+    handler = ListHandler()
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    APILogging.config_logger({
+        'stream_handler': handler,
+        'sample_rate': 1e-9,
+    })
+    logger = logging.getLogger('sample_test')
+    for _ in range(100):
+        logger.info('dropped')
+    logger.warning('kept')
+    assert handler.messages == ['WARNING kept']
+
+
+def test_rate_limit() -> None:
+    """Test that rate limited records are counted on the next record."""
+    log_filter = RateLimitFilter(rate_limit=5)
+    logger = logging.getLogger('rate_test')
+
+    def record():
+        return logger.makeRecord('rate_test', logging.INFO, __file__, 1, 'm', (), None)
+
+    passed = [log_filter.filter(record()) for _ in range(20)]
+    assert sum(passed) == 5
+
+    time.sleep(0.25)
+    next_record = record()
+    assert log_filter.filter(next_record)
+    assert next_record.suppressed == 15
+
+
+def test_config_validation() -> None:
+    """Test that bad rates are rejected."""
+    with pytest.raises(ValueError):
+        APILogging.config_logger({'sample_rate': 2})
+    with pytest.raises(ValueError):
+        APILogging.config_logger({'rate_limit': 0})
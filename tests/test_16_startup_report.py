@@ -0,0 +1,76 @@
+"""A pytest module for testing the create_app() startup report."""
+import catalog_to_xpublish
+import pytest
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def test_slowest_fetches() -> None:
+    """Test that only the slowest N fetches are kept (slowest first)."""
+    StartupReport.config_startup({'slowest_n': 2})
+    for seconds, path in [(0.1, '/a'), (0.3, '/b'), (0.2, '/c')]:
+        StartupReport.record_fetch('catalog', path, seconds)
+
+    values = list(StartupReport.timed([1, 2], 'item', lambda value: f'/{value}'))
+    assert values == [1, 2]
+
+    report = StartupReport.report()
+    assert [f['path'] for f in report['slowest_fetches']] == ['/b', '/c']
+    assert 'import catalog_to_xpublish.server_functions' in report['imports_seconds']
+
+
+def test_config_validation() -> None:
+    """Test that bad startup report configs raise errors."""
+    with pytest.raises(ValueError):
+        StartupReport.config_startup({'slowest_n': -1})
+
+
+def test_startup_endpoint(catalog_path: Path) -> None:
+    """Test the stage timings and endpoint counts of a live app."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_startup_dict={'slowest_n': 3, 'time_openapi': True},
+    )
+    response = TestClient(app).get('/startup')
+    assert response.status_code == 200
+    report = response.json()
+
+    for stage in ['configure', 'parse catalog', 'build xpublish apps', 'generate openapi']:
+        assert stage in report['stages_seconds']
+    assert len(report['slowest_fetches']) == 3
+    assert report['endpoints']['catalog_endpoints'] == 3
+    assert 'import stac implementation' in report['imports_seconds']
+    assert report['endpoints']['xpublish_apps'] == 2
+    assert report['endpoints']['datasets'] == 4
+    assert report['peak_rss_mb'] > 0
+
+
+def test_startup_disabled(catalog_path: Path) -> None:
+    """Test that the endpoint can be turned off."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_startup_dict={'enabled': False},
+    )
+    assert TestClient(app).get('/startup').status_code == 404
+    assert 'generate openapi' not in StartupReport.STAGES
+    StartupReport.config_startup()
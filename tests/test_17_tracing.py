@@ -0,0 +1,149 @@
+"""A pytest module for testing tracing spans and the OTLP/JSON file exporter."""
+import json
+import catalog_to_xpublish
+import dask.array
+import fsspec
+import pytest
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.tracing import (
+    Tracer,
+)
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+@pytest.fixture(autouse=True)
+def disable_tracing() -> None:
+    """Disable tracing after each test."""
+    yield
+    Tracer.config_tracing(None)
+
+
+def read_spans(trace_file: Path) -> dict:
+    """Returns the exported spans by name."""
+    Tracer.close()
+    spans = {}
+    for line in trace_file.read_text().splitlines():
+        request = json.loads(line)
+        resource_spans = request['resourceSpans'][0]
+        assert resource_spans['resource']['attributes'][0]['key'] == 'service.name'
+        for span in resource_spans['scopeSpans'][0]['spans']:
+            span['attributes'] = {
+                a['key']: list(a['value'].values())[0] for a in span['attributes']
+            }
+            spans[span['name']] = span
+    return spans
+
+
+def test_nested_spans(tmp_path: Path) -> None:
+    """Test parent/child spans, errors, and context propagation into dask tasks."""
+    trace_file = tmp_path / 'traces.jsonl'
+    Tracer.config_tracing({'trace_file': trace_file})
+
+    def task_trace_id(block):
+        return block + len(Tracer.current_span().trace_id)
+
+    with Tracer.span('parent', answer=42) as parent:
+        with Tracer.span('child'):
+            pass
+        with pytest.raises(ValueError):
+            with Tracer.span('failed'):
+                raise ValueError('bad')
+        # dask tasks run in the submitting context
+        out = dask.array.zeros(4, chunks=2).map_blocks(task_trace_id).compute()
+        assert (out == 32).all()
+        trace_id = parent.trace_id
+
+    spans = read_spans(trace_file)
+    assert spans['parent']['traceId'] == trace_id
+    assert spans['parent']['attributes']['answer'] == '42'
+    assert spans['child']['traceId'] == trace_id
+    assert spans['child']['parentSpanId'] == spans['parent']['spanId']
+    assert 'parentSpanId' not in spans['parent']
+    assert spans['failed']['status']['code'] == 2
+    assert int(spans['parent']['endTimeUnixNano']) >= int(spans['child']['endTimeUnixNano'])
+
+
+def test_sampling(tmp_path: Path) -> None:
+    """Test that unsampled traces are not exported (incl. their children)."""
+    trace_file = tmp_path / 'traces.jsonl'
+    Tracer.config_tracing({'trace_file': trace_file, 'sample_rate': 0.0})
+    with Tracer.span('parent'):
+        with Tracer.span('child'):
+            pass
+    Tracer.close()
+    assert not trace_file.exists()
+
+
+def test_fsspec_spans(tmp_path: Path) -> None:
+    """Test that filesystem reads are recorded as client spans."""
+    trace_file = tmp_path / 'traces.jsonl'
+    Tracer.config_tracing({'trace_file': trace_file})
+    fs = Tracer.instrument_filesystem(
+        fsspec.filesystem('memory', skip_instance_cache=True),
+        'memory',
+    )
+    fs.pipe_file('/tracing_test', b'1234')
+    with Tracer.span('read'):
+        assert fs.cat_file('/tracing_test', start=1) == b'234'
+
+    spans = read_spans(trace_file)
+    assert spans['fsspec.cat_file']['parentSpanId'] == spans['read']['spanId']
+    assert spans['fsspec.cat_file']['kind'] == 3
+    assert spans['fsspec.cat_file']['attributes']['fsspec.path'] == '/tracing_test'
+    assert spans['fsspec.cat_file']['attributes']['fsspec.bytes'] == '3'
+
+    # failed reads are recorded (and raised), and filesystems are only instrumented once
+    assert Tracer.instrument_filesystem(fs, 'memory') is fs
+    Tracer.config_tracing({'trace_file': tmp_path / 'errors.jsonl'})
+    with pytest.raises(FileNotFoundError):
+        fs.cat_file('/missing')
+    spans = read_spans(tmp_path / 'errors.jsonl')
+    assert spans['fsspec.cat_file']['status']['code'] == 2
+    Tracer.config_tracing(None)
+
+
+def test_config_validation(tmp_path: Path) -> None:
+    """Test that bad tracing configs raise errors."""
+    with pytest.raises(ValueError):
+        Tracer.config_tracing({'exporter': 'zipkin'})
+    with pytest.raises(ValueError):
+        Tracer.config_tracing({'trace_file': tmp_path / 'traces.jsonl', 'sample_rate': 2})
+    with pytest.raises(ValueError):
+        Tracer.config_tracing({'trace_file': tmp_path / 'not_a_dir' / 'traces.jsonl'})
+    assert not Tracer.ENABLED
+
+
+def test_request_spans(
+    catalog_path: Path,
+    tmp_path: Path,
+) -> None:
+    """Test the crawl and server spans of a live app."""
+    trace_file = tmp_path / 'traces.jsonl'
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_tracing_dict={'trace_file': trace_file, 'service_name': 'test'},
+    )
+    assert TestClient(app).get('/json').status_code == 200
+
+    spans = read_spans(trace_file)
+    assert spans['parse_catalog']['attributes']['catalog.path'] == '/'
+    server_span = spans['GET /json']
+    assert server_span['kind'] == 2
+    assert server_span['attributes']['http.route'] == '/json'
+    assert server_span['attributes']['http.response.status_code'] == '200'
@@ -0,0 +1,165 @@
+"""A pytest module for testing remote I/O accounting against a local HTTP stand-in."""
+import functools
+import threading
+import catalog_to_xpublish
+import dask
+import numpy as np
+import pystac
+import pytest
+import xarray as xr
+import yaml
+from datetime import datetime
+from fastapi.testclient import TestClient
+from http.server import (
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from catalog_to_xpublish.compute import (
+    DaskCompute,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    """Serves a directory (like a bucket), counting GET requests."""
+    gets: int = 0
+
+    def do_GET(self) -> None:
+        CountingHandler.gets += 1
+        super().do_GET()
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+@pytest.fixture(scope='module')
+def data_url(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Serves a chunked zarr store over HTTP, returning its URL."""
+    data_dir: Path = tmp_path_factory.mktemp('bucket')
+    xr.Dataset(
+        data_vars={'temp': (('time', 'x'), np.arange(40.0).reshape(4, 10))},
+        coords={'time': np.arange(4), 'x': np.arange(10)},
+    ).chunk({'time': 2, 'x': 5}).to_zarr(data_dir / 'test.zarr', consolidated=True)
+
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(CountingHandler, directory=str(data_dir)),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/test.zarr'
+    server.shutdown()
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(
+    data_url: str,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Path:
+    """Writes a STAC catalog w/ a collection pointing at the HTTP zarr store."""
+    catalog_dir: Path = tmp_path_factory.mktemp('stac')
+    catalog = pystac.Catalog(id='io-catalog', description='A remote I/O test catalog.')
+    collection = pystac.Collection(
+        id='http-collection',
+        description='A collection served over HTTP.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'test',
+        pystac.Asset(
+            href=data_url,
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True, 'chunks': {}},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    catalog.add_child(collection)
+    catalog.normalize_hrefs(str(catalog_dir))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return catalog_dir / 'catalog.json'
+
+
+@pytest.fixture(scope='module')
+def intake_catalog_path(
+    data_url: str,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Path:
+    """Writes an intake catalog w/ a zarr source pointing at the HTTP zarr store."""
+    catalog_path: Path = tmp_path_factory.mktemp('intake') / 'catalog.yaml'
+    catalog_path.write_text(yaml.safe_dump({
+        'sources': {
+            'test': {
+                'driver': 'zarr',
+                'args': {'urlpath': data_url, 'consolidated': True},
+            },
+        },
+    }))
+    return catalog_path
+
+
+def test_stac_io_accounting(stac_catalog_path: Path) -> None:
+    """Test that dataset opens and chunk requests are attributed to their dataset."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_metrics_dict={'account_dask_io': True},
+    )
+    assert dask.config.get('pool') is DaskCompute.CONTEXT_POOL
+    client = TestClient(app)
+    gets_before: int = CountingHandler.gets
+    labels = {'endpoint': '/http-collection', 'dataset': 'test'}
+
+    # the first request opens the dataset, then reads its chunks (in dask tasks)
+    response = client.get('/http-collection/datasets/test/reduce/mean')
+    assert response.status_code == 200
+    open_requests = Metrics.REMOTE_REQUESTS.get(source='open', **labels)
+    assert open_requests > 0
+    assert Metrics.REMOTE_BYTES.get(source='open', **labels) > 0
+    request_requests = Metrics.REMOTE_REQUESTS.get(source='request', **labels)
+    assert request_requests >= open_requests + 4
+
+    # request totals include the dataset open, and account for every GET
+    assert request_requests == CountingHandler.gets - gets_before
+    metrics_text: str = client.get('/metrics').text
+    assert (
+        'catalog_to_xpublish_remote_requests_total'
+        '{dataset="test",endpoint="/http-collection",source="request"}'
+    ) in metrics_text
+    assert 'route="/http-collection/datasets/{dataset_id}/reduce/{operation}"' in metrics_text
+
+
+def test_intake_io_accounting(intake_catalog_path: Path) -> None:
+    """Test that reads from filesystems created by intake drivers are counted."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=intake_catalog_path,
+        catalog_type='intake',
+    )
+    client = TestClient(app)
+    response = client.get('/datasets/test/reduce/max')
+    assert response.status_code == 200
+    assert Metrics.REMOTE_REQUESTS.get(endpoint='/', dataset='test', source='open') > 0
+
+
+def test_dask_pool_opt_in(stac_catalog_path: Path) -> None:
+    """Test that dask's pool is only replaced when dask I/O accounting is enabled."""
+    catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_metrics_dict={'account_dask_io': True},
+    )
+    assert dask.config.get('pool') is DaskCompute.CONTEXT_POOL
+
+    # a later app w/o it restores dask's own pools
+    catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+    )
+    assert dask.config.get('pool', None) is None
@@ -0,0 +1,144 @@
+"""A pytest module for testing admission control and load shedding."""
+import asyncio
+import catalog_to_xpublish
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.admission import (
+    AdmissionControl,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    ConcurrencyLimiter,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def test_concurrency_limiter() -> None:
+    """Test queueing, FIFO hand over, full queues and timeouts."""
+
+    async def run() -> None:
+        limiter = ConcurrencyLimiter(limit=1, max_queue=1)
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        with pytest.raises(AdmissionRejected) as e:
+            await limiter.acquire()
+        assert e.value.reason == 'queue_full'
+
+        # the slot is handed to the waiter
+        limiter.release()
+        await waiting
+        assert limiter.active == 1 and limiter.queued == 0
+
+        with pytest.raises(AdmissionRejected) as e:
+            await limiter.acquire(timeout=0.01)
+        assert e.value.reason == 'timeout'
+        assert limiter.queued == 0
+
+        limiter.release()
+        assert limiter.idle
+
+    asyncio.run(run())
+
+
+def test_config_validation() -> None:
+    """Test that bad admission configs raise errors."""
+    with pytest.raises(ValueError):
+        AdmissionControl.config_admission({'max_concurrency': 0})
+    with pytest.raises(ValueError):
+        AdmissionControl.config_admission({'dataset_queue': -1})
+    with pytest.raises(ValueError):
+        AdmissionControl.config_admission({'queue_timeout': 0})
+    AdmissionControl.config_admission({'max_queue': 5})
+    assert not AdmissionControl.ENABLED
+    AdmissionControl.config_admission(None)
+    assert not AdmissionControl.ENABLED
+
+
+def test_load_shedding() -> None:
+    """Test that a hot dataset is limited and shed w/o blocking other datasets."""
+    Metrics.config_metrics()
+    AdmissionControl.config_admission({
+        'max_concurrency': 10,
+        'dataset_concurrency': 1,
+        'dataset_queue': 1,
+        'retry_after': 5,
+    })
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send) -> None:
+        await release.wait()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=AdmissionMiddleware(slow_app))
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            url = '/collection/datasets/hot/zarr/var/0.0'
+            in_flight = asyncio.create_task(client.get(url))
+            queued = asyncio.create_task(client.get(url))
+            other = asyncio.create_task(client.get('/collection/datasets/cold/zarr/var/0.0'))
+            await asyncio.sleep(0.05)
+            assert Metrics.ADMISSION_QUEUE_DEPTH.get(scope='dataset') == 1
+            assert Metrics.ADMISSION_ACTIVE.get(scope='global') == 2
+
+            rejected = await client.get(url)
+            assert rejected.status_code == 429
+            assert rejected.headers['retry-after'] == '5'
+
+            release.set()
+            for task in [in_flight, queued, other]:
+                assert (await task).status_code == 200
+
+    asyncio.run(run())
+    assert Metrics.ADMISSION_REJECTIONS.get(
+        scope='dataset',
+        reason='queue_full',
+        endpoint='/collection',
+        dataset='hot',
+    ) == 1
+    assert Metrics.ADMISSION_ACTIVE.get(scope='global') == 0
+    assert AdmissionControl._LIMITERS.keys() == {('global', '')}
+    AdmissionControl.config_admission(None)
+
+
+def test_global_limit(catalog_path: Path) -> None:
+    """Test global shedding (503) and exempt paths in a served app."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_admission_dict={'max_concurrency': 1, 'max_queue': 0},
+    )
+    client = TestClient(app)
+    assert client.get('/json').status_code == 200
+
+    # occupy the only slot
+    asyncio.run(AdmissionControl.admit('/json'))
+    response = client.get('/json')
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    assert 'catalog_to_xpublish_admission_rejections_total{' in metrics.text
+    AdmissionControl.config_admission(None)
@@ -0,0 +1,195 @@
+"""A pytest module for testing deadlines and cancellation of remote reads."""
+import asyncio
+import functools
+import threading
+import time
+import catalog_to_xpublish
+import numpy as np
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from http.server import (
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.deadlines import (
+    CancelToken,
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    Deadlines,
+    RequestCancelled,
+)
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    """Serves a directory (like a bucket), stalling GETs of paths containing SLOW_PATH."""
+    DELAY: float = 0.0
+    SLOW_PATH: str = ''
+
+    def do_GET(self) -> None:
+        if SlowHandler.DELAY and SlowHandler.SLOW_PATH in self.path:
+            time.sleep(SlowHandler.DELAY)
+        super().do_GET()
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Serves a chunked zarr store over HTTP, returning a STAC catalog pointing at it."""
+    data_dir: Path = tmp_path_factory.mktemp('bucket')
+    xr.Dataset(
+        data_vars={'temp': (('time', 'x'), np.arange(40.0).reshape(4, 10))},
+        coords={'time': np.arange(4), 'x': np.arange(10)},
+    ).chunk({'time': 2, 'x': 5}).to_zarr(data_dir / 'test.zarr', consolidated=True)
+
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(SlowHandler, directory=str(data_dir)),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    catalog_dir: Path = tmp_path_factory.mktemp('stac')
+    catalog = pystac.Catalog(id='deadline-catalog', description='A deadline test catalog.')
+    collection = pystac.Collection(
+        id='slow-collection',
+        description='A collection served over a slow HTTP server.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'test',
+        pystac.Asset(
+            href=f'http://127.0.0.1:{server.server_address[1]}/test.zarr',
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True, 'chunks': {}},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    catalog.add_child(collection)
+    catalog.normalize_hrefs(str(catalog_dir))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    yield catalog_dir / 'catalog.json'
+    server.shutdown()
+    Deadlines.config_deadlines(None)
+
+
+def test_cancel_token() -> None:
+    """Test that in flight coroutines are aborted at deadlines and on cancellation."""
+
+    async def run() -> None:
+        token = CancelToken(deadline=time.monotonic() + 0.05)
+        with pytest.raises(DeadlineExceeded):
+            await token.run(asyncio.sleep(10))
+
+        token = CancelToken()
+        child = CancelToken(deadline=None, parent=token)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, threading.Thread(target=token.cancel, args=('test',)).start)
+        start = time.perf_counter()
+        with pytest.raises(RequestCancelled):
+            await child.run(asyncio.sleep(10))
+        assert time.perf_counter() - start < 5
+        with pytest.raises(RequestCancelled):
+            child.check()
+
+    asyncio.run(run())
+
+
+def test_config_validation() -> None:
+    """Test that bad deadline configs raise errors."""
+    with pytest.raises(ValueError):
+        Deadlines.config_deadlines({'open_timeout': 0})
+    with pytest.raises(ValueError):
+        Deadlines.config_deadlines({'read_timeout': 'soon'})
+    Deadlines.config_deadlines(None)
+    assert not Deadlines.ENABLED
+
+
+def test_disconnect_cancels_reads() -> None:
+    """Test that a client disconnect cancels the request's in flight reads."""
+    Deadlines.config_deadlines({})
+    outcome = []
+
+    async def app(scope, receive, send) -> None:
+        try:
+            await Deadlines.current().run(asyncio.sleep(10))
+        except RequestCancelled as e:
+            outcome.append(str(e))
+
+    async def run() -> None:
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(0.05)
+            return {'type': 'http.disconnect'}
+
+        async def send(message) -> None:
+            return None
+
+        await asyncio.wait_for(
+            DeadlineMiddleware(app)({'type': 'http', 'path': '/'}, receive, send),
+            timeout=5,
+        )
+
+    asyncio.run(run())
+    assert outcome == ['client disconnected']
+    Deadlines.config_deadlines(None)
+
+
+def test_open_timeout(stac_catalog_path: Path) -> None:
+    """Test that a stalled dataset open returns a 504 and isn't cached."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_deadline_dict={'open_timeout': 0.3},
+    )
+    client = TestClient(app)
+    url = '/slow-collection/datasets/test/reduce/mean'
+
+    SlowHandler.DELAY, SlowHandler.SLOW_PATH = 2.0, '.zmetadata'
+    start = time.perf_counter()
+    response = client.get(url)
+    assert response.status_code == 504
+    assert time.perf_counter() - start < 1.5
+    assert len(DatasetCache.DATASETS) == 0
+
+    # the failed open didn't poison the cache
+    SlowHandler.DELAY = 0.0
+    response = client.get(url)
+    assert response.status_code == 200
+    assert len(DatasetCache.DATASETS) == 1
+
+
+def test_read_timeout(stac_catalog_path: Path) -> None:
+    """Test that stalled chunk reads return a 504 (not fill values)."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_deadline_dict={'read_timeout': 0.5},
+    )
+    client = TestClient(app)
+
+    SlowHandler.DELAY, SlowHandler.SLOW_PATH = 2.0, '/temp/'
+    response = client.get('/slow-collection/datasets/test/reduce/max')
+    assert response.status_code == 504
+    assert len(DatasetCache.DATASETS) == 1
+    assert len(DatasetCache.RESULTS) == 0
+
+    SlowHandler.DELAY = 0.0
+    response = client.get('/slow-collection/datasets/test/reduce/max')
+    assert response.status_code == 200
@@ -0,0 +1,67 @@
+"""A pytest module for testing lazy catalog implementation registration."""
+import json
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+from catalog_to_xpublish import (
+    CatalogImplementationFactory,
+)
+
+
+def imported_modules(code: str) -> list:
+    """Runs code in a fresh interpreter, returns which of intake/pystac it imported."""
+    output: str = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            f'{code}\nimport json, sys\n'
+            'print(json.dumps([m for m in ["intake", "pystac"] if m in sys.modules]))',
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_lazy_imports() -> None:
+    """Test that only the requested catalog type's dependencies are imported."""
+    assert imported_modules('import catalog_to_xpublish') == []
+    assert imported_modules(
+        'import catalog_to_xpublish\n'
+        'catalog_to_xpublish.CatalogImplementationFactory.get_catalog_implementation("stac")',
+    ) == ['pystac']
+    assert imported_modules(
+        'from catalog_to_xpublish.searchers import IntakeCatalogSearch',
+    ) == ['intake']
+
+
+def test_register_lazy(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a registered module is only imported once its catalog type is requested."""
+    (tmp_path / 'dummy_catalog.py').write_text(
+        'from catalog_to_xpublish.factory import (\n'
+        '    CatalogImplementationFactory,\n'
+        '    CatalogIOClass,\n'
+        '    CatalogRouterClass,\n'
+        '    CatalogSearcherClass,\n'
+        ')\n'
+        'stac = CatalogImplementationFactory.get_catalog_implementation("stac")\n'
+        'CatalogSearcherClass(type("DummySearch", (stac.catalog_search,), {"catalog_type": "dummy"}))\n'
+        'CatalogIOClass(type("DummyIO", (stac.catalog_to_xarray,), {"catalog_type": "dummy"}))\n'
+        'CatalogRouterClass(type("DummyRouter", (stac.catalog_router,), {"catalog_type": "dummy"}))\n'
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    CatalogImplementationFactory.register_lazy('dummy', ['dummy_catalog'])
+    assert 'dummy' in CatalogImplementationFactory.get_catalog_types()
+    assert 'dummy_catalog' not in sys.modules
+
+    implementation = CatalogImplementationFactory.get_catalog_implementation('dummy')
+    assert 'dummy_catalog' in sys.modules
+    assert implementation.catalog_search.catalog_type == 'dummy'
+
+    with pytest.raises(KeyError):
+        CatalogImplementationFactory.get_catalog_implementation('not_a_catalog')
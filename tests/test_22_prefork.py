@@ -0,0 +1,105 @@
+"""A pytest module for testing the preforking server."""
+import multiprocessing
+import os
+import time
+import urllib.request
+import pytest
+from pathlib import Path
+from catalog_to_xpublish.serve import (
+    PreforkServer,
+    serve,
+)
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def run_prefork(
+    catalog_path: Path,
+    queue: multiprocessing.Queue,
+) -> None:
+    """Builds the app once, forks 2 workers, and reports their pids and responses."""
+    import catalog_to_xpublish
+
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+    )
+    server = PreforkServer(app, workers=2, port=0, uvicorn_kwargs={'log_level': 'warning'})
+    server.start()
+    try:
+        statuses = []
+        for _ in range(4):
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/json') as response:
+                statuses.append(response.status)
+        queue.put((os.getpid(), statuses, list(server.pids)))
+    finally:
+        server.stop(timeout=10)
+        queue.put(server.pids)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires os.fork()')
+def test_prefork_server(catalog_path: Path) -> None:
+    """Test that forked workers serve the parent's app, and are stopped cleanly."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_prefork, args=(catalog_path, queue))
+    process.start()
+    try:
+        parent_pid, statuses, worker_pids = queue.get(timeout=120)
+        assert statuses == [200] * 4
+        assert len(worker_pids) == 2
+        assert parent_pid not in worker_pids
+        assert queue.get(timeout=30) == []
+    finally:
+        process.join(timeout=30)
+    assert process.exitcode == 0
+
+
+def test_prefork_validation(catalog_path: Path) -> None:
+    """Test that unsupported prefork configurations raise errors."""
+    with pytest.raises(ValueError):
+        serve(
+            catalog_path=catalog_path,
+            catalog_type='stac',
+            config_compute_dict={'scheduler': 'local'},
+        )
+    with pytest.raises(ValueError):
+        PreforkServer(app=None, workers=0)
+    with pytest.raises(ValueError):
+        PreforkServer(app=None, max_restarts=-1)
+
+
+def crash(ready_fd: int | None) -> None:
+    """A worker that fails at startup."""
+    raise RuntimeError('Startup failed.')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires os.fork()')
+def test_crash_loop() -> None:
+    """Test that crashing workers are replaced w/ a backoff, until the crash loop limit."""
+    server = PreforkServer(app=None, workers=1, restart_delay=0.05, max_restarts=2)
+    server._run_worker = crash
+    server._spawn()
+    start: float = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match='crashed 3 times'):
+            server.supervise()
+    finally:
+        server.stop(timeout=1)
+
+    # 2 replacements, after 0.05s and 0.1s
+    assert time.monotonic() - start >= 0.15
+    assert server.pids == []
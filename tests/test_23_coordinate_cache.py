@@ -0,0 +1,206 @@
+"""A pytest module for testing the shared memory mapped coordinate cache."""
+import catalog_to_xpublish
+import json
+import numpy as np
+import pandas as pd
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+)
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCache,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+
+
+def write_catalog(
+    data_dir: Path,
+    catalog_dir: Path,
+    consolidated: bool = True,
+) -> Path:
+    """Writes a zarr store w/ 1D time and 2D lat/lon coordinates, returns a STAC catalog."""
+    lat, lon = np.meshgrid(np.linspace(-90, 90, 8), np.linspace(-180, 180, 10), indexing='ij')
+    xr.Dataset(
+        data_vars={'temp': (('time', 'y', 'x'), np.arange(320.0).reshape(4, 8, 10))},
+        coords={
+            'time': pd.date_range('2020-01-01', periods=4),
+            'lat': (('y', 'x'), lat, {'units': 'degrees_north'}),
+            'lon': (('y', 'x'), lon, {'units': 'degrees_east'}),
+        },
+    ).to_zarr(data_dir / 'test.zarr', consolidated=consolidated)
+
+    catalog = pystac.Catalog(id='coordinate-catalog', description='A coordinate cache catalog.')
+    collection = pystac.Collection(
+        id='grid-collection',
+        description='A collection w/ a curvilinear grid.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'test',
+        pystac.Asset(
+            href=(data_dir / 'test.zarr').as_uri(),
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': consolidated, 'chunks': {}},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    catalog.add_child(collection)
+    catalog.normalize_hrefs(str(catalog_dir))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return catalog_dir / 'catalog.json'
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Returns a STAC catalog of a local zarr store."""
+    yield write_catalog(tmp_path_factory.mktemp('bucket'), tmp_path_factory.mktemp('stac'))
+    CoordinateCache.config_coordinate_cache(None)
+
+
+def is_memory_mapped(array: np.ndarray) -> bool:
+    """Returns whether an array is a view of a memory map."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def open_dataset(
+    catalog_path: Path,
+    cache_dir: Path,
+) -> xr.Dataset:
+    """Creates an app, opens its dataset via the reduce endpoint, and returns it."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_coordinate_cache_dict={'cache_dir': cache_dir, 'min_bytes': 0},
+    )
+    response = TestClient(app).get('/grid-collection/datasets/test/reduce/mean')
+    assert response.status_code == 200
+    return next(iter(DatasetCache.DATASETS._data.values()))[0]
+
+
+def test_config_validation() -> None:
+    """Test that bad coordinate cache configs raise errors."""
+    with pytest.raises(ValueError):
+        CoordinateCache.config_coordinate_cache({'min_bytes': -1})
+    with pytest.raises(ValueError):
+        CoordinateCache.config_coordinate_cache({'max_bytes': 'big'})
+    CoordinateCache.config_coordinate_cache(None)
+    assert not CoordinateCache.ENABLED
+
+
+def test_private_cache_dir(tmp_path: Path) -> None:
+    """Test that a cache directory writable by other users is refused."""
+    shared_dir: Path = tmp_path / 'shared'
+    shared_dir.mkdir()
+    shared_dir.chmod(0o777)
+    with pytest.raises(PermissionError):
+        CoordinateCache.config_coordinate_cache({'cache_dir': shared_dir})
+
+    private_dir: Path = tmp_path / 'private'
+    CoordinateCache.config_coordinate_cache({'cache_dir': private_dir})
+    assert private_dir.stat().st_mode & 0o777 == 0o700
+    CoordinateCache.config_coordinate_cache(None)
+
+
+def test_coordinate_cache(
+    stac_catalog_path: Path,
+    tmp_path: Path,
+) -> None:
+    """Test that coordinates are cached once, then read from memory maps (not the store)."""
+    ds = open_dataset(stac_catalog_path, tmp_path)
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='miss') == 1
+    version_dirs = [path for path in tmp_path.iterdir() if not path.name.startswith('.')]
+    assert len(version_dirs) == 1
+    assert len(list(version_dirs[0].glob('*.npy'))) == 3
+    # the manifest is plain JSON (never unpickled)
+    assert set(json.loads((version_dirs[0] / 'coordinates.json').read_text())) == {'time', 'lat', 'lon'}
+    expected = ds.coords.to_dataset()
+
+    # remove the coordinates from the store, they must now come from the cache
+    store: Path = Path(ds.attrs['url_path'].removeprefix('file://'))
+    for name in ['time', 'lat', 'lon']:
+        for chunk in (store / name).glob('[0-9]*'):
+            chunk.unlink()
+
+    ds = open_dataset(stac_catalog_path, tmp_path)
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='hit') == 1
+    xr.testing.assert_identical(ds.coords.to_dataset(), expected)
+    assert ds['lat'].attrs == {'units': 'degrees_north'}
+    assert 'units' in ds['time'].encoding
+    assert is_memory_mapped(ds['lat'].variable._data)
+    assert is_memory_mapped(ds.indexes['time'].values)
+
+
+def test_stale_coordinates(tmp_path: Path) -> None:
+    """Test that coordinates are re-cached once the store changes (under the same catalog entry)."""
+    catalog_path: Path = write_catalog(tmp_path / 'bucket', tmp_path / 'stac')
+    cache_dir: Path = tmp_path / 'cache'
+    assert open_dataset(catalog_path, cache_dir).sizes['time'] == 4
+
+    # append to the store's time dimension
+    xr.Dataset(
+        data_vars={'temp': (('time', 'y', 'x'), np.zeros((2, 8, 10)))},
+        coords={'time': pd.date_range('2020-01-05', periods=2)},
+    ).to_zarr(tmp_path / 'bucket' / 'test.zarr', append_dim='time', consolidated=True)
+
+    # its consolidated metadata changed, so it is a new cache key (each app resets the metrics)
+    ds = open_dataset(catalog_path, cache_dir)
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='miss') == 1
+    assert ds.sizes['time'] == 6 and str(ds['time'].values[-1])[:10] == '2020-01-06'
+    assert ds['lat'].shape == (8, 10)
+
+    # the re-cached coordinates are hits from now on
+    assert open_dataset(catalog_path, cache_dir).sizes['time'] == 6
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='hit') == 1
+
+    # rewrite the coordinate values w/o changing their size (i.e., a rolling time window)
+    xr.Dataset(
+        data_vars={'temp': (('time', 'y', 'x'), np.zeros((6, 8, 10)))},
+        coords={
+            'time': pd.date_range('2021-01-01', periods=6),
+            'lat': (('y', 'x'), np.zeros((8, 10)), {'units': 'degrees_north'}),
+            'lon': (('y', 'x'), np.zeros((8, 10)), {'units': 'degrees_east'}),
+        },
+    ).to_zarr(tmp_path / 'bucket' / 'test.zarr', mode='w', consolidated=True)
+    ds = open_dataset(catalog_path, cache_dir)
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='miss') == 1
+    assert str(ds['time'].values[0])[:10] == '2021-01-01'
+    assert float(np.abs(ds['lat']).max()) == 0
+    CoordinateCache.config_coordinate_cache(None)
+
+
+def test_unconsolidated_store(tmp_path: Path) -> None:
+    """Test that the coordinates of a store that can't be validated are not cached."""
+    catalog_path: Path = write_catalog(tmp_path / 'bucket', tmp_path / 'stac', consolidated=False)
+    cache_dir: Path = tmp_path / 'cache'
+
+    assert open_dataset(catalog_path, cache_dir).sizes['time'] == 4
+    assert Metrics.COORDINATE_CACHE_LOOKUPS.get(result='unvalidated') == 1
+    assert not list(cache_dir.iterdir())
+    CoordinateCache.config_coordinate_cache(None)
+
+
+def test_eviction(tmp_path: Path) -> None:
+    """Test that the least recently written dataset versions are removed beyond max_bytes."""
+    CoordinateCache.config_coordinate_cache({'cache_dir': tmp_path, 'max_bytes': 1000})
+    for version in ['old', 'new']:
+        (tmp_path / version).mkdir()
+        np.save(tmp_path / version / '0.npy', np.zeros(100))
+    CoordinateCache.evict(keep='new')
+    assert [path.name for path in tmp_path.iterdir()] == ['new']
+    CoordinateCache.config_coordinate_cache(None)
@@ -0,0 +1,168 @@
+"""A pytest module for testing the persistent dataset schema store."""
+import functools
+import threading
+import catalog_to_xpublish
+import fsspec
+import numpy as np
+import pandas as pd
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from http.server import (
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from catalog_to_xpublish.coordinate_cache import (
+    CoordinateCache,
+)
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from catalog_to_xpublish.schema_store import (
+    SchemaStore,
+)
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    """Serves a directory (like a bucket), recording each request's method and path."""
+    REQUESTS: list = []
+
+    def do_GET(self) -> None:
+        RecordingHandler.REQUESTS.append(('GET', self.path))
+        super().do_GET()
+
+    def do_HEAD(self) -> None:
+        RecordingHandler.REQUESTS.append(('HEAD', self.path))
+        super().do_HEAD()
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Returns the directory served over HTTP."""
+    return tmp_path_factory.mktemp('bucket')
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(
+    data_dir: Path,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Path:
+    """Serves a chunked zarr store over HTTP, returning a STAC catalog pointing at it."""
+    xr.Dataset(
+        data_vars={'temp': (('time', 'x'), np.arange(40.0).reshape(4, 10), {'units': 'K'})},
+        coords={'time': pd.date_range('2020-01-01', periods=4), 'x': np.arange(10)},
+    ).chunk({'time': 2, 'x': 5}).to_zarr(data_dir / 'test.zarr', consolidated=True)
+
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(RecordingHandler, directory=str(data_dir)),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    catalog_dir: Path = tmp_path_factory.mktemp('stac')
+    catalog = pystac.Catalog(id='schema-catalog', description='A schema store test catalog.')
+    collection = pystac.Collection(
+        id='http-collection',
+        description='A collection served over HTTP.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'test',
+        pystac.Asset(
+            href=f'http://127.0.0.1:{server.server_address[1]}/test.zarr',
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True, 'chunks': {}},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    catalog.add_child(collection)
+    catalog.normalize_hrefs(str(catalog_dir))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    yield catalog_dir / 'catalog.json'
+    server.shutdown()
+    SchemaStore.config_schema_store(None)
+    CoordinateCache.config_coordinate_cache(None)
+
+
+def reduce_dataset(
+    catalog_path: Path,
+    cache_dir: Path,
+) -> list:
+    """Creates a (cold) app, reduces its dataset, and returns the HTTP requests made."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        config_schema_store_dict={'path': cache_dir / 'schemas.sqlite'},
+        config_coordinate_cache_dict={'cache_dir': cache_dir / 'coordinates', 'min_bytes': 0},
+    )
+    RecordingHandler.REQUESTS = []
+    response = TestClient(app).get('/http-collection/datasets/test/reduce/max')
+    assert response.status_code == 200
+    assert response.json()['data_vars']['temp']['data'] == 39.0
+    return RecordingHandler.REQUESTS
+
+
+def test_config_validation() -> None:
+    """Test that bad schema store configs raise errors."""
+    with pytest.raises(ValueError):
+        SchemaStore.config_schema_store({'max_age': 0})
+    SchemaStore.config_schema_store(None)
+    assert not SchemaStore.ENABLED
+
+
+def test_unconsolidated_store(tmp_path: Path) -> None:
+    """Test that schemas of unconsolidated stores (w/o one validating key) are not stored."""
+    xr.Dataset(
+        data_vars={'temp': (('x',), np.arange(10.0))},
+    ).to_zarr(tmp_path / 'test.zarr', consolidated=False)
+    SchemaStore.config_schema_store({'path': tmp_path / 'cache' / 'schemas.sqlite'})
+    fs = fsspec.filesystem('file')
+    url: str = str(tmp_path / 'test.zarr')
+    assert SchemaStore.get_validator(url, fs) is None
+
+    unvalidated: float = Metrics.SCHEMA_STORE_LOOKUPS.get(result='unvalidated')
+    for _ in range(2):
+        store = SchemaStore.open_store(url, fs)
+        assert xr.open_zarr(store, consolidated=False)['temp'].shape == (10,)
+        SchemaStore.save(store)
+    assert Metrics.SCHEMA_STORE_LOOKUPS.get(result='unvalidated') == unvalidated + 2
+    SchemaStore.config_schema_store(None)
+
+
+def test_schema_store(
+    stac_catalog_path: Path,
+    data_dir: Path,
+    tmp_path: Path,
+) -> None:
+    """Test that restarts only validate the stored schema, then read data chunks."""
+    requests = reduce_dataset(stac_catalog_path, tmp_path)
+    assert ('GET', '/test.zarr/.zmetadata') in requests
+    assert Metrics.SCHEMA_STORE_LOOKUPS.get(result='miss') == 1
+
+    # a restarted server reads no metadata or coordinates, only the requested data
+    requests = reduce_dataset(stac_catalog_path, tmp_path)
+    assert Metrics.SCHEMA_STORE_LOOKUPS.get(result='hit') == 1
+    assert [request for request in requests if request[0] == 'HEAD'] == [
+        ('HEAD', '/test.zarr/.zmetadata'),
+    ]
+    gets = [path for method, path in requests if method == 'GET']
+    assert gets and all(path.startswith('/test.zarr/temp/') for path in gets)
+
+    # a changed source invalidates the stored schema
+    zmetadata: Path = data_dir / 'test.zarr' / '.zmetadata'
+    zmetadata.write_text(zmetadata.read_text() + '\n')
+    requests = reduce_dataset(stac_catalog_path, tmp_path)
+    assert Metrics.SCHEMA_STORE_LOOKUPS.get(result='stale') == 1
+    assert ('GET', '/test.zarr/.zmetadata') in requests
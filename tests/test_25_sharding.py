@@ -0,0 +1,159 @@
+"""A pytest module for testing catalog sharding and the shard gateway."""
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pystac
+import pytest
+from datetime import datetime
+from pathlib import Path
+from catalog_to_xpublish.factory import (
+    CatalogImplementationFactory,
+)
+from catalog_to_xpublish.sharding import (
+    ShardGateway,
+    Sharding,
+)
+
+N_COLLECTIONS: int = 6
+
+
+def make_collection(collection_id: str) -> pystac.Collection:
+    """Returns a collection w/ a (never opened) zarr asset."""
+    collection = pystac.Collection(
+        id=collection_id,
+        description='A sharded collection.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'data',
+        pystac.Asset(
+            href=f'file:///not/a/bucket/{collection_id}.zarr',
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr'},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    return collection
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Writes a STAC catalog w/ top level collections and a nested sub-catalog."""
+    catalog_dir: Path = tmp_path_factory.mktemp('stac')
+    catalog = pystac.Catalog(id='shard-catalog', description='A sharding test catalog.')
+    for i in range(N_COLLECTIONS):
+        catalog.add_child(make_collection(f'collection-{i}'))
+    nested = pystac.Catalog(id='nested', description='A nested sub-catalog.')
+    for i in range(2):
+        nested.add_child(make_collection(f'nested-{i}'))
+    catalog.add_child(nested)
+    catalog.normalize_hrefs(str(catalog_dir))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    yield catalog_dir / 'catalog.json'
+    Sharding.config_sharding(None)
+
+
+def served_paths(
+    catalog_path: Path,
+    config_dict: dict | None,
+) -> list:
+    """Crawls the catalog as a shard, returning the catalog paths it serves."""
+    Sharding.config_sharding(config_dict)
+    searcher = CatalogImplementationFactory.get_catalog_implementation('stac').catalog_search(
+        catalog_path=catalog_path,
+    )
+    Sharding.filter_endpoints(searcher.parse_catalog())
+    return Sharding.CATALOG_PATHS
+
+
+def test_config_validation() -> None:
+    """Test that bad sharding configs raise errors."""
+    with pytest.raises(ValueError):
+        Sharding.config_sharding({'shard_count': 2, 'shard_index': 2})
+    with pytest.raises(ValueError):
+        Sharding.config_sharding({'subtree': 'nested'})
+    with pytest.raises(ValueError):
+        Sharding.config_sharding({'shard_count': 0})
+    Sharding.config_sharding(None)
+    assert not Sharding.ENABLED
+
+
+def test_hash_partitions(stac_catalog_path: Path) -> None:
+    """Test that hash partitions are disjoint, cover the catalog, and keep subtrees together."""
+    all_paths = served_paths(stac_catalog_path, None)
+    assert len(all_paths) == N_COLLECTIONS + 4
+
+    shards = [
+        served_paths(stac_catalog_path, {'shard_count': 3, 'shard_index': i})
+        for i in range(3)
+    ]
+    assert sorted(sum(shards, [])) == all_paths
+    assert sum(bool(paths) for paths in shards) > 1
+    nested_shard = [paths for paths in shards if '/nested' in paths][0]
+    assert {'/nested/nested-0', '/nested/nested-1'} <= set(nested_shard)
+
+    # other shards' partitions are never crawled
+    Sharding.config_sharding({'shard_count': 3, 'shard_index': 0})
+    for path in all_paths:
+        if path != '/':
+            assert Sharding.should_crawl(path) == Sharding.serves(path)
+
+
+def test_subtree(stac_catalog_path: Path) -> None:
+    """Test that a subtree shard only serves (and crawls) its subtree."""
+    paths = served_paths(stac_catalog_path, {'subtree': '/nested'})
+    assert paths == ['/nested', '/nested/nested-0', '/nested/nested-1']
+    assert Sharding.should_crawl('/nested')
+    assert not Sharding.should_crawl('/collection-0')
+
+
+def test_gateway_resolve() -> None:
+    """Test that request paths are routed by their longest catalog path."""
+    gateway = ShardGateway(['http://shard-0', 'http://shard-1'])
+    gateway.routes = {'/': 'http://shard-0', '/nested/nested-0': 'http://shard-1'}
+    assert gateway.resolve('/nested/nested-0/datasets/data/zarr/.zmetadata') == 'http://shard-1'
+    assert gateway.resolve('/nested/nested-0') == 'http://shard-1'
+    assert gateway.resolve('/nested/catalogs') == 'http://shard-0'
+    gateway.routes = {'/collection-0': 'http://shard-0'}
+    assert gateway.resolve('/json') is None
+
+
+def test_local_shards(stac_catalog_path: Path) -> None:
+    """Test a local gateway + shard processes setup end to end."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'catalog_to_xpublish.sharding', str(stac_catalog_path),
+            '--shards', '2', '--port', str(port),
+        ],
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                routes = httpx.get(f'{base_url}/shards').json()
+                break
+            except httpx.HTTPError:
+                assert time.monotonic() < deadline and process.poll() is None
+                time.sleep(0.5)
+
+        assert len(routes['catalog_paths']) == N_COLLECTIONS + 4
+        assert len(set(routes['catalog_paths'].values())) == 2
+        for catalog_path in routes['catalog_paths']:
+            response = httpx.get(f'{base_url}{catalog_path.rstrip("/")}/json')
+            assert response.status_code == 200
+        assert httpx.get(f'{base_url}/collection-0/datasets').json() == ['data']
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=60)
@@ -0,0 +1,156 @@
+"""A pytest module for testing federated (multi-catalog) serving from one app."""
+import catalog_to_xpublish
+import numpy as np
+import pandas as pd
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.admission import (
+    AdmissionControl,
+)
+from catalog_to_xpublish.cache import (
+    DatasetCache,
+    LRUCache,
+)
+from catalog_to_xpublish.federation import (
+    Federation,
+)
+
+
+@pytest.fixture(scope='module')
+def catalogs(tmp_path_factory: pytest.TempPathFactory) -> dict:
+    """Writes a local zarr store, and a STAC and an intake catalog pointing at it."""
+    data_dir: Path = tmp_path_factory.mktemp('federation')
+    zarr_path: Path = data_dir / 'test.zarr'
+    xr.Dataset(
+        data_vars={'temp': (('time', 'x'), np.arange(40.0).reshape(4, 10), {'units': 'K'})},
+        coords={'time': pd.date_range('2020-01-01', periods=4), 'x': np.arange(10)},
+    ).to_zarr(zarr_path, consolidated=True)
+
+    catalog = pystac.Catalog(id='stac-catalog', description='A federated STAC catalog.')
+    collection = pystac.Collection(
+        id='collection',
+        description='A local collection.',
+        extent=pystac.Extent(
+            pystac.SpatialExtent([[-180, -90, 180, 90]]),
+            pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+        ),
+    )
+    collection.add_asset(
+        'test',
+        pystac.Asset(
+            href=f'file://{zarr_path}',
+            media_type='application/vnd+zarr',
+            extra_fields={
+                'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True},
+                'xarray:storage_options': {},
+            },
+        ),
+    )
+    catalog.add_child(collection)
+    catalog.normalize_hrefs(str(data_dir / 'stac'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+
+    intake_path: Path = data_dir / 'intake_catalog.yaml'
+    intake_path.write_text(
+        'sources:\n'
+        '  test:\n'
+        '    driver: zarr\n'
+        '    description: A local zarr store.\n'
+        '    args:\n'
+        f'      urlpath: {zarr_path}\n'
+        '      consolidated: true\n',
+    )
+    yield {
+        '/stac': {
+            'catalog_path': data_dir / 'stac' / 'catalog.json',
+            'catalog_type': 'stac',
+            'max_concurrency': 2,
+            'max_result_bytes': 100,
+        },
+        '/intake': {
+            'catalog_path': intake_path,
+            'catalog_type': 'intake',
+            'max_datasets': 1,
+        },
+    }
+    Federation.config_federation(None)
+    AdmissionControl.config_admission(None)
+
+
+def test_config_validation(catalogs: dict) -> None:
+    """Test that bad federation configs raise errors."""
+    for bad_catalogs in [
+        {},
+        {'stac': catalogs['/stac']},
+        {'/stac/': catalogs['/stac']},
+        {'/a': catalogs['/stac'], '/a/b': catalogs['/intake']},
+        {'/stac': {'catalog_path': 'catalog.json'}},
+        {'/stac': {**catalogs['/stac'], 'max_datasets': -1}},
+    ]:
+        with pytest.raises(ValueError):
+            Federation.config_federation(bad_catalogs)
+    with pytest.raises(ValueError):
+        catalog_to_xpublish.create_app(
+            catalog_path=catalogs['/stac']['catalog_path'],
+            catalog_type='stac',
+            catalogs=catalogs,
+        )
+
+
+def test_group_quotas() -> None:
+    """Test that a group over its quota evicts its own values, not others'."""
+    cache = LRUCache(4, sizeof=len)
+    cache.quotas = {'a': 2}
+    cache.put(1, 'x', group='a')
+    cache.put(2, 'x', group='b')
+    cache.put(3, 'x', group='a')
+    cache.put(4, 'x', group='a')
+    assert 1 not in cache and all(key in cache for key in [2, 3, 4])
+    assert cache.group_sizes == {'a': 2, 'b': 1}
+
+    # values larger than their group's quota are not stored
+    assert not cache.put(5, 'xxx', group='a')
+    assert cache.put(5, 'xxx', group='b')
+    assert cache.pop(5) == 'xxx' and cache.group_sizes == {'a': 1, 'b': 0}
+
+
+def test_federated_app(catalogs: dict) -> None:
+    """Test that STAC and intake catalogs are served (and cached) from one app."""
+    app = catalog_to_xpublish.create_app(catalogs=catalogs)
+    client = TestClient(app)
+    assert app.title == 'Catalog_Xpublish_Federation'
+    assert sorted(client.get('/catalogs').json()) == ['intake', 'stac']
+    assert client.get('/stac/catalogs').json() == ['collection']
+    assert client.get('/stac/collection/datasets').json() == ['test']
+    assert client.get('/intake/datasets').json() == ['test']
+
+    for path in ['/stac/collection', '/intake']:
+        response = client.get(f'{path}/datasets/test/reduce/max')
+        assert response.status_code == 200
+        assert response.json()['data_vars']['temp']['data'] == 39.0
+
+    # both catalogs share the dataset cache w/o collisions, each counted against its catalog
+    assert DatasetCache.DATASETS.group_sizes == {'/stac': 1, '/intake': 1}
+    # the STAC catalog's result quota still fits a scalar result
+    assert DatasetCache.RESULTS.group_sizes['/stac'] <= 100
+
+    # the STAC catalog's concurrency quota is enforced by admission control
+    assert AdmissionControl.ENABLED
+    assert ('catalog', '/stac') in AdmissionControl.get_limiter_keys('/stac/collection/datasets/test/zarr')
+    assert AdmissionControl.get_limiter_keys('/intake/datasets/test/zarr') == []
+
+
+@pytest.mark.parametrize('shared_xpublish_app', [False, True])
+def test_federated_app_title(catalogs: dict, shared_xpublish_app: bool) -> None:
+    """Test that a federated app is titled by app_name, not by one of its catalogs."""
+    app = catalog_to_xpublish.create_app(
+        catalogs=catalogs,
+        app_name='Federated Server',
+        shared_xpublish_app=shared_xpublish_app,
+    )
+    assert app.title == 'Federated Server'
+    assert TestClient(app).get('/openapi.json').json()['info']['title'] == 'Federated Server'
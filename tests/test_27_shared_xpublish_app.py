@@ -0,0 +1,90 @@
+"""A pytest module for testing the shared (single) xpublish app mode."""
+import catalog_to_xpublish
+import numpy as np
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.metrics import (
+    Metrics,
+)
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
+
+N_COLLECTIONS: int = 3
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Writes a STAC catalog of collections w/ the same dataset id (but different data)."""
+    data_dir: Path = tmp_path_factory.mktemp('shared')
+    catalog = pystac.Catalog(id='shared-catalog', description='A shared app test catalog.')
+    for i in range(N_COLLECTIONS):
+        store: Path = data_dir / f'collection-{i}.zarr'
+        xr.Dataset(
+            data_vars={'temp': (('x',), np.arange(10.0) + 100 * i)},
+            coords={'x': np.arange(10)},
+        ).to_zarr(store, consolidated=True)
+        collection = pystac.Collection(
+            id=f'collection-{i}',
+            description='A local collection.',
+            extent=pystac.Extent(
+                pystac.SpatialExtent([[-180, -90, 180, 90]]),
+                pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+            ),
+        )
+        collection.add_asset(
+            'test',
+            pystac.Asset(
+                href=store.as_uri(),
+                media_type='application/vnd+zarr',
+                extra_fields={
+                    'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True},
+                    'xarray:storage_options': {},
+                },
+            ),
+        )
+        catalog.add_child(collection)
+    catalog.normalize_hrefs(str(data_dir / 'stac'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return data_dir / 'stac' / 'catalog.json'
+
+
+@pytest.mark.parametrize('shared_xpublish_app', [False, True])
+def test_shared_xpublish_app(
+    stac_catalog_path: Path,
+    shared_xpublish_app: bool,
+) -> None:
+    """Test that one shared xpublish app serves the same routes as an app per endpoint."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_startup_dict={},
+        shared_xpublish_app=shared_xpublish_app,
+    )
+    assert StartupReport.ENDPOINTS['xpublish_apps'] == (
+        1 if shared_xpublish_app else N_COLLECTIONS
+    )
+    client = TestClient(app)
+    for i in range(N_COLLECTIONS):
+        assert client.get(f'/collection-{i}/datasets').json() == ['test']
+        assert client.get(f'/collection-{i}/json').status_code == 200
+
+        # the same dataset id at different endpoints is a different dataset
+        response = client.get(f'/collection-{i}/datasets/test/reduce/max')
+        assert response.status_code == 200
+        assert response.json()['data_vars']['temp']['data'] == 9.0 + 100 * i
+        assert client.get(f'/collection-{i}/datasets/test/keys').json() == ['temp', 'x']
+
+    assert client.get('/collection-0/datasets/missing/keys').status_code == 404
+    assert client.get('/missing/datasets/test/keys').status_code == 404
+
+    # metrics see the endpoint's route template either way
+    assert Metrics.REQUEST_DURATION.get_count(
+        method='GET',
+        route='/collection-1/datasets/{dataset_id}/reduce/{operation}',
+        status='200',
+    ) >= 1
@@ -0,0 +1,110 @@
+"""A pytest module for testing lazily generated, shared and collapsed OpenAPI schemas."""
+import catalog_to_xpublish
+import numpy as np
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi.testclient import TestClient
+from pathlib import Path
+from starlette.routing import Mount
+from catalog_to_xpublish.openapi import (
+    OpenAPIDocs,
+)
+
+N_COLLECTIONS: int = 3
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Writes a STAC catalog of collections w/ a local zarr dataset each."""
+    data_dir: Path = tmp_path_factory.mktemp('openapi')
+    store: Path = data_dir / 'test.zarr'
+    xr.Dataset(
+        data_vars={'temp': (('x',), np.arange(10.0))},
+        coords={'x': np.arange(10)},
+    ).to_zarr(store, consolidated=True)
+    catalog = pystac.Catalog(id='openapi-catalog', description='An OpenAPI test catalog.')
+    for i in range(N_COLLECTIONS):
+        collection = pystac.Collection(
+            id=f'collection-{i}',
+            description='A local collection.',
+            extent=pystac.Extent(
+                pystac.SpatialExtent([[-180, -90, 180, 90]]),
+                pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+            ),
+        )
+        collection.add_asset(
+            'test',
+            pystac.Asset(
+                href=store.as_uri(),
+                media_type='application/vnd+zarr',
+                extra_fields={
+                    'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True},
+                    'xarray:storage_options': {},
+                },
+            ),
+        )
+        catalog.add_child(collection)
+    catalog.normalize_hrefs(str(data_dir / 'stac'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    yield data_dir / 'stac' / 'catalog.json'
+    OpenAPIDocs.config_openapi(None)
+
+
+def test_config_validation() -> None:
+    """Test that a bad OpenAPI config raises an error."""
+    with pytest.raises(ValueError):
+        OpenAPIDocs.config_openapi({'collapse': 'yes'})
+
+
+@pytest.mark.parametrize('shared_xpublish_app', [False, True])
+def test_collapsed_openapi(
+    stac_catalog_path: Path,
+    shared_xpublish_app: bool,
+) -> None:
+    """Test that the main schema documents templated routes once, on first request."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_openapi_dict={},
+        shared_xpublish_app=shared_xpublish_app,
+    )
+    # nothing is generated at startup
+    assert app.openapi_schema is None and not OpenAPIDocs.SCHEMAS
+
+    client = TestClient(app)
+    paths: dict = client.get('/openapi.json').json()['paths']
+    for path in [
+        '/catalogs',
+        '/{catalog_path}/json',
+        '/{catalog_path}/datasets/{dataset_id}/keys',
+    ]:
+        assert path in paths
+    assert not any(path.startswith('/collection-') for path in paths)
+    parameters: list = paths['/{catalog_path}/json']['get']['parameters']
+    assert parameters[0]['name'] == 'catalog_path'
+
+    # the schema is cached
+    assert client.get('/openapi.json').json()['paths'] == paths
+    assert app.openapi() is app.openapi()
+    assert client.get('/docs').status_code == 200
+
+
+def test_shared_xpublish_schemas(stac_catalog_path: Path) -> None:
+    """Test that mounted xpublish apps share one generated schema."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_openapi_dict={'collapse': False},
+    )
+    client = TestClient(app)
+    schemas: list = [
+        client.get(f'/collection-{i}/openapi.json').json() for i in range(N_COLLECTIONS)
+    ]
+    assert len(OpenAPIDocs.SCHEMAS) == 1
+    assert all(schema['paths'] == schemas[0]['paths'] for schema in schemas)
+    assert schemas[1]['info']['title'].endswith('/collection-1')
+
+    mounted_apps: list = [route.app for route in app.routes if isinstance(route, Mount)]
+    assert mounted_apps[0].openapi()['paths'] is mounted_apps[1].openapi()['paths']
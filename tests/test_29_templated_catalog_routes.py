@@ -0,0 +1,119 @@
+"""A pytest module for testing templated catalog routes (resolved by a catalog path index)."""
+import catalog_to_xpublish
+import numpy as np
+import pystac
+import pytest
+import xarray as xr
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.catalog_routes import (
+    TemplatedCatalogRoutes,
+)
+from catalog_to_xpublish.factory import (
+    CatalogImplementationFactory,
+)
+from catalog_to_xpublish.openapi import (
+    OpenAPIDocs,
+)
+from catalog_to_xpublish.startup import (
+    StartupReport,
+)
+
+N_COLLECTIONS: int = 3
+
+
+@pytest.fixture(scope='module')
+def stac_catalog_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Writes a STAC catalog of collections (w/ a local zarr dataset) and an empty sub-catalog."""
+    data_dir: Path = tmp_path_factory.mktemp('templated')
+    store: Path = data_dir / 'test.zarr'
+    xr.Dataset(
+        data_vars={'temp': (('x',), np.arange(10.0))},
+        coords={'x': np.arange(10)},
+    ).to_zarr(store, consolidated=True)
+    catalog = pystac.Catalog(id='templated-catalog', description='A templated routes test catalog.')
+    for i in range(N_COLLECTIONS):
+        collection = pystac.Collection(
+            id=f'collection-{i}',
+            description='A local collection.',
+            extent=pystac.Extent(
+                pystac.SpatialExtent([[-180, -90, 180, 90]]),
+                pystac.TemporalExtent([[datetime(2020, 1, 1), None]]),
+            ),
+        )
+        collection.add_asset(
+            'test',
+            pystac.Asset(
+                href=store.as_uri(),
+                media_type='application/vnd+zarr',
+                extra_fields={
+                    'xarray:open_kwargs': {'engine': 'zarr', 'consolidated': True},
+                    'xarray:storage_options': {},
+                },
+            ),
+        )
+        catalog.add_child(collection)
+    catalog.add_child(pystac.Catalog(id='empty', description='A sub-catalog w/o datasets.'))
+    catalog.normalize_hrefs(str(data_dir / 'stac'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    yield data_dir / 'stac' / 'catalog.json'
+    OpenAPIDocs.config_openapi(None)
+
+
+@pytest.mark.parametrize('shared_xpublish_app', [False, True])
+def test_templated_catalog_routes(
+    stac_catalog_path: Path,
+    shared_xpublish_app: bool,
+) -> None:
+    """Test that templated routes serve the same catalog routes as a router per endpoint."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog_path,
+        catalog_type='stac',
+        config_startup_dict={},
+        config_openapi_dict={},
+        shared_xpublish_app=shared_xpublish_app,
+        templated_catalog_routes=True,
+    )
+    client = TestClient(app)
+    assert sorted(client.get('/catalogs').json()) == sorted(
+        [f'collection-{i}' for i in range(N_COLLECTIONS)] + ['empty'],
+    )
+    assert client.get('/parent_catalog').json() == 'This is the root catalog'
+    assert client.get('/empty/json').json()['id'] == 'empty'
+    assert client.get('/empty/parent_catalog').json() == '/'
+    assert client.get('/collection-1/json').json()['id'] == 'collection-1'
+    assert 'collection-1' in client.get('/collection-1/yaml').text
+    assert client.get('/collection-1/datasets/test/keys').json() == ['temp', 'x']
+    assert client.get('/missing/json').status_code == 404
+
+    # catalog routes are documented once (w/ one catalog_path parameter)
+    operation: dict = client.get('/openapi.json').json()['paths']['/{catalog_path}/json']['get']
+    assert [p['name'] for p in operation['parameters']] == ['catalog_path']
+
+    # the route count doesn't grow w/ the number of endpoints served by the main app
+    if shared_xpublish_app:
+        assert StartupReport.ENDPOINTS['routes'] < 40
+
+
+def test_router_cache(stac_catalog_path: Path) -> None:
+    """Test that catalog routers are only built on request, and evicted past max_routers."""
+    implementation = CatalogImplementationFactory.get_catalog_implementation('stac')
+    catalog_endpoints: list = implementation.catalog_search(
+        catalog_path=stac_catalog_path,
+    ).parse_catalog()
+    routes = TemplatedCatalogRoutes(
+        catalog_endpoints=[
+            (cat_end, implementation.catalog_router) for cat_end in catalog_endpoints
+        ],
+        max_routers=1,
+    )
+    assert len(routes.router.routes) == 8 and len(routes.routers) == 0
+
+    router = routes.get_router('/empty')
+    assert routes.get_router('/empty') is router
+    routes.get_router('/collection-0')
+    assert '/empty' not in routes.routers and len(routes.routers) == 1
+    with pytest.raises(HTTPException):
+        routes.get_router('/missing')
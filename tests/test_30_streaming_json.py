@@ -0,0 +1,79 @@
+"""A pytest module for testing streamed JSON/YAML serialization of large catalogs."""
+import catalog_to_xpublish
+import json
+import pystac
+import pytest
+import yaml
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.streaming import (
+    FastJSONResponse,
+    dumps,
+    iter_chunks,
+    iter_json,
+)
+
+N_CHILDREN: int = 500
+
+
+@pytest.fixture(scope='module')
+def stac_catalog(tmp_path_factory: pytest.TempPathFactory) -> pystac.Catalog:
+    """Writes a STAC catalog w/ many (empty) sub-catalogs."""
+    data_dir: Path = tmp_path_factory.mktemp('streaming')
+    catalog = pystac.Catalog(
+        id='streaming-catalog',
+        description='A streaming test catalog w/ a long description. ' * 5,
+        title='Streaming',
+    )
+    for i in range(N_CHILDREN):
+        catalog.add_child(pystac.Catalog(id=f'child-{i}', description='An empty sub-catalog.'))
+    catalog.normalize_hrefs(str(data_dir / 'stac'))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    return pystac.Catalog.from_file(str(data_dir / 'stac' / 'catalog.json'))
+
+
+def test_iter_json() -> None:
+    """Test that nested dicts and generators are encoded as valid JSON in pieces."""
+    value: dict = {
+        'a': 1,
+        'b': {'c': [1, 2], 'd': (str(i) for i in range(3))},
+        'e': iter([]),
+        'f': None,
+    }
+    pieces: list = list(iter_json(value))
+    assert len(pieces) > 5
+    assert json.loads(b''.join(pieces)) == {
+        'a': 1,
+        'b': {'c': [1, 2], 'd': ['0', '1', '2']},
+        'e': [],
+        'f': None,
+    }
+
+    # chunks are bounded by the chunk size (plus one piece)
+    chunks: list = list(iter_chunks(iter_json({'x': (i for i in range(10000))}), chunk_size=100))
+    assert max(len(chunk) for chunk in chunks) < 110
+    assert json.loads(b''.join(chunks)) == {'x': list(range(10000))}
+
+    assert json.loads(FastJSONResponse(['a', 'é']).body) == ['a', 'é']
+    assert json.loads(dumps({1: 'a'})) == {'1': 'a'}
+
+
+def test_streamed_catalog_routes(stac_catalog: pystac.Catalog) -> None:
+    """Test that streamed /json and /yaml match the catalog's (in memory) serialization."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=stac_catalog.get_self_href(),
+        catalog_type='stac',
+    )
+    client = TestClient(app)
+
+    response = client.get('/json')
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json() == stac_catalog.to_dict()
+    assert len(response.json()['links']) == N_CHILDREN + 2
+
+    response = client.get('/yaml')
+    assert response.headers['content-type'].startswith('text/plain')
+    assert response.text == yaml.dump(json.loads(json.dumps(stac_catalog.to_dict())))
+
+    child: dict = client.get('/child-1/json').json()
+    assert child['id'] == 'child-1' and child['links']
@@ -0,0 +1,46 @@
+"""A pytest module for smoke testing the load test benchmark harness."""
+import asyncio
+import catalog_to_xpublish
+import importlib.util
+import sys
+import pytest
+from pathlib import Path
+from types import ModuleType
+
+
+@pytest.fixture(scope='module')
+def load_test() -> ModuleType:
+    """Import benchmarks/load_test.py (benchmarks are not a package)."""
+    path: Path = Path(__file__).resolve().parents[1] / 'benchmarks' / 'load_test.py'
+    spec = importlib.util.spec_from_file_location('load_test', path)
+    module: ModuleType = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_synthetic_load_test(
+    load_test: ModuleType,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that every route of a short run against the synthetic catalog succeeds."""
+    monkeypatch.setattr(
+        sys,
+        'argv',
+        ['load_test.py', '--requests', '100', '--warmup', '10', '--concurrency', '4'],
+    )
+    args = load_test.parse_args()
+    catalog_path: Path = load_test.make_synthetic_catalog(tmp_path, 1, 2)
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+    )
+    try:
+        summary = asyncio.run(load_test.load_test(args, app, catalog_path, 'http://load-test'))
+    finally:
+        load_test.close_datasets()
+
+    assert set(summary['routes']) == set(load_test.ROUTES)
+    for kind, stats in summary['routes'].items():
+        assert stats['errors'] == 0, kind
+    assert summary['overall']['requests'] == 100
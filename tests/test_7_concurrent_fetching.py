@@ -0,0 +1,102 @@
+"""A pytest module for testing concurrent batched chunk fetching."""
+import asyncio
+import time
+import fsspec
+import pytest
+from fsspec.asyn import AsyncFileSystem
+from catalog_to_xpublish.fetching import (
+    ConcurrentFetching,
+)
+
+LATENCY: float = 0.05
+N_KEYS: int = 40
+
+
+class SlowAsyncFileSystem(AsyncFileSystem):
+    """An in-memory async filesystem that simulates object store latency."""
+
+    protocol = 'slowmem'
+    store = {f'bucket/data.zarr/var/0.{i}': bytes([i]) for i in range(N_KEYS)}
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    async def _cat_file(self, path, start=None, end=None, **kwargs):
+        cls = type(self)
+        cls.in_flight += 1
+        cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            await asyncio.sleep(LATENCY)
+            return self.store[self._strip_protocol(path)]
+        except KeyError:
+            raise FileNotFoundError(path)
+        finally:
+            cls.in_flight -= 1
+
+
+@pytest.fixture(scope='module')
+def keys() -> list:
+    """Register the slow filesystem and return chunk keys."""
+    fsspec.register_implementation(
+        'slowmem',
+        SlowAsyncFileSystem,
+        clobber=True,
+    )
+    return [f'var/0.{i}' for i in range(N_KEYS)]
+
+
+def test_config_validation() -> None:
+    """Test that bad fetching configs raise errors."""
+    with pytest.raises(ValueError):
+        ConcurrentFetching.config_fetching({'max_concurrency': 0})
+    with pytest.raises(TypeError):
+        ConcurrentFetching.config_fetching({'max_concurrency': '8'})
+
+
+def test_config_is_not_global() -> None:
+    """Test that configs reset per app, and leave fsspec's process-wide defaults alone."""
+    conf: dict = dict(fsspec.config.conf)
+    ConcurrentFetching.config_fetching({'max_concurrency': 8})
+    assert fsspec.config.conf == conf
+    ConcurrentFetching.config_fetching(None)
+    assert ConcurrentFetching.MAX_CONCURRENCY == 64
+
+
+def test_shared_filesystems_are_untouched(keys: list) -> None:
+    """Test that fsspec's cached instances (used by other libraries) are not modified."""
+    shared = fsspec.filesystem('slowmem')
+    batch_size = shared.batch_size
+    ConcurrentFetching.config_fetching({'max_concurrency': 8})
+    fs = ConcurrentFetching.get_filesystem('slowmem')
+    assert fs is not shared
+    assert fs.batch_size == 8
+    assert getattr(fs, '_catalog_to_xpublish_metrics', False)
+
+    assert fsspec.filesystem('slowmem') is shared
+    assert shared.batch_size == batch_size
+    assert not [k for k in vars(shared) if k.startswith('_catalog_to_xpublish')]
+    ConcurrentFetching.config_fetching(None)
+
+
+@pytest.mark.parametrize('max_concurrency', [1, 8, 64])
+def test_batched_getitems(
+    keys: list,
+    max_concurrency: int,
+) -> None:
+    """Test that batched reads are concurrent and respect the limit."""
+    ConcurrentFetching.config_fetching({'max_concurrency': max_concurrency})
+    fs = ConcurrentFetching.get_filesystem('slowmem')
+    assert fs.batch_size == max_concurrency
+
+    mapper = fs.get_mapper('bucket/data.zarr')
+    SlowAsyncFileSystem.max_in_flight = 0
+    start = time.perf_counter()
+    out = mapper.getitems(keys)
+    elapsed = time.perf_counter() - start
+
+    assert len(out) == N_KEYS
+    assert out['var/0.3'] == bytes([3])
+    assert SlowAsyncFileSystem.max_in_flight == min(max_concurrency, N_KEYS)
+
+    # a full batch should take roughly one round trip per "wave" of requests
+    n_waves = -(-N_KEYS // max_concurrency)
+    assert elapsed < (n_waves + 1) * LATENCY * 2
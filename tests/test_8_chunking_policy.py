@@ -0,0 +1,111 @@
+"""A pytest module for testing the dataset chunking policy."""
+import numpy as np
+import pytest
+import xarray as xr
+from pathlib import Path
+from catalog_to_xpublish.chunking import (
+    DatasetChunking,
+)
+
+
+@pytest.fixture(scope='module')
+def zarr_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Write a small zarr store with known on-disk chunks."""
+    path = tmp_path_factory.mktemp('chunking') / 'test.zarr'
+    ds = xr.Dataset(
+        data_vars={
+            'temp': (
+                ('time', 'y', 'x'),
+                np.zeros((100, 50, 40), dtype='float32'),
+            ),
+        },
+        coords={
+            'time': np.arange(100),
+            'y': np.arange(50),
+            'x': np.arange(40),
+        },
+    )
+    ds.to_zarr(path, encoding={'temp': {'chunks': (10, 25, 20)}})
+    return path
+
+
+@pytest.fixture
+def ds(zarr_path: Path) -> xr.Dataset:
+    """Open the store without dask chunks and reset the server policy."""
+    DatasetChunking.config_chunking({
+        'strategy': 'none',
+        'target_chunk_bytes': 128 * 2**20,
+        'chunks': {},
+    })
+    return xr.open_dataset(zarr_path, engine='zarr')
+
+
+def test_none_strategy(ds: xr.Dataset) -> None:
+    """Test that the default policy leaves datasets as opened."""
+    out = DatasetChunking.apply(ds)
+    assert out['temp'].chunks is None
+
+
+def test_encoding_strategy(ds: xr.Dataset) -> None:
+    """Test aligning dask chunks to the on-disk chunks."""
+    DatasetChunking.config_chunking({'strategy': 'encoding'})
+    out = DatasetChunking.apply(ds)
+    assert out['temp'].data.chunksize == (10, 25, 20)
+
+    # index coordinates are never chunked
+    assert out['time'].chunks is None
+
+
+def test_bytes_strategy(ds: xr.Dataset) -> None:
+    """Test growing the on-disk chunks up to a target size."""
+    DatasetChunking.config_chunking({
+        'strategy': 'bytes',
+        'target_chunk_bytes': 20 * 25 * 20 * 4,
+    })
+    out = DatasetChunking.apply(ds)
+    chunksize = out['temp'].data.chunksize
+    assert np.prod(chunksize) * 4 <= 20 * 25 * 20 * 4
+
+    # dask chunks must be multiples of the on-disk chunks
+    for size, on_disk in zip(chunksize, (10, 25, 20)):
+        assert size % on_disk == 0
+
+
+def test_per_asset_override(ds: xr.Dataset) -> None:
+    """Test that per-asset overrides win over the server-level policy."""
+    DatasetChunking.config_chunking({'strategy': 'encoding'})
+    out = DatasetChunking.apply(
+        ds,
+        overrides={'strategy': 'explicit', 'chunks': {'time': 50}},
+    )
+    assert out['temp'].chunks == ((50, 50), (50,), (40,))
+
+
+def test_bytes_strategy_object_dtype(ds: xr.Dataset) -> None:
+    """Test that object (i.e., string) variables are left as is by strategy='bytes'."""
+    ds = ds.assign(name=('time', np.array([str(i) for i in range(100)], dtype=object)))
+    DatasetChunking.config_chunking({'strategy': 'bytes'})
+    out = DatasetChunking.apply(ds)
+    assert out['name'].chunks is None
+    assert out['temp'].chunks is not None
+
+
+def test_config_resets(ds: xr.Dataset) -> None:
+    """Test that configuring w/o a policy resets the previous app's policy."""
+    DatasetChunking.config_chunking({'strategy': 'explicit', 'chunks': {'time': 50}})
+    DatasetChunking.config_chunking(None)
+    assert DatasetChunking.get_policy() == {
+        'strategy': 'none',
+        'target_chunk_bytes': 128 * 2**20,
+        'chunks': {},
+    }
+
+
+def test_bad_policy() -> None:
+    """Test that invalid policies raise errors."""
+    with pytest.raises(ValueError):
+        DatasetChunking.config_chunking({'strategy': 'fancy'})
+    with pytest.raises(ValueError):
+        DatasetChunking.get_policy({'strategy': 'explicit', 'chunks': {}})
+    with pytest.raises(ValueError):
+        DatasetChunking.config_chunking({'strategy': 'bytes', 'target_chunk_bytes': True})
@@ -0,0 +1,65 @@
+"""A pytest module for testing the optional dask.distributed compute backend."""
+import catalog_to_xpublish
+import dask.array
+import pytest
+import fastapi
+from fastapi.testclient import TestClient
+from pathlib import Path
+from catalog_to_xpublish.compute import (
+    DaskCompute,
+)
+
+pytest.importorskip('distributed')
+
+
+@pytest.fixture(scope='session')
+def catalog_path() -> Path:
+    """Returns the path to the test catalog."""
+    if Path.cwd().name == 'Catalog-To-Xpublish':
+        home_dir = Path.cwd()
+    elif Path.cwd().name == 'tests':
+        home_dir = Path.cwd().parent
+    else:
+        raise FileNotFoundError(
+            f'Please run this test from the root directory of the repository.',
+            f'CWD={Path.cwd()}',
+        )
+    return home_dir / 'test_catalogs' / 'sample_stac_catalog' / 'catalog.json'
+
+
+def test_default_scheduler() -> None:
+    """Test that no cluster is started without a config."""
+    DaskCompute.config_compute(None)
+    assert DaskCompute.CLIENT is None
+    assert DaskCompute.get_compute_info() == {'scheduler': 'threaded'}
+
+
+def test_local_cluster(catalog_path: Path) -> None:
+    """Test attaching a LocalCluster to the app."""
+    app = catalog_to_xpublish.create_app(
+        catalog_path=catalog_path,
+        catalog_type='stac',
+        app_name='compute_test_app',
+        config_compute_dict={
+            'n_workers': 1,
+            'threads_per_worker': 1,
+            'processes': False,
+            'dashboard_address': ':0',
+        },
+    )
+    assert isinstance(app, fastapi.FastAPI)
+    assert DaskCompute.CLIENT is not None
+
+    with TestClient(app) as client:
+        # dask computations now run on the cluster
+        assert dask.array.ones(10, chunks=2).sum().compute() == 10
+
+        response = client.get('/compute')
+        assert response.status_code == 200
+        json_dict = response.json()
+        assert json_dict['scheduler'] == 'distributed'
+        assert json_dict['n_workers'] == 1
+        assert 'dashboard_link' in json_dict
+
+    # the cluster is closed on shutdown
+    assert DaskCompute.CLIENT is None